@@ -1,14 +1,37 @@
-import pymysql
-pymysql.install_as_MySQLdb()
-
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session
-from flask_mysqldb import MySQL
+from flask import Flask, render_template, jsonify, request, redirect, url_for, session, make_response, stream_with_context, g
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import atexit
+import hashlib
+import io
+import json
 import os
 from functools import wraps
 import dotenv
-from math import ceil
+import click
+import pymysql
+
+import autocomplete
+import bulk_import
+import cache
+import db
+import events
+import export
+import facets
+import featured
+import fulltext
+import images
+import media_detail
+import migrations
+import pagination
+import people
+import querylog
+import ratings
+import relations
+import review_queue
+import trending
+import user_stats
+import versions
 
 dotenv.load_dotenv()
 
@@ -22,7 +45,270 @@ app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD')
 app.config['MYSQL_DB'] = os.getenv('MYSQL_DB', 'sirene')
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
-mysql = MySQL(app)
+# Connection pool: connections are reused across requests instead of reopened
+app.config['MYSQL_POOL_MIN_SIZE'] = int(os.getenv('MYSQL_POOL_MIN_SIZE', 2))
+app.config['MYSQL_POOL_MAX_SIZE'] = int(os.getenv('MYSQL_POOL_MAX_SIZE', 10))
+app.config['MYSQL_POOL_TIMEOUT'] = float(os.getenv('MYSQL_POOL_TIMEOUT', 5))
+app.config['MYSQL_POOL_IDLE_TIMEOUT'] = int(os.getenv('MYSQL_POOL_IDLE_TIMEOUT', 300))
+app.config['MYSQL_POOL_PING_INTERVAL'] = int(os.getenv('MYSQL_POOL_PING_INTERVAL', 30))
+# Separate multi-statement connections, used only by the media detail loader
+app.config['MYSQL_BATCH_POOL_MAX_SIZE'] = int(os.getenv('MYSQL_BATCH_POOL_MAX_SIZE', 4))
+
+mysql = db.PooledMySQL(app)
+
+# SQL instrumentation: slow statements are always logged; a sample of requests
+# is fingerprinted for N+1 detection and the per-route stats at /admin/metrics
+app.config['SQL_STATS_SAMPLE_RATE'] = float(os.getenv('SQL_STATS_SAMPLE_RATE', 0.1))
+app.config['SQL_SLOW_MS'] = float(os.getenv('SQL_SLOW_MS', 200))
+app.config['SQL_REPEAT_THRESHOLD'] = int(os.getenv('SQL_REPEAT_THRESHOLD', 5))
+
+query_monitor = querylog.QueryMonitor(app,
+                                      sample_rate=app.config['SQL_STATS_SAMPLE_RATE'],
+                                      slow_ms=app.config['SQL_SLOW_MS'],
+                                      repeat_threshold=app.config['SQL_REPEAT_THRESHOLD'])
+mysql.wrap_connection = query_monitor.wrap
+
+# Response cache for the homepage carousel APIs (memory or redis backend)
+app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL')
+app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', 60))
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+
+response_cache = cache.create_cache(app.config['CACHE_BACKEND'],
+                                    redis_url=app.config['CACHE_REDIS_URL'],
+                                    default_ttl=app.config['CACHE_DEFAULT_TTL'],
+                                    max_entries=app.config['CACHE_MAX_ENTRIES'])
+
+def cached_json(key, loader, ttl=None):
+    """Serve a JSON response from the response cache, running loader() on a miss
+
+    Under @conditional, entries cached for an older version are reloaded, so
+    the body always matches the version in the ETag.
+    """
+    # Cache the serialized body so every backend returns byte-identical JSON
+    body = response_cache.get_or_set(key, lambda: app.json.dumps(loader()), ttl, g.get('version_stamp'))
+    return app.response_class(body, mimetype='application/json')
+
+def invalidate_homepage_cache():
+    """Drop cached homepage sections after media, assets or reviews change"""
+    response_cache.invalidate('home:')
+
+# Trending: default window ('24h', '7d' or '30d') and optional decay half-life in days
+app.config['TRENDING_WINDOW'] = os.getenv('TRENDING_WINDOW', trending.DEFAULT_WINDOW)
+app.config['TRENDING_HALF_LIFE_DAYS'] = float(os.getenv('TRENDING_HALF_LIFE_DAYS', 0)) or None
+
+# Featured hero candidates (media with a backdrop); sampled in Python per request
+featured_pool = featured.FeaturedPool(max_age=int(os.getenv('FEATURED_POOL_MAX_AGE', 300)))
+
+def get_featured_pool():
+    """Return the featured candidate pool, reloading it when stale"""
+    if featured_pool.stale:
+        cur = mysql.connection.cursor()
+        featured_pool.load(cur)
+        cur.close()
+    return featured_pool
+
+def get_media_detail(media_id):
+    """Assembled media details page context, cached per MediaID"""
+    def load():
+        with mysql.batch_connection() as conn:
+            cur = conn.cursor()
+            detail = media_detail.load_media_detail(cur, media_id)
+            cur.close()
+        return detail
+
+    # Under @conditional('media'), a context cached for an older media version is reloaded
+    detail = response_cache.get_or_set(f'detail:{media_id}', load, version=g.get('version_stamp'))
+    if detail is None:
+        # Don't keep misses around; the id may be created later
+        response_cache.delete(f'detail:{media_id}')
+    return detail
+
+def invalidate_media_detail(media_id):
+    """Drop the cached details page context after the media changes"""
+    response_cache.delete(f'detail:{media_id}')
+
+# In-process typeahead index; rebuilt periodically so other workers' edits show up
+title_index = autocomplete.TitleIndex(max_age=int(os.getenv('SEARCH_INDEX_MAX_AGE', 300)))
+
+def get_title_index():
+    """Return the typeahead index, (re)building it from MySQL when stale"""
+    if title_index.stale:
+        cur = mysql.connection.cursor()
+        title_index.load(cur)
+        cur.close()
+    return title_index
+
+# In-process facet index for /api/browse; rebuilt periodically like the title index
+facet_index = facets.FacetIndex(max_age=int(os.getenv('FACET_INDEX_MAX_AGE', 300)))
+
+def get_facet_index():
+    """Return the browse facet index, (re)building it from MySQL when stale"""
+    if facet_index.stale:
+        cur = mysql.connection.cursor()
+        facet_index.load(cur)
+        cur.close()
+    return facet_index
+
+# Genre/platform link changes from the admin routes, applied to the in-process
+# indexes and caches as they happen instead of reloading the media item
+change_events = events.EventBus()
+change_events.subscribe(['genre'], title_index.apply_change)
+change_events.subscribe(['genre', 'platform'], facet_index.apply_change)
+change_events.subscribe(['genre', 'platform'], lambda event: invalidate_media_detail(event.media_id))
+
+# Optional write-behind review ingestion: /api/review queues reviews (spilled to
+# a local file) and a worker thread writes them to MySQL in batches
+app.config['REVIEW_WRITE_BEHIND'] = os.getenv('REVIEW_WRITE_BEHIND', '0').lower() in ('1', 'true', 'yes')
+app.config['REVIEW_SPILL_FILE'] = os.getenv('REVIEW_SPILL_FILE', 'review_spill.ndjson')
+app.config['REVIEW_QUEUE_MAX_SIZE'] = int(os.getenv('REVIEW_QUEUE_MAX_SIZE', 10000))
+app.config['REVIEW_BATCH_SIZE'] = int(os.getenv('REVIEW_BATCH_SIZE', 200))
+app.config['REVIEW_FLUSH_INTERVAL'] = float(os.getenv('REVIEW_FLUSH_INTERVAL', 1.0))
+app.config['REVIEW_SUBMIT_TIMEOUT'] = float(os.getenv('REVIEW_SUBMIT_TIMEOUT', 2.0))
+
+def flush_reviews(reviews):
+    """Write one batch of queued reviews, then bring the indexes and caches up to date"""
+    with app.app_context():
+        media_ids, failures = review_queue.write_batch(mysql.connection, reviews)
+        cur = mysql.connection.cursor()
+        # One read for the whole batch; new averages move items in the rating sort
+        media_ratings = ratings.load_ratings(cur, media_ids)
+        cur.close()
+    title_index.update_ratings(media_ids, media_ratings)
+    facet_index.update_ratings(media_ids, media_ratings)
+    if media_ids:
+        invalidate_homepage_cache()
+        for media_id in media_ids:
+            invalidate_media_detail(media_id)
+    return failures
+
+review_writer = review_queue.ReviewQueue(flush_reviews,
+                                         spill_path=app.config['REVIEW_SPILL_FILE'],
+                                         max_size=app.config['REVIEW_QUEUE_MAX_SIZE'],
+                                         batch_size=app.config['REVIEW_BATCH_SIZE'],
+                                         flush_interval=app.config['REVIEW_FLUSH_INTERVAL'])
+
+def get_review_writer():
+    """Return the review queue, starting its worker (and replaying spill files) if this process hasn't"""
+    if not review_writer.started:
+        review_writer.start()
+        atexit.register(review_writer.stop, 10)
+    return review_writer
+
+# Refuse to serve on a database that is missing migrations: review writes need
+# user_review_stats and media deletes need media_tombstone. Checked when a server
+# loads the app; flask CLI commands (`migrate` among them) skip it, and `flask run`
+# or a database that was down at startup get checked on the first request instead.
+schema_checked = False
+
+def check_schema():
+    """Raise RuntimeError if schema migrations are pending"""
+    global schema_checked
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        pending = migrations.pending(cur)
+        cur.close()
+    if pending:
+        names = ", ".join(f"{version:04d} {name}" for version, name in pending)
+        raise RuntimeError(f"Database schema is out of date; pending migrations: {names}. "
+                           f"Run `flask --app app migrate` first.")
+    schema_checked = True
+
+@app.before_request
+def require_current_schema():
+    if not schema_checked:
+        check_schema()
+
+if os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+    try:
+        check_schema()
+    except (pymysql.MySQLError, db.PoolTimeout) as e:
+        print(f"Could not check the database schema at startup, will on the first request: {e}")
+
+# Write reviews left behind by a crashed process as soon as a server loads the app.
+# flask CLI commands (`migrate`, `export`, ...) and the reloader's parent under
+# `python app.py` never serve, so they leave the spill files alone; `flask run`
+# starts the writer on its first request instead.
+if (app.config['REVIEW_WRITE_BEHIND'] and os.environ.get('FLASK_RUN_FROM_CLI') != 'true'
+        and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')):
+    get_review_writer()
+
+@app.before_request
+def start_review_writer():
+    if app.config['REVIEW_WRITE_BEHIND'] and not review_writer.started:
+        get_review_writer()
+
+# Cache-Control per endpoint for conditional routes; override with a JSON object
+# in CACHE_CONTROL_POLICIES, e.g. {"api_browse": "private, max-age=30"}
+app.config['CACHE_CONTROL'] = {
+    'default': 'private, no-cache',
+    'media_details': 'private, no-cache',
+    'api_browse': 'private, no-cache',
+    'api_search': 'private, max-age=30',
+}
+app.config['CACHE_CONTROL'].update(json.loads(os.getenv('CACHE_CONTROL_POLICIES', '{}')))
+
+def conditional(scope, per_user=False, daily=False, source=None):
+    """Answer If-None-Match/If-Modified-Since from the version counters
+
+    scope is 'media' (the route takes media_id) or 'catalog'. per_user mixes
+    the session user into the ETag for pages that render the navbar; daily
+    does the same with today's date for results that depend on CURDATE().
+    source returns the in-process index the body is built from (brought up
+    to date); its generation goes into the ETag, because another worker's
+    index may be fresher or older than this one at the same version. The
+    version is also left in g.version_stamp for the response cache.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cur = mysql.connection.cursor()
+            if scope == 'media':
+                stamp = versions.media_stamp(cur, kwargs['media_id'])
+            else:
+                stamp = versions.catalog_stamp(cur)
+            cur.close()
+
+            # Nothing to compare against (e.g. unknown media): just run the route
+            if stamp is None:
+                return f(*args, **kwargs)
+
+            version, updated_at = stamp
+            g.version_stamp = version
+            tag = f"{scope}-{kwargs.get('media_id', '')}-{version}"
+            if source:
+                tag += f"-i{source().generation}"
+            if per_user:
+                tag += f"-u{session.get('user_id')}"
+            if daily:
+                tag += f"-{datetime.now():%Y%m%d}"
+            # Every path and query string variant is its own resource, so fold it in too
+            etag = hashlib.md5(f"{tag}:{request.full_path}".encode()).hexdigest()
+            # A date can't tell an index's lag apart, so index-backed bodies only use the ETag
+            last_modified = None if daily or source else versions.http_date(updated_at)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified:
+                not_modified = last_modified <= request.if_modified_since
+            else:
+                not_modified = False
+
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            policies = app.config['CACHE_CONTROL']
+            response.headers['Cache-Control'] = policies.get(request.endpoint, policies['default'])
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            return response
+        return decorated_function
+    return decorator
 
 # Login required decorator
 def login_required(f):
@@ -48,6 +334,18 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+@app.errorhandler(db.PoolTimeout)
+def handle_pool_timeout(e):
+    """Every pooled connection stayed busy past the checkout timeout"""
+    print(f"Connection pool exhausted: {e}")
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': 'Service Unavailable', 'message': 'The server is busy, please retry'})
+    else:
+        response = make_response("The server is busy, please retry shortly.")
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 # Routes
 @app.route('/')
 def index():
@@ -109,41 +407,83 @@ def register():
 def admin_dashboard():
     """Admin dashboard to manage content"""
 
-    # Pagination
+    # Keyset pagination on (Title, MediaID): cost is the same on every page
     PER_PAGE = 20
-    page = request.args.get('page', 1, type=int)
-    offset = (page - 1) * PER_PAGE
+    after = pagination.decode_cursor(request.args.get('after'), 2)
+    before = pagination.decode_cursor(request.args.get('before'), 2)
     
     # Filtering
     filter_type = request.args.get('type', '')
     media_types = ['Movie', 'TV Show', 'Anime', 'Video Game']
     
-    base_query = "FROM media WHERE 1=1"
+    where = ["1=1"]
     params = []
     
     if filter_type:
-        base_query += " AND MediaType = %s"
+        where.append("MediaType = %s")
         params.append(filter_type)
 
+    sort_columns = ["Title", "MediaID"]
+    if before:
+        seek_sql, seek_params = pagination.keyset_condition(sort_columns, before, [True, True])
+        where.append(seek_sql)
+        params.extend(seek_params)
+        order = "Title DESC, MediaID DESC"
+    else:
+        if after:
+            seek_sql, seek_params = pagination.keyset_condition(sort_columns, after, [False, False])
+            where.append(seek_sql)
+            params.extend(seek_params)
+        order = "Title ASC, MediaID ASC"
+
     cur = mysql.connection.cursor()
     
-    # Get total count for pagination
-    cur.execute(f"SELECT COUNT(*) as count {base_query}", params)
-    total_count = cur.fetchone()['count']
-    total_pages = ceil(total_count / PER_PAGE)
-    
-    # Get media for the current page
-    query = f"SELECT * {base_query} ORDER BY Title ASC LIMIT %s OFFSET %s"
-    params.extend([PER_PAGE, offset])
-    
-    cur.execute(query, params)
-    all_media = cur.fetchall()
+    # Get media for the current page (one extra row tells us if there is more)
+    cur.execute(f"""
+        SELECT * FROM media
+        WHERE {' AND '.join(where)}
+        ORDER BY {order}
+        LIMIT %s
+    """, params + [PER_PAGE + 1])
+    all_media = list(cur.fetchall())
+    has_more = len(all_media) > PER_PAGE
+    all_media = all_media[:PER_PAGE]
+
+    if before:
+        all_media.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = bool(after), has_more
+
+    prev_cursor = next_cursor = None
+    if all_media:
+        if has_prev:
+            prev_cursor = pagination.encode_cursor([all_media[0]['Title'], all_media[0]['MediaID']])
+        if has_next:
+            next_cursor = pagination.encode_cursor([all_media[-1]['Title'], all_media[-1]['MediaID']])
+
+    # Counting is optional: exact on request, otherwise InnoDB's estimate when unfiltered
+    total_count = None
+    count_is_exact = request.args.get('count') == 'exact'
+    if count_is_exact:
+        cur.execute(f"SELECT COUNT(*) as count FROM media {'WHERE MediaType = %s' if filter_type else ''}",
+                    [filter_type] if filter_type else [])
+        total_count = cur.fetchone()['count']
+    elif not filter_type:
+        cur.execute("""
+            SELECT TABLE_ROWS as count FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'media'
+        """)
+        row = cur.fetchone()
+        total_count = row['count'] if row else None
     cur.close()
     
     return render_template('admin_dashboard.html', 
                          all_media=all_media,
-                         page=page,
-                         total_pages=total_pages,
+                         prev_cursor=prev_cursor,
+                         next_cursor=next_cursor,
+                         total_count=total_count,
+                         count_is_exact=count_is_exact,
                          filter_type=filter_type,
                          media_types=media_types)
 
@@ -174,9 +514,13 @@ def admin_add_media():
         if platform_ids:
             insert_data = [(new_media_id, pid) for pid in platform_ids]
             cur.executemany("INSERT INTO media_platform (MediaID, PlatformID) VALUES (%s, %s)", insert_data)
-            mysql.connection.commit()
+        versions.bump(cur, new_media_id)
+        mysql.connection.commit()
         
+        title_index.refresh(cur, new_media_id)
+        facet_index.refresh(cur, new_media_id)
         cur.close()
+        invalidate_homepage_cache()
         
         # Redirect to the new edit page to add genres/cast
         return redirect(url_for('admin_edit_media', media_id=new_media_id))
@@ -212,38 +556,49 @@ def admin_edit_media(media_id):
         media_type = request.form['media_type']
         release_date = request.form['release_date'] or None
         duration = request.form['duration'] or None
+        genre_ids = relations.parse_ids(request.form.getlist('genre_ids'))
+        platform_ids = relations.parse_ids(request.form.getlist('platform_ids'))
 
-        cur.execute("""
-            UPDATE media
-            SET Title = %s, Synopsis = %s, MediaType = %s, ReleaseDate = %s, DurationMinutes = %s
-            WHERE MediaID = %s
-        """, (title, synopsis, media_type, release_date, duration, media_id))
-        
-        # 2. Update Genres
-        genre_ids = request.form.getlist('genre_ids')
-        platform_ids = request.form.getlist('platform_ids')
+        media_changed = False
+        changes = []
         try:
-            # Delete old genres first
-            cur.execute("DELETE FROM media_genre WHERE MediaID = %s", [media_id])
-            
-            # Insert new genres if any were selected
-            if genre_ids:
-                insert_data = [(media_id, genre_id) for genre_id in genre_ids]
-                cur.executemany("INSERT INTO media_genre (MediaID, GenreID) VALUES (%s, %s)", insert_data)
-            
-            # Delete old platform links
-            cur.execute("DELETE FROM media_platform WHERE MediaID = %s", [media_id])
-            # Insert new platform links
-            if platform_ids:
-                insert_plat = [(media_id, pid) for pid in platform_ids]
-                cur.executemany("INSERT INTO media_platform (MediaID, PlatformID) VALUES (%s, %s)", insert_plat)
-            
+            cur.execute("SELECT MediaType FROM media WHERE MediaID = %s FOR UPDATE", [media_id])
+            current = cur.fetchone()
+            cur.execute("""
+                UPDATE media
+                SET Title = %s, Synopsis = %s, MediaType = %s, ReleaseDate = %s, DurationMinutes = %s
+                WHERE MediaID = %s
+            """, (title, synopsis, media_type, release_date, duration, media_id))
+            # Affected rows only counts rows whose values actually changed
+            media_changed = cur.rowcount > 0
+            if media_changed and current['MediaType'] != media_type:
+                # Its reviews now count under the new type in their authors' stats
+                user_stats.remove_media_reviews(cur, media_id, current['MediaType'])
+                user_stats.add_media_reviews(cur, media_id)
+
+            # 2. Update Genres and platforms: write only the links that were added or removed
+            for relation, wanted in (('genre', genre_ids), ('platform', platform_ids)):
+                event = relations.sync_links(cur, media_id, relation, wanted)
+                if event:
+                    changes.append(event)
+
+            if media_changed or changes:
+                versions.bump(cur, media_id)
             mysql.connection.commit()
         except Exception as e:
             mysql.connection.rollback()
-            print(f"Error updating genres: {e}") 
-        
+            media_changed, changes = False, []
+            print(f"Error updating media: {e}")
+
+        if media_changed:
+            # Title, type or date changed: re-read the whole entry
+            title_index.refresh(cur, media_id)
+            facet_index.refresh(cur, media_id)
+            invalidate_homepage_cache()
+            invalidate_media_detail(media_id)
+            featured_pool.invalidate()
         cur.close()
+        change_events.publish(changes)
         return redirect(url_for('admin_edit_media', media_id=media_id))
 
     # GET request: fetch media, all genres, and linked genres
@@ -282,9 +637,19 @@ def admin_edit_media(media_id):
 def admin_delete_media(media_id):
     """Delete a media item"""
     cur = mysql.connection.cursor()
+    # Its reviews are deleted with it
+    user_stats.remove_media_reviews(cur, media_id)
     cur.execute("DELETE FROM media WHERE MediaID = %s", [media_id])
+    if cur.rowcount:
+        export.record_deletion(cur, media_id)
+    versions.bump(cur)
     mysql.connection.commit()
     cur.close()
+    title_index.remove(media_id)
+    facet_index.remove(media_id)
+    invalidate_homepage_cache()
+    invalidate_media_detail(media_id)
+    featured_pool.invalidate()
     
     return redirect(url_for('admin_dashboard'))
 
@@ -307,6 +672,11 @@ def admin_manage_media_assets(media_id):
                       request.form.get('caption'), 
                       request.form['image_type'], 
                       request.form.get('sort_order', 0)))
+                images.refresh_primary_images(cur, media_id)
+            
+            elif action_type == 'set_primary':
+                if images.set_primary_image(cur, media_id, request.form.get('image_id')) is None:
+                    raise ValueError(f"Image {request.form.get('image_id')!r} is not a poster or backdrop of media {media_id}")
             
             elif action_type == 'add_video':
                 cur.execute("""
@@ -318,7 +688,12 @@ def admin_manage_media_assets(media_id):
                       request.form['video_type'],
                       request.form.get('sort_order', 0)))
             
+            versions.bump(cur, media_id)
             mysql.connection.commit()
+            title_index.refresh(cur, media_id)
+            invalidate_homepage_cache()
+            invalidate_media_detail(media_id)
+            featured_pool.invalidate()
         except Exception as e:
             mysql.connection.rollback()
             print(f"Error adding asset: {e}") # Add flash messaging here for production
@@ -329,15 +704,20 @@ def admin_manage_media_assets(media_id):
     cur.execute("SELECT * FROM media WHERE MediaID = %s", [media_id])
     media = cur.fetchone()
     cur.execute("SELECT * FROM mediaimage WHERE MediaID = %s ORDER BY Type, SortOrder", [media_id])
-    images = cur.fetchall()
+    media_images = cur.fetchall()
     cur.execute("SELECT * FROM mediavideo WHERE MediaID = %s ORDER BY Type, SortOrder", [media_id])
     videos = cur.fetchall()
+    cur.execute("SELECT PosterImageID, BackdropImageID FROM media_primary_image WHERE MediaID = %s", [media_id])
+    primary = cur.fetchone() or {}
     cur.close()
 
     if not media:
         return redirect(url_for('admin_dashboard'))
 
-    return render_template('admin_manage_media_assets.html', media=media, images=images, videos=videos)
+    primary_image_ids = {primary.get('PosterImageID'), primary.get('BackdropImageID')} - {None}
+
+    return render_template('admin_manage_media_assets.html', media=media, images=media_images, videos=videos,
+                         primary_image_ids=primary_image_ids)
 
 @app.route('/admin/media/<int:media_id>/cast', methods=['GET', 'POST'])
 @admin_required
@@ -360,15 +740,11 @@ def admin_manage_media_cast(media_id):
                         VALUES (%s, %s, %s)
                     """, (media_id, person_id, role))
                 elif person_name and role:
-                    # try to find existing person by exact name (case-sensitive by DB collation)
-                    cur.execute("SELECT PersonID FROM person WHERE Name = %s LIMIT 1", [person_name])
-                    existing = cur.fetchone()
-                    if existing:
-                        pid = existing['PersonID']
-                    else:
-                        # create new person with minimal data
+                    # Reuse an existing person with that name (by DB collation) or create one;
+                    # committed together with the role below
+                    pid = people.find_person(cur, person_name)
+                    if pid is None:
                         cur.execute("INSERT INTO person (Name) VALUES (%s)", [person_name])
-                        mysql.connection.commit()
                         pid = cur.lastrowid
 
                     cur.execute("""
@@ -386,7 +762,9 @@ def admin_manage_media_cast(media_id):
                         WHERE MediaID = %s AND PersonID = %s AND Role = %s
                     """, (media_id, person_id, role))
                     
+            versions.bump(cur, media_id)
             mysql.connection.commit()
+            invalidate_media_detail(media_id)
         except Exception as e:
             mysql.connection.rollback()
             print(f"Error managing cast: {e}")
@@ -407,18 +785,15 @@ def admin_manage_media_cast(media_id):
     """, [media_id])
     linked_cast = cur.fetchall()
     
-    cur.execute("SELECT PersonID, Name FROM person ORDER BY Name")
-    all_people = cur.fetchall()
-    
     cur.close()
     
     if not media:
         return redirect(url_for('admin_dashboard'))
         
+    # People are looked up as the admin types (/api/people) rather than all listed here
     return render_template('admin_manage_media_cast.html',
                          media=media,
-                         linked_cast=linked_cast,
-                         all_people=all_people)
+                         linked_cast=linked_cast)
 
 @app.route('/admin/image/<int:image_id>/delete', methods=['POST'])
 @admin_required
@@ -431,8 +806,15 @@ def admin_delete_image(image_id):
     if result:
         media_id = result['MediaID']
         cur.execute("DELETE FROM mediaimage WHERE ImageID = %s", [image_id])
+        # Fall back to the next candidate if the primary poster/backdrop was deleted
+        images.refresh_primary_images(cur, media_id)
+        versions.bump(cur, media_id)
         mysql.connection.commit()
+        title_index.refresh(cur, media_id)
         cur.close()
+        invalidate_homepage_cache()
+        invalidate_media_detail(media_id)
+        featured_pool.invalidate()
         return redirect(url_for('admin_manage_media_assets', media_id=media_id))
     
     cur.close()
@@ -450,13 +832,108 @@ def admin_delete_video(video_id):
     if result:
         media_id = result['MediaID']
         cur.execute("DELETE FROM mediavideo WHERE VideoID = %s", [video_id])
+        versions.bump(cur, media_id)
         mysql.connection.commit()
+        invalidate_media_detail(media_id)
         cur.close()
         return redirect(url_for('admin_manage_media_assets', media_id=media_id))
 
     cur.close()
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/cache')
+@admin_required
+def admin_cache_stats():
+    """Response cache hit/miss counters"""
+    return jsonify(response_cache.stats())
+
+@app.route('/admin/pool')
+@admin_required
+def admin_pool_stats():
+    """Connection pool size, in-use, waiters and checkout wait times"""
+    return jsonify(mysql.stats())
+
+@app.route('/admin/review-queue')
+@admin_required
+def admin_review_queue_stats():
+    """Write-behind review queue depth and counters"""
+    return jsonify(dict(review_writer.stats(), enabled=app.config['REVIEW_WRITE_BEHIND'],
+                        started=review_writer.started))
+
+@app.route('/admin/metrics', methods=['GET', 'POST'])
+@admin_required
+def admin_metrics():
+    """Per-route SQL statistics from sampled requests"""
+    if request.method == 'POST':
+        query_monitor.reset()
+        return redirect(url_for('admin_metrics'))
+
+    metrics = query_monitor.stats()
+    if request.args.get('format') == 'json':
+        return jsonify(metrics)
+    return render_template('admin_metrics.html', metrics=metrics)
+
+@app.route('/admin/export')
+@admin_required
+def admin_export():
+    """Stream the catalog as NDJSON, one media item (with genres, platforms,
+    cast, images, videos and rating summary) per line
+
+    Pass ?updated_since=<ISO datetime> for media changed since then, followed
+    by {"MediaID": .., "deleted": true} lines for media deleted since then; the
+    X-Export-Started header holds the value to pass on the next run.
+    """
+    updated_since = request.args.get('updated_since')
+    if updated_since:
+        try:
+            updated_since = datetime.fromisoformat(updated_since)
+        except ValueError:
+            return jsonify({'error': 'Bad Request', 'message': 'updated_since must be an ISO date or datetime'}), 400
+
+    cur = mysql.connection.cursor()
+    started = export.export_started(cur)
+    cur.close()
+
+    lines = export.iter_ndjson(mysql.connection, updated_since)
+    response = app.response_class(stream_with_context(lines), mimetype='application/x-ndjson')
+    response.headers['X-Export-Started'] = started.isoformat(sep=' ')
+    return response
+
+@app.route('/admin/import', methods=['GET', 'POST'])
+@admin_required
+def admin_import():
+    """Bulk import media (with genres, platforms, cast, images and videos)
+    from an uploaded CSV, JSON or NDJSON file"""
+    if request.method == 'GET':
+        return render_template('admin_import.html', report=None, formats=bulk_import.FORMATS,
+                               batch_size=bulk_import.DEFAULT_BATCH_SIZE)
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return render_template('admin_import.html', report=None, formats=bulk_import.FORMATS,
+                               batch_size=bulk_import.DEFAULT_BATCH_SIZE, error='Choose a file to import'), 400
+    fmt = request.form.get('format') or bulk_import.guess_format(upload.filename)
+    if fmt not in bulk_import.FORMATS:
+        return render_template('admin_import.html', report=None, formats=bulk_import.FORMATS,
+                               batch_size=bulk_import.DEFAULT_BATCH_SIZE,
+                               error='Pick a format; it could not be told from the file name'), 400
+    batch_size = max(1, request.form.get('batch_size', bulk_import.DEFAULT_BATCH_SIZE, type=int))
+
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    report = bulk_import.import_media(mysql.connection, bulk_import.read_records(stream, fmt), batch_size)
+
+    if report.imported:
+        # Too many changes to refresh one by one; rebuild on the next request
+        title_index.invalidate()
+        facet_index.invalidate()
+        invalidate_homepage_cache()
+        featured_pool.invalidate()
+
+    if request.args.get('format') == 'json':
+        return jsonify(report.as_dict())
+    return render_template('admin_import.html', report=report, formats=bulk_import.FORMATS,
+                           batch_size=batch_size)
+
 @app.route('/logout')
 def logout():
     """Logout user"""
@@ -465,146 +942,27 @@ def logout():
 
 @app.route('/media/<int:media_id>')
 @login_required
+@conditional('media', per_user=True)
 def media_details(media_id):
     """Media details page"""
-    cur = mysql.connection.cursor()
-    
-    # Get media details
-    cur.execute("""
-        SELECT m.*, 
-               GROUP_CONCAT(DISTINCT g.GenreName) as genres
-        FROM media m
-        LEFT JOIN media_genre mg ON m.MediaID = mg.MediaID
-        LEFT JOIN genre g ON mg.GenreID = g.GenreID
-        WHERE m.MediaID = %s
-        GROUP BY m.MediaID
-    """, [media_id])
-    media = cur.fetchone()
-    
-    # Get cast and crew
-    cur.execute("""
-        SELECT p.*, mpr.Role
-        FROM media_person_role mpr
-        JOIN person p ON mpr.PersonID = p.PersonID
-        WHERE mpr.MediaID = %s
-        ORDER BY mpr.Role
-    """, [media_id])
-    people = cur.fetchall()
+    detail = get_media_detail(media_id)
+    if not detail:
+        return redirect(url_for('index'))
     
-    # Get reviews
-    cur.execute("""
-        SELECT r.*, u.Username
-        FROM review r
-        JOIN users u ON r.UserID = u.UserID
-        WHERE r.MediaID = %s
-        ORDER BY r.ReviewDate DESC
-    """, [media_id])
-    reviews = cur.fetchall()
-    
-    # Get platforms
-    cur.execute("""
-        SELECT p.PlatformName
-        FROM media_platform mp
-        JOIN platform p ON mp.PlatformID = p.PlatformID
-        WHERE mp.MediaID = %s
-    """, [media_id])
-    platforms = cur.fetchall()
-    
-    # Get episodes if TV show
-    episodes = []
-    if media and media['MediaType'] in ['TV Show', 'Anime']:
-        cur.execute("""
-            SELECT * FROM episode
-            WHERE MediaID = %s
-            ORDER BY SeasonNumber, EpisodeNumber
-        """, [media_id])
-        episodes = cur.fetchall()
-    
-    # Get awards
-    cur.execute("""
-        SELECT a.AwardName, a.AwardCategory, aw.YearWon, p.Name as PersonName
-        FROM awardwon aw
-        JOIN award a ON aw.AwardID = a.AwardID
-        LEFT JOIN person p ON aw.PersonID = p.PersonID
-        WHERE aw.MediaID = %s
-    """, [media_id])
-    awards = cur.fetchall()
-
-    # Get images
-    cur.execute("""SELECT * FROM mediaimage 
-                WHERE MediaID = %s 
-                ORDER BY Type, SortOrder""", [media_id])
-    images = cur.fetchall()
-    
-    # Get videos
-    cur.execute("""SELECT * FROM mediavideo 
-                WHERE MediaID = %s 
-                ORDER BY Type, SortOrder""", [media_id])
-    videos = cur.fetchall()
-    
-    cur.close()
-
-    poster = next((img for img in images if img['Type'] == 'Poster'), None)
-    backdrop = next((img for img in images if img['Type'] == 'Backdrop'), None)
-    gallery = [img for img in images if img['Type'] == 'Gallery']
-    
-    return render_template('movie_details.html', 
-                         media=media, 
-                         people=people, 
-                         reviews=reviews,
-                         platforms=platforms,
-                         episodes=episodes,
-                         awards=awards,
-                         poster=poster,
-                         backdrop=backdrop,
-                         gallery=gallery,
-                         videos=videos)
+    return render_template('movie_details.html', **detail)
 
 @app.route('/search')
 @login_required
 def search():
     """Search page"""
-    query = request.args.get('q', '')
+    query = request.args.get('q', '').strip()
     media_type = request.args.get('type', '')
     genre = request.args.get('genre', '')
+    cursor = request.args.get('cursor')
     
     cur = mysql.connection.cursor()
     
-    sql = """
-        SELECT m.MediaID, m.Title, m.MediaType, m.Synopsis, m.ReleaseDate, m.DurationMinutes,
-               GROUP_CONCAT(DISTINCT g.GenreName) as genres,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url
-        FROM media m
-        LEFT JOIN media_genre mg ON m.MediaID = mg.MediaID
-        LEFT JOIN genre g ON mg.GenreID = g.GenreID
-        WHERE 1=1
-    """
-    params = []
-    
-    if query:
-        sql += " AND (m.Title LIKE %s)"
-        params.extend([f"%{query}%"])
-    
-    if media_type:
-        sql += " AND m.MediaType = %s"
-        params.append(media_type)
-    
-    if genre:
-        sql += " AND g.GenreName = %s"
-        params.append(genre)
-    
-    sql += " GROUP BY m.MediaID, m.Title, m.MediaType, m.Synopsis, m.ReleaseDate, m.DurationMinutes ORDER BY m.ReleaseDate DESC"
-    
-    if params:
-        cur.execute(sql, params)
-    else:
-        cur.execute(sql)
-    
-    results = cur.fetchall()
-    print(f"Search Debug - Query: '{query}', Type: '{media_type}', Genre: '{genre}'")
-    print(f"Search Debug - Results count: {len(results)}")
-    if results and len(results) > 0:
-        print(f"Search Debug - First result: {results[0]}")
+    results, next_cursor = fulltext.search_media(cur, query, media_type, genre, cursor)
     
     # Get all genres for filter dropdown
     cur.execute("SELECT DISTINCT GenreName FROM genre ORDER BY GenreName")
@@ -617,7 +975,8 @@ def search():
                          query=query,
                          genres=genres,
                          selected_type=media_type,
-                         selected_genre=genre)
+                         selected_genre=genre,
+                         next_cursor=next_cursor)
 
 @app.route('/browse')
 @login_required
@@ -625,97 +984,210 @@ def browse():
     """Browse page with filters"""
     cur = mysql.connection.cursor()
     
-    # Get all genres for filter
+    # Get all genres and platforms for the filters
     cur.execute("SELECT DISTINCT GenreName FROM genre ORDER BY GenreName")
     genres = cur.fetchall()
+    cur.execute("SELECT PlatformName FROM platform ORDER BY PlatformName")
+    platforms = cur.fetchall()
     
     cur.close()
     
-    return render_template('browse.html', genres=genres)
+    return render_template('browse.html', genres=genres, platforms=platforms)
+
+def browse_selection():
+    """Facet filters from the query string: repeat type/genre/platform to select several"""
+    return {facet: [value for value in request.args.getlist(facet) if value] for facet in facets.FACETS}
+
+def hydrate_media(cur, media_ids):
+    """Browse rows (media + rating + poster) for the given ids, in the given order"""
+    if not media_ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(media_ids))
+    cur.execute(f"""
+        SELECT m.*, 
+               mr.AvgRating as avg_rating,
+               COALESCE(mr.RatingCount, 0) as review_count,
+               mpi.PosterUrl as poster_url
+        FROM media m
+        LEFT JOIN media_rating mr ON m.MediaID = mr.MediaID
+        LEFT JOIN media_primary_image mpi ON m.MediaID = mpi.MediaID
+        WHERE m.MediaID IN ({placeholders})
+    """, media_ids)
+    rows = {row['MediaID']: row for row in cur.fetchall()}
+    return [rows[media_id] for media_id in media_ids if media_id in rows]
 
 @app.route('/api/browse')
 @login_required
+@conditional('catalog', source=get_facet_index)
 def api_browse():
-    """API endpoint for browse with filters"""
-    media_type = request.args.get('type', '')
-    genre = request.args.get('genre', '')
+    """API endpoint for browse with filters
+
+    Filters with ?type=, ?genre= and ?platform=, each repeatable: results
+    have every selected genre and any of the selected types and platforms.
+    Returns one page as a JSON list; the cursor for the next page (if any)
+    is sent in the X-Next-Cursor header and accepted back as ?cursor=.
+    """
     sort_by = request.args.get('sort', 'recent')  # recent, rating, title
+    if sort_by not in facets.SORTS:
+        sort_by = 'recent'
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+    
+    # Filter and order in memory; only the page itself is read from MySQL
+    media_ids, next_cursor = get_facet_index().page(browse_selection(), sort_by, limit,
+                                                    request.args.get('cursor'))
     
     cur = mysql.connection.cursor()
+    results = hydrate_media(cur, media_ids)
+    cur.close()
     
-    # Build the query
-    sql = """
-        SELECT DISTINCT m.*, 
-               AVG(r.Rating) as avg_rating,
-               COUNT(r.ReviewID) as review_count,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url
-        FROM media m
-        LEFT JOIN review r ON m.MediaID = r.MediaID
-        LEFT JOIN media_genre mg ON m.MediaID = mg.MediaID
-        LEFT JOIN genre g ON mg.GenreID = g.GenreID
-        WHERE 1=1
+    response = jsonify(results)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/api/facets')
+@login_required
+@conditional('catalog', source=get_facet_index)
+def api_facets():
+    """Result counts per type, genre and platform for the current filters
+
+    Takes the same type/genre/platform parameters as /api/browse, plus the
+    search page's ?q= text, so filter dropdowns can show counts and disable
+    options that would return nothing. ?single=genre counts genres as
+    alternatives to the selected one (single-choice dropdown) rather than
+    additions to it.
     """
+    index = get_facet_index()
+    query = request.args.get('q', '').strip()
+    within = None
+    if query:
+        cur = mysql.connection.cursor()
+        within = fulltext.matching_ids(cur, query)
+        cur.close()
+
+    counts = index.counts(browse_selection(), within, request.args.getlist('single'))
+    return jsonify({
+        'total': counts['total'],
+        'facets': {facet: [{'value': value, 'count': count} for value, count in counts[facet]]
+                   for facet in facets.FACETS},
+    })
+
+# Shared loaders for the homepage sections
+MEDIA_TYPE_SLUGS = {
+    'movies': 'Movie',
+    'tv': 'TV Show',
+    'anime': 'Anime',
+    'games': 'Video Game'
+}
+
+HOME_SECTIONS = ['featured', 'trending'] + list(MEDIA_TYPE_SLUGS)
+
+def load_trending(cur, window=None, half_life_days=None):
+    """Trending media (based on recent reviews), from the per-day trending buckets"""
+    return trending.top_media(cur,
+                              window or app.config['TRENDING_WINDOW'],
+                              limit=10,
+                              half_life_days=half_life_days or app.config['TRENDING_HALF_LIFE_DAYS'])
+
+def load_type_sections(cur, slugs):
+    """Latest 10 releases for each media type slug, fetched in one round trip"""
+    if not slugs:
+        return {}
+
+    # One indexed LIMIT 10 per type, glued together so it is a single statement
+    parts = []
+    for _ in slugs:
+        parts.append("""
+            (SELECT %s as section, m.*, mr.AvgRating as avg_rating,
+                    mpi.PosterUrl as poster_url
+             FROM media m
+             LEFT JOIN media_rating mr ON m.MediaID = mr.MediaID
+             LEFT JOIN media_primary_image mpi ON m.MediaID = mpi.MediaID
+             WHERE m.MediaType = %s
+             ORDER BY m.ReleaseDate DESC
+             LIMIT 10)
+        """)
     params = []
-    
-    if media_type:
-        sql += " AND m.MediaType = %s"
-        params.append(media_type)
-    
-    if genre:
-        sql += " AND g.GenreName = %s"
-        params.append(genre)
-    
-    sql += " GROUP BY m.MediaID"
-    
-    # Add sorting
-    if sort_by == 'rating':
-        sql += " ORDER BY avg_rating DESC, review_count DESC"
-    elif sort_by == 'title':
-        sql += " ORDER BY m.Title ASC"
-    else:  # recent
-        sql += " ORDER BY m.ReleaseDate DESC"
-    
-    sql += " LIMIT 50"
-    
-    cur.execute(sql, params)
-    results = cur.fetchall()
-    cur.close()
-    
-    return jsonify(results)
+    for slug in slugs:
+        params.extend([slug, MEDIA_TYPE_SLUGS[slug]])
+    cur.execute(" UNION ALL ".join(parts), params)
+
+    sections = {slug: [] for slug in slugs}
+    for row in cur.fetchall():
+        sections[row.pop('section')].append(row)
+    return sections
 
 # API Routes for dynamic content
+@app.route('/api/home')
+@login_required
+def api_home():
+    """All homepage sections in one response
+
+    Pass ?sections=featured,trending,movies,... to fetch a subset, and
+    ?weight=rating|recency to weight the featured picks.
+    """
+    requested = request.args.get('sections')
+    if requested:
+        sections = [name for name in HOME_SECTIONS if name in requested.split(',')]
+    else:
+        sections = HOME_SECTIONS
+
+    def load():
+        cur = mysql.connection.cursor()
+        results = {}
+        if 'trending' in sections:
+            results['trending'] = load_trending(cur)
+        results.update(load_type_sections(cur, [name for name in sections if name in MEDIA_TYPE_SLUGS]))
+        cur.close()
+        return results
+
+    cached_sections = [name for name in sections if name != 'featured']
+    results = {}
+    if cached_sections:
+        results.update(response_cache.get_or_set('home:all:' + ','.join(cached_sections), load))
+
+    # Featured slides are re-sampled on every load, so they are not cached
+    if 'featured' in sections:
+        results['featured'] = get_featured_pool().sample(4, request.args.get('weight'))
+
+    return jsonify(results)
+
 @app.route('/api/media/trending')
 @login_required
+@conditional('catalog', daily=True)
 def api_trending():
-    """Get trending media (based on recent reviews)"""
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        SELECT m.*, COUNT(r.ReviewID) as review_count, AVG(r.Rating) as avg_rating,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url
-        FROM media m
-        LEFT JOIN review r ON m.MediaID = r.MediaID
-        WHERE r.ReviewDate >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-        GROUP BY m.MediaID
-        ORDER BY review_count DESC, avg_rating DESC
-        LIMIT 10
-    """)
-    results = cur.fetchall()
-    cur.close()
-    return jsonify(results)
+    """Get trending media (based on recent reviews)
+
+    Pass ?window=24h|7d|30d to change the window and ?half_life=<days> to
+    weight newer reviews more.
+    """
+    window = request.args.get('window', app.config['TRENDING_WINDOW'])
+    if window not in trending.WINDOWS:
+        window = app.config['TRENDING_WINDOW']
+    half_life = request.args.get('half_life', type=float) or app.config['TRENDING_HALF_LIFE_DAYS']
+
+    def load():
+        cur = mysql.connection.cursor()
+        results = load_trending(cur, window, half_life)
+        cur.close()
+        return results
+
+    return cached_json(f'home:trending:{window}:{half_life or 0}', load)
 
 @app.route('/api/media/top-rated')
 @login_required
+@conditional('catalog')
 def api_top_rated():
     """Get top-rated media"""
     cur = mysql.connection.cursor()
     cur.execute("""
-        SELECT m.*, AVG(r.Rating) as avg_rating, COUNT(r.ReviewID) as review_count,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url
-        FROM media m
-        LEFT JOIN review r ON m.MediaID = r.MediaID
-        GROUP BY m.MediaID
-        HAVING review_count > 0
-        ORDER BY avg_rating DESC
+        SELECT m.*, mr.AvgRating as avg_rating, mr.RatingCount as review_count,
+               mpi.PosterUrl as poster_url
+        FROM media_rating mr
+        JOIN media m ON m.MediaID = mr.MediaID
+        LEFT JOIN media_primary_image mpi ON m.MediaID = mpi.MediaID
+        WHERE mr.RatingCount > 0
+        ORDER BY mr.AvgRating DESC
         LIMIT 10
     """)
     results = cur.fetchall()
@@ -724,13 +1196,15 @@ def api_top_rated():
 
 @app.route('/api/media/recent')
 @login_required
+@conditional('catalog', daily=True)
 def api_recent():
     """Get recently released media"""
     cur = mysql.connection.cursor()
     cur.execute("""
         SELECT m.*,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url
+               mpi.PosterUrl as poster_url
         FROM media m
+        LEFT JOIN media_primary_image mpi ON m.MediaID = mpi.MediaID
         WHERE m.ReleaseDate <= CURDATE()
         ORDER BY m.ReleaseDate DESC
         LIMIT 10
@@ -741,38 +1215,23 @@ def api_recent():
 
 @app.route('/api/media/<media_type>')
 @login_required
+@conditional('catalog')
 def api_media_by_type(media_type):
     """Get media by type"""
-    cur = mysql.connection.cursor()
-    
-    # Map URL parameter to database enum values
-    type_map = {
-        'movies': 'Movie',
-        'tv': 'TV Show',
-        'anime': 'Anime',
-        'games': 'Video Game'
-    }
-    
-    db_type = type_map.get(media_type)
-    if not db_type:
+    if media_type not in MEDIA_TYPE_SLUGS:
         return jsonify([])
     
-    cur.execute("""
-        SELECT m.*, AVG(r.Rating) as avg_rating,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url
-        FROM media m
-        LEFT JOIN review r ON m.MediaID = r.MediaID
-        WHERE m.MediaType = %s
-        GROUP BY m.MediaID
-        ORDER BY m.ReleaseDate DESC
-        LIMIT 10
-    """, [db_type])
-    results = cur.fetchall()
-    cur.close()
-    return jsonify(results)
+    def load():
+        cur = mysql.connection.cursor()
+        results = load_type_sections(cur, [media_type])[media_type]
+        cur.close()
+        return results
+
+    return cached_json(f'home:type:{media_type}', load)
 
 @app.route('/api/search')
 @login_required
+@conditional('catalog', source=get_title_index)
 def api_search():
     """API endpoint for search autocomplete"""
     query = request.args.get('q', '')
@@ -780,70 +1239,50 @@ def api_search():
     if len(query) < 2:
         return jsonify([])
     
+    return jsonify(get_title_index().search(query, limit=10))
+
+@app.route('/api/people')
+@admin_required
+def api_people():
+    """Typeahead for the cast page: people whose name starts with ?q=
+
+    Returns one page as a JSON list ordered by name; the cursor for the next
+    page (if any) is sent in the X-Next-Cursor header and accepted back as
+    ?cursor=.
+    """
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', people.PAGE_SIZE, type=int), 1), people.MAX_PAGE_SIZE)
+
     cur = mysql.connection.cursor()
-    cur.execute("""
-        SELECT m.*, 
-               GROUP_CONCAT(DISTINCT g.GenreName) as genres,
-               AVG(r.Rating) as avg_rating,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url
-        FROM media m
-        LEFT JOIN media_genre mg ON m.MediaID = mg.MediaID
-        LEFT JOIN genre g ON mg.GenreID = g.GenreID
-        LEFT JOIN review r ON m.MediaID = r.MediaID
-        WHERE m.Title LIKE %s OR m.Synopsis LIKE %s
-        GROUP BY m.MediaID
-        ORDER BY 
-            CASE 
-                WHEN m.Title LIKE %s THEN 1
-                ELSE 2
-            END,
-            m.Title ASC
-        LIMIT 10
-    """, [f"%{query}%", f"%{query}%", f"{query}%"])
-    results = cur.fetchall()
+    results, next_cursor = people.search_people(cur, query, request.args.get('cursor'), limit)
     cur.close()
-    
-    # Format results for frontend
-    formatted_results = []
-    for item in results:
-        formatted_results.append({
-            'id': item['MediaID'],
-            'title': item['Title'],
-            'media_type': item['MediaType'],
-            'synopsis': item['Synopsis'][:150] + '...' if item['Synopsis'] and len(item['Synopsis']) > 150 else item['Synopsis'],
-            'release_date': str(item['ReleaseDate']) if item['ReleaseDate'] else None,
-            'genres': item['genres'],
-            'avg_rating': float(item['avg_rating']) if item['avg_rating'] else 0,
-            'poster_url': item['poster_url']
-        })
-    
-    return jsonify(formatted_results)
+
+    response = jsonify([{
+        'id': person['PersonID'],
+        'name': person['Name'],
+        'date_of_birth': person['DateOfBirth'].isoformat() if person['DateOfBirth'] else None,
+        'country': person['Country'],
+    } for person in results])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @app.route('/api/media/featured')
 @login_required
 def api_featured():
-    """Get 4 random featured media items with backdrop images"""
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        SELECT m.*, 
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Backdrop' LIMIT 1) as backdrop_url,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url,
-               AVG(r.Rating) as avg_rating
-        FROM media m
-        LEFT JOIN review r ON m.MediaID = r.MediaID
-        WHERE EXISTS (SELECT 1 FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Backdrop')
-        GROUP BY m.MediaID
-        ORDER BY RAND()
-        LIMIT 4
-    """)
-    results = cur.fetchall()
-    cur.close()
-    return jsonify(results)
+    """Get 4 random featured media items with backdrop images
+
+    Pass ?weight=rating or ?weight=recency to favour well-rated or new titles.
+    """
+    return jsonify(get_featured_pool().sample(4, request.args.get('weight')))
 
 @app.route('/api/review', methods=['POST'])
 @login_required
 def api_add_review():
     """Add a review"""
+    if app.config['REVIEW_WRITE_BEHIND']:
+        return queue_review()
+
     data = request.json
     media_id = data.get('media_id')
     rating = data.get('rating')
@@ -855,36 +1294,214 @@ def api_add_review():
             INSERT INTO review (UserID, MediaID, Rating, Comment)
             VALUES (%s, %s, %s, %s)
         """, (session['user_id'], media_id, rating, comment))
+        # Keep the rating summary in step with the review in the same transaction
+        ratings.apply_review(cur, media_id, rating)
+        user_stats.apply_review(cur, session['user_id'], media_id, rating)
+        trending.record_review(cur, media_id, rating)
+        trending.expire_buckets(cur)
+        versions.bump(cur, media_id)
         mysql.connection.commit()
+        title_index.refresh(cur, media_id)
+        # The new average moves the item in the rating sort
+        facet_index.refresh(cur, media_id)
         cur.close()
+        invalidate_homepage_cache()
+        invalidate_media_detail(media_id)
         return jsonify({'success': True})
     except Exception as e:
+        mysql.connection.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+def queue_review():
+    """Validate a review and hand it to the write-behind queue (REVIEW_WRITE_BEHIND)
+
+    The review is on disk when this returns, but only shows up once the next
+    batch is written. Reviewing the same media again replaces the review.
+    """
+    try:
+        review = review_queue.parse_review(session['user_id'], request.get_json(silent=True))
+    except ValueError as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+    cur = mysql.connection.cursor()
+    cur.execute("SELECT 1 FROM media WHERE MediaID = %s", [review.media_id])
+    exists = cur.fetchone()
+    cur.close()
+    if not exists:
+        return jsonify({'success': False, 'error': 'Unknown media_id'}), 400
+
+    try:
+        get_review_writer().submit(review, timeout=app.config['REVIEW_SUBMIT_TIMEOUT'])
+    except review_queue.QueueFull:
+        response = jsonify({'success': False, 'error': 'Too many reviews right now, please retry'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, round(app.config['REVIEW_FLUSH_INTERVAL'])))
+        return response
+    return jsonify({'success': True, 'queued': True}), 202
+
 @app.route('/profile')
 @login_required
 def profile():
-    """User profile page"""
+    """User profile page: stats header plus the user's reviews, newest first, a page at a time"""
+    # Keyset pagination on (ReviewDate, ReviewID), newest first
+    PER_PAGE = 20
+    after = pagination.decode_cursor(request.args.get('after'), 2)
+    if after and not (isinstance(after[0], str) and isinstance(after[1], int)):
+        after = None
+
     cur = mysql.connection.cursor()
     
     # Get user details
-    cur.execute("SELECT * FROM users WHERE UserID = %s", [session['user_id']])
+    cur.execute("SELECT UserID, Username, Email, CreatedAt FROM users WHERE UserID = %s", [session['user_id']])
     user = cur.fetchone()
-    
-    # Get user's reviews
-    cur.execute("""
+
+    # Precomputed review count, average and per-type breakdown
+    stats = user_stats.load_stats(cur, session['user_id'])
+    
+    # Get one page of the user's reviews
+    where = ["r.UserID = %s"]
+    params = [session['user_id']]
+    if after:
+        seek_sql, seek_params = pagination.keyset_condition(["r.ReviewDate", "r.ReviewID"], after, [True, True])
+        where.append(seek_sql)
+        params.extend(seek_params)
+    cur.execute(f"""
         SELECT r.*, m.Title, m.MediaType,
-               (SELECT ImageUrl FROM mediaimage WHERE MediaID = m.MediaID AND Type = 'Poster' LIMIT 1) as poster_url
+               mpi.PosterUrl as poster_url
         FROM review r
         JOIN media m ON r.MediaID = m.MediaID
-        WHERE r.UserID = %s
-        ORDER BY r.ReviewDate DESC
-    """, [session['user_id']])
-    reviews = cur.fetchall()
+        LEFT JOIN media_primary_image mpi ON r.MediaID = mpi.MediaID
+        WHERE {' AND '.join(where)}
+        ORDER BY r.ReviewDate DESC, r.ReviewID DESC
+        LIMIT %s
+    """, params + [PER_PAGE + 1])
+    reviews = list(cur.fetchall())
     
     cur.close()
+
+    next_cursor = None
+    if len(reviews) > PER_PAGE:
+        reviews = reviews[:PER_PAGE]
+        next_cursor = pagination.encode_cursor([reviews[-1]['ReviewDate'], reviews[-1]['ReviewID']])
     
-    return render_template('profile.html', user=user, reviews=reviews)
+    return render_template('profile.html', user=user, stats=stats, reviews=reviews,
+                           next_cursor=next_cursor, is_first_page=not after)
+
+# CLI commands
+@app.cli.command('rebuild-ratings')
+@click.option('--media-id', type=int, default=None, help='Rebuild a single media item only.')
+def rebuild_ratings_command(media_id):
+    """Backfill media_rating from the review table"""
+    cur = mysql.connection.cursor()
+    written = ratings.rebuild_summary(cur, media_id)
+    versions.bump(cur, media_id)
+    mysql.connection.commit()
+    cur.close()
+    click.echo(f"Rebuilt {written} rating summaries")
+
+@app.cli.command('rebuild-user-stats')
+@click.option('--user-id', type=int, default=None, help='Rebuild a single user only.')
+def rebuild_user_stats_command(user_id):
+    """Backfill user_review_stats from the review table"""
+    cur = mysql.connection.cursor()
+    written = user_stats.rebuild_stats(cur, user_id)
+    mysql.connection.commit()
+    cur.close()
+    click.echo(f"Rebuilt {written} user stats rows")
+
+@app.cli.command('rebuild-primary-images')
+def rebuild_primary_images_command():
+    """Backfill media_primary_image from the mediaimage table"""
+    cur = mysql.connection.cursor()
+    written = images.rebuild_primary_images(cur)
+    versions.bump_all(cur)
+    mysql.connection.commit()
+    cur.close()
+    click.echo(f"Resolved primary images for {written} media items")
+
+@app.cli.command('rebuild-trending')
+def rebuild_trending_command():
+    """Backfill the per-day trending buckets from the review table"""
+    cur = mysql.connection.cursor()
+    written = trending.rebuild_buckets(cur)
+    versions.bump(cur)
+    mysql.connection.commit()
+    cur.close()
+    click.echo(f"Rebuilt {written} trending buckets")
+
+@app.cli.command('migrate')
+@click.option('--status', 'show_status', is_flag=True, help='List migrations and whether they are applied.')
+@click.option('--target', type=int, default=None, help='Stop after this migration version.')
+def migrate_command(show_status, target):
+    """Apply pending schema migrations"""
+    if show_status:
+        cur = mysql.connection.cursor()
+        for version, name, applied in migrations.status(cur):
+            click.echo(f"{version:04d} {name}: {'applied' if applied else 'pending'}")
+        cur.close()
+        return
+
+    applied = migrations.migrate(mysql.connection, target)
+    for version, name in applied:
+        click.echo(f"Applied {version:04d} {name}")
+    click.echo(f"{len(applied)} migrations applied")
+
+@app.cli.command('export')
+@click.option('--updated-since', type=click.DateTime(), default=None,
+              help='Only media changed at or after this time.')
+@click.option('--output', type=click.File('w'), default='-', help='File to write (default: stdout).')
+def export_command(updated_since, output):
+    """Write the catalog as NDJSON, one media item per line"""
+    cur = mysql.connection.cursor()
+    started = export.export_started(cur)
+    cur.close()
+
+    written = 0
+    for line in export.iter_ndjson(mysql.connection, updated_since):
+        output.write(line)
+        written += 1
+    click.echo(f"Exported {written} media items; next --updated-since \"{started.isoformat(sep=' ')}\"", err=True)
+
+@app.cli.command('import-media')
+@click.argument('file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'fmt', type=click.Choice(bulk_import.FORMATS), default=None,
+              help='File format (default: from the file extension).')
+@click.option('--batch-size', type=click.IntRange(min=1), default=bulk_import.DEFAULT_BATCH_SIZE,
+              help='Media items per transaction.')
+def import_media_command(file, fmt, batch_size):
+    """Bulk import media from a CSV, JSON or NDJSON file"""
+    fmt = fmt or bulk_import.guess_format(file.name)
+    if fmt is None:
+        raise click.UsageError("Cannot tell the format from the file name; pass --format")
+
+    report = bulk_import.import_media(mysql.connection, bulk_import.read_records(file, fmt), batch_size)
+    for number, message in report.errors:
+        click.echo(f"Row {number}: {message}", err=True)
+    click.echo(f"Imported {report.imported} of {report.rows} rows in {report.elapsed:.1f}s "
+               f"({report.rows_per_second} rows/s), {len(report.errors)} failed")
+    if report.errors:
+        raise SystemExit(1)
+
+@app.cli.command('check-ratings')
+def check_ratings_command():
+    """Compare media_rating against the raw review table"""
+    cur = mysql.connection.cursor()
+    mismatches = ratings.check_summary(cur)
+    cur.close()
+
+    if not mismatches:
+        click.echo("Rating summaries are consistent")
+        return
+
+    for row in mismatches:
+        click.echo(f"MediaID {row['MediaID']}: stored {row['stored_count']} reviews / sum {row['stored_sum']}, "
+                   f"actual {row['actual_count']} reviews / sum {row['actual_sum']}")
+    raise SystemExit(1)
 
 if __name__ == '__main__':
+    # Open the pool's connections and build the in-process indexes before serving the first request
+    with app.app_context():
+        mysql.warm()
+        get_title_index()
+        get_facet_index()
     app.run(debug=True, port=5000)
\ No newline at end of file
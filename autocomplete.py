@@ -0,0 +1,270 @@
+"""
+In-process title autocomplete index for Sirene.
+
+Serves /api/search typeahead without touching MySQL. Titles are indexed in a
+prefix trie (whole title plus every word start) with a trigram index as the
+fallback for substring matches. The index is built once from the database
+and then kept current by the admin routes that change titles.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+# Every indexed row needs these columns (see ENTRY_QUERY)
+ENTRY_QUERY = """
+    SELECT m.MediaID, m.Title, m.MediaType, m.Synopsis, m.ReleaseDate,
+           GROUP_CONCAT(DISTINCT g.GenreName) as genres,
+           mr.AvgRating as avg_rating,
+           mpi.PosterUrl as poster_url
+    FROM media m
+    LEFT JOIN media_genre mg ON m.MediaID = mg.MediaID
+    LEFT JOIN genre g ON mg.GenreID = g.GenreID
+    LEFT JOIN media_rating mr ON m.MediaID = mr.MediaID
+    LEFT JOIN media_primary_image mpi ON m.MediaID = mpi.MediaID
+    {where}
+    GROUP BY m.MediaID
+"""
+
+# Cap on candidates gathered for the second (word-start/substring) rank
+MAX_CANDIDATES = 200
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Case-fold and collapse whitespace so lookups are case-insensitive."""
+    return _WHITESPACE.sub(' ', (text or '').casefold()).strip()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def format_entry(row):
+    """Format a media row the way /api/search returns it."""
+    synopsis = row['Synopsis']
+    return {
+        'id': row['MediaID'],
+        'title': row['Title'],
+        'media_type': row['MediaType'],
+        'synopsis': synopsis[:150] + '...' if synopsis and len(synopsis) > 150 else synopsis,
+        'release_date': str(row['ReleaseDate']) if row['ReleaseDate'] else None,
+        'genres': row['genres'],
+        'avg_rating': float(row['avg_rating']) if row['avg_rating'] else 0,
+        'poster_url': row['poster_url']
+    }
+
+
+class _TrieNode:
+    __slots__ = ('children', 'titles', 'words')
+
+    def __init__(self):
+        self.children = {}
+        self.titles = set()   # media whose whole title ends here
+        self.words = set()    # media with a word-start suffix ending here
+
+
+class TitleIndex:
+    """Prefix trie plus trigram index over media titles."""
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self.loaded_at = None
+        self._instance = os.urandom(4).hex()
+        self._changes = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._entries = {}
+        self._norm_titles = {}
+        self._root = _TrieNode()
+        self._trigrams = defaultdict(set)
+
+    @property
+    def generation(self):
+        """Changes whenever the index does, and differs between processes.
+
+        Conditional responses built from the index put it in their ETag: a
+        worker whose index lags behind the database must not answer with
+        the ETag of a fresher worker's body.
+        """
+        return f"{self._instance}.{self._changes}"
+
+    @property
+    def stale(self):
+        if self.loaded_at is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self.loaded_at > self.max_age
+
+    def load(self, cur):
+        """(Re)build the whole index from the database."""
+        cur.execute(ENTRY_QUERY.format(where=''))
+        rows = cur.fetchall()
+        with self._lock:
+            self._changes += 1
+            self._reset()
+            for row in rows:
+                self._add(format_entry(row))
+            self.loaded_at = time.monotonic()
+
+    def refresh(self, cur, media_id):
+        """Re-read one media item, adding, updating or dropping its entry."""
+        cur.execute(ENTRY_QUERY.format(where='WHERE m.MediaID = %s'), [media_id])
+        row = cur.fetchone()
+        with self._lock:
+            self._changes += 1
+            self._discard(media_id)
+            if row:
+                self._add(format_entry(row))
+
+    def update_ratings(self, media_ids, ratings):
+        """Update entries' average rating from media_rating rows (see
+        ratings.load_ratings) without re-reading the media; titles are unchanged."""
+        with self._lock:
+            self._changes += 1
+            for media_id in media_ids:
+                entry = self._entries.get(media_id)
+                if entry is None:
+                    continue
+                avg_rating = (ratings.get(media_id) or {}).get('AvgRating')
+                # Entries are shared with readers, so replace rather than mutate
+                self._entries[media_id] = {**entry, 'avg_rating': float(avg_rating) if avg_rating else 0}
+
+    def remove(self, media_id):
+        with self._lock:
+            self._changes += 1
+            self._discard(media_id)
+
+    def invalidate(self):
+        """Mark the index stale so the next request rebuilds it."""
+        self.loaded_at = None
+
+    def apply_change(self, event):
+        """Update an entry's genres from a genre link change (an events.ChangeEvent)."""
+        if event.relation != 'genre':
+            return
+        with self._lock:
+            self._changes += 1
+            entry = self._entries.get(event.media_id)
+            if entry is None:
+                return
+            genres = set(entry['genres'].split(',')) if entry['genres'] else set()
+            genres -= {name for _, name in event.removed}
+            genres |= {name for _, name in event.added}
+            # Entries are shared with readers, so replace rather than mutate
+            self._entries[event.media_id] = {**entry, 'genres': ','.join(sorted(genres)) or None}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def search(self, query, limit=10):
+        """Return up to `limit` formatted entries matching `query`.
+
+        Titles starting with the query come first (in title order), followed
+        by titles with a word starting with it, then titles containing it.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+
+        with self._lock:
+            node = self._root
+            for ch in q:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+
+            ranked = []
+            seen = set()
+            if node is not None:
+                self._collect(node, 'titles', ranked, seen, limit)
+
+            if len(ranked) < limit:
+                others = []
+                if node is not None:
+                    self._collect(node, 'words', others, seen, MAX_CANDIDATES)
+                if len(others) < MAX_CANDIDATES and len(q) >= 3:
+                    others.extend(self._substring_matches(q, seen, MAX_CANDIDATES - len(others)))
+                others.sort(key=lambda media_id: self._norm_titles[media_id])
+                ranked.extend(others[:limit - len(ranked)])
+
+            return [self._entries[media_id] for media_id in ranked]
+
+    def _collect(self, node, kind, out, seen, limit):
+        # Depth-first in character order, so whole-title matches come out sorted
+        stack = [node]
+        while stack and len(out) < limit:
+            current = stack.pop()
+            for media_id in sorted(getattr(current, kind), key=lambda i: self._norm_titles[i]):
+                if media_id not in seen:
+                    seen.add(media_id)
+                    out.append(media_id)
+                    if len(out) >= limit:
+                        return
+            stack.extend(current.children[ch] for ch in sorted(current.children, reverse=True))
+
+    def _substring_matches(self, q, seen, limit):
+        postings = [self._trigrams.get(gram, set()) for gram in trigrams(q)]
+        if not postings:
+            return []
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        matches = []
+        for media_id in candidates:
+            if media_id not in seen and q in self._norm_titles[media_id]:
+                seen.add(media_id)
+                matches.append(media_id)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def _keys(self, norm_title):
+        """Trie keys for a title: the whole title and every later word start."""
+        keys = [(norm_title, 'titles')]
+        for match in re.finditer(r' (?=\S)', norm_title):
+            keys.append((norm_title[match.end():], 'words'))
+        return keys
+
+    def _add(self, entry):
+        media_id = entry['id']
+        norm_title = normalize(entry['title'])
+        self._entries[media_id] = entry
+        self._norm_titles[media_id] = norm_title
+
+        for key, kind in self._keys(norm_title):
+            node = self._root
+            for ch in key:
+                node = node.children.setdefault(ch, _TrieNode())
+            getattr(node, kind).add(media_id)
+
+        for gram in trigrams(norm_title):
+            self._trigrams[gram].add(media_id)
+
+    def _discard(self, media_id):
+        norm_title = self._norm_titles.pop(media_id, None)
+        if norm_title is None:
+            return
+        del self._entries[media_id]
+
+        for key, kind in self._keys(norm_title):
+            path = [self._root]
+            for ch in key:
+                path.append(path[-1].children[ch])
+            getattr(path[-1], kind).discard(media_id)
+            # Prune nodes that no longer lead anywhere
+            for depth in range(len(key), 0, -1):
+                node = path[depth]
+                if node.children or node.titles or node.words:
+                    break
+                del path[depth - 1].children[key[depth - 1]]
+
+        for gram in trigrams(norm_title):
+            posting = self._trigrams.get(gram)
+            if posting is not None:
+                posting.discard(media_id)
+                if not posting:
+                    del self._trigrams[gram]
@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+"""
+Route benchmarks for Sirene.
+
+Seeds a separate MySQL database with a synthetic catalog at a chosen scale,
+then drives the main read routes either in-process through the Flask test
+client or over HTTP against a running server with concurrent workers, and
+writes latency percentiles, throughput and SQL statements per request as
+JSON so two runs can be compared.
+
+    python benchmark.py seed --media 100000 --links 1000000 --reviews 10000000
+    python benchmark.py run --requests 200 --output before.json
+    python benchmark.py run --mode http --url http://localhost:5000 --concurrency 16
+    python benchmark.py compare before.json after.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookiejar import CookieJar
+
+import pymysql
+from werkzeug.security import generate_password_hash
+
+import init_db
+import migrations
+
+BENCH_USER = 'bench'
+BENCH_PASSWORD = 'bench-password'
+
+MEDIA_TYPES = list(init_db.MEDIA_TYPE_WEIGHTS)
+TYPE_SLUGS = ['movies', 'tv', 'anime', 'games']
+
+
+def connect(args, database=None):
+    return pymysql.connect(host=args.host, user=args.user, password=args.password,
+                           database=database, charset='utf8mb4',
+                           cursorclass=pymysql.cursors.DictCursor)
+
+
+def seed(args):
+    """Create the benchmark database and fill it with init_db's synthetic catalog."""
+    server = connect(args)
+    cur = server.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cur.execute(f"CREATE DATABASE `{args.database}`")
+    cur.close()
+    server.close()
+
+    generator = init_db.create_connection(args.host, args.user, args.password, args.database)
+    if not generator:
+        sys.exit(1)
+    try:
+        print(f"Loading schema into {args.database}...")
+        if not init_db.execute_sql_file(generator, 'sirene.sql'):
+            sys.exit(1)
+        init_db.generate_data(generator, media=args.media, people=args.people, links=args.links,
+                              users=args.users, reviews=args.reviews, seed=args.seed,
+                              batch_size=args.batch_size)
+        # Secondary indexes build faster in one pass over the loaded tables
+        migrations.migrate(generator)
+    finally:
+        generator.close()
+
+    connection = connect(args, args.database)
+    cur = connection.cursor()
+    cur.execute("""
+        INSERT INTO users (Username, Email, PasswordHash, UserRole)
+        VALUES (%s, %s, %s, 'admin')
+    """, (BENCH_USER, 'bench@bench.example.com', generate_password_hash(BENCH_PASSWORD)))
+    cur.execute("ANALYZE TABLE media, media_genre, media_platform, media_person_role, review, media_rating")
+    cur.fetchall()
+    connection.commit()
+    cur.close()
+    connection.close()
+    print(f"Done. Benchmark login: {BENCH_USER} / {BENCH_PASSWORD}")
+
+
+def catalog_facts(args):
+    """What the scenarios need to build realistic requests."""
+    connection = connect(args, args.database)
+    cur = connection.cursor()
+    cur.execute("SELECT MIN(MediaID) as lo, MAX(MediaID) as hi, COUNT(*) as n FROM media")
+    media = cur.fetchone()
+    cur.execute("SELECT GenreName FROM genre ORDER BY GenreName")
+    genres = [row['GenreName'] for row in cur.fetchall()]
+    cur.execute("SELECT UserID FROM users WHERE Username = %s", [BENCH_USER])
+    user = cur.fetchone()
+    cur.close()
+    connection.close()
+    if not user:
+        sys.exit(f"No '{BENCH_USER}' user in {args.database}; run 'python benchmark.py seed' first")
+    return {'media_lo': media['lo'], 'media_hi': media['hi'], 'media_count': media['n'],
+            'genres': genres, 'user_id': user['UserID']}
+
+
+def search_word(rng):
+    return rng.choice(init_db.ADJECTIVES + init_db.NOUNS)
+
+
+# Endpoint name -> request path built from a random generator and the catalog facts
+SCENARIOS = {
+    'api_home': lambda rng, facts: '/api/home',
+    'api_trending': lambda rng, facts: '/api/media/trending',
+    'api_media_by_type': lambda rng, facts: f"/api/media/{rng.choice(TYPE_SLUGS)}",
+    'api_browse': lambda rng, facts: '/api/browse?' + urllib.parse.urlencode({
+        'sort': rng.choice(['recent', 'rating', 'title']),
+        'type': rng.choice([''] + MEDIA_TYPES),
+        'genre': rng.choice([''] * 3 + facts['genres']),
+    }),
+    'api_search': lambda rng, facts: '/api/search?' + urllib.parse.urlencode({
+        'q': search_word(rng)[:rng.randint(2, 6)]}),
+    'search': lambda rng, facts: '/search?' + urllib.parse.urlencode({
+        'q': search_word(rng) if rng.random() < 0.8 else f"{search_word(rng)} {search_word(rng)}",
+        'type': rng.choice([''] * 3 + MEDIA_TYPES)}),
+    'media_details': lambda rng, facts: f"/media/{rng.randint(facts['media_lo'], facts['media_hi'])}",
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors, wall, queries):
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'max_ms': ms(latencies[-1]) if latencies else None,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'queries_per_request': queries,
+    }
+
+
+def run_client(args, facts, routes):
+    """Drive the routes in-process through the Flask test client."""
+    os.environ['MYSQL_DB'] = args.database
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    if args.user:
+        os.environ['MYSQL_USER'] = args.user
+    if args.password:
+        os.environ['MYSQL_PASSWORD'] = args.password
+    import app as sirene
+
+    # Every request is fingerprinted so the per-route query counts are exact
+    sirene.query_monitor.sample_rate = 1.0
+    client = sirene.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = facts['user_id']
+        session['username'] = BENCH_USER
+        session['user_role'] = 'admin'
+
+    results = {}
+    for name in routes:
+        rng = random.Random(f"{args.seed}:{name}")
+        for _ in range(args.warmup):
+            client.get(SCENARIOS[name](rng, facts))
+
+        sirene.query_monitor.reset()
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            path = SCENARIOS[name](rng, facts)
+            t0 = time.perf_counter()
+            response = client.get(path)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                errors += 1
+        wall = time.perf_counter() - started
+
+        route_stats = next((r for r in sirene.query_monitor.stats()['routes'] if r['route'] == name), None)
+        results[name] = summarize(latencies, errors, wall, route_stats['avg_queries'] if route_stats else 0)
+        print(f"  {name}: p50 {results[name]['p50_ms']} ms, p95 {results[name]['p95_ms']} ms", file=sys.stderr)
+    return results
+
+
+def _http_opener(base_url):
+    """Cookie-keeping opener logged in as the benchmark admin."""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    body = urllib.parse.urlencode({'username': BENCH_USER, 'password': BENCH_PASSWORD}).encode()
+    opener.open(base_url + '/login', data=body).read()
+    return opener
+
+
+def run_http(args, facts, routes):
+    """Drive the routes over HTTP against a running server with concurrent workers."""
+    base_url = args.url.rstrip('/')
+    local = threading.local()
+
+    def opener():
+        if not hasattr(local, 'opener'):
+            local.opener = _http_opener(base_url)
+        return local.opener
+
+    def fetch(path):
+        t0 = time.perf_counter()
+        try:
+            with opener().open(base_url + path, timeout=args.timeout) as response:
+                response.read()
+                ok = response.status < 400
+        except Exception:
+            ok = False
+        return time.perf_counter() - t0, ok
+
+    admin = _http_opener(base_url)
+    results = {}
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for name in routes:
+            rng = random.Random(f"{args.seed}:{name}")
+            list(pool.map(fetch, [SCENARIOS[name](rng, facts) for _ in range(args.warmup)]))
+
+            # Reset the server's SQL metrics so the query count covers this route only
+            admin.open(base_url + '/admin/metrics', data=b'').read()
+            paths = [SCENARIOS[name](rng, facts) for _ in range(args.requests)]
+            started = time.perf_counter()
+            outcomes = list(pool.map(fetch, paths))
+            wall = time.perf_counter() - started
+
+            with admin.open(base_url + '/admin/metrics?format=json') as response:
+                metrics = json.load(response)
+            route_stats = next((r for r in metrics['routes'] if r['route'] == name), None)
+            results[name] = summarize([latency for latency, _ in outcomes],
+                                      sum(1 for _, ok in outcomes if not ok), wall,
+                                      route_stats['avg_queries'] if route_stats else None)
+            print(f"  {name}: p50 {results[name]['p50_ms']} ms, p95 {results[name]['p95_ms']} ms, "
+                  f"{results[name]['throughput_rps']} req/s", file=sys.stderr)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    routes = args.routes.split(',') if args.routes else list(SCENARIOS)
+    unknown = [name for name in routes if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown route(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    facts = catalog_facts(args)
+    print(f"Benchmarking {len(routes)} routes against {facts['media_count']:,} media "
+          f"({args.mode} mode, {args.requests} requests each)", file=sys.stderr)
+    results = run_client(args, facts, routes) if args.mode == 'client' else run_http(args, facts, routes)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'mode': args.mode,
+            'database': args.database,
+            'media_count': facts['media_count'],
+            'requests_per_route': args.requests,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency if args.mode == 'http' else 1,
+            'seed': args.seed,
+        },
+        'routes': results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+def compare(args):
+    """Print per-route changes between two benchmark reports."""
+    with open(args.baseline) as file:
+        baseline = json.load(file)['routes']
+    with open(args.candidate) as file:
+        candidate = json.load(file)['routes']
+
+    metrics = ['p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request']
+    print(f"{'route':<20}" + ''.join(f"{m:>26}" for m in metrics))
+    for name in sorted(set(baseline) | set(candidate)):
+        old, new = baseline.get(name), candidate.get(name)
+        if not old or not new:
+            print(f"{name:<20}  only in {'candidate' if new else 'baseline'}")
+            continue
+        cells = []
+        for metric in metrics:
+            a, b = old.get(metric), new.get(metric)
+            if a is None or b is None:
+                cells.append(f"{'-':>26}")
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else ''
+            cells.append(f"{f'{a} -> {b} {change}':>26}")
+        print(f"{name:<20}" + ''.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a large catalog and benchmark Sirene's routes")
+    parser.add_argument('--host', default=os.getenv('MYSQL_HOST', 'localhost'))
+    parser.add_argument('--user', default=os.getenv('MYSQL_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('MYSQL_PASSWORD', ''))
+    parser.add_argument('--database', default='sirene_bench', help='Benchmark database (dropped and recreated by seed)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for data and request mixes')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Create and fill the benchmark database')
+    seed_parser.add_argument('--media', type=int, default=10000)
+    seed_parser.add_argument('--people', type=int, default=20000)
+    seed_parser.add_argument('--links', type=int, default=100000, help='media_person_role rows')
+    seed_parser.add_argument('--users', type=int, default=10000)
+    seed_parser.add_argument('--reviews', type=int, default=500000)
+    seed_parser.add_argument('--batch-size', type=int, default=5000)
+
+    run_parser = commands.add_parser('run', help='Benchmark the routes and report JSON')
+    run_parser.add_argument('--mode', choices=['client', 'http'], default='client')
+    run_parser.add_argument('--url', default='http://localhost:5000', help='Server for --mode http')
+    run_parser.add_argument('--routes', help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    run_parser.add_argument('--requests', type=int, default=200, help='Timed requests per route')
+    run_parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per route first')
+    run_parser.add_argument('--concurrency', type=int, default=8, help='Workers for --mode http')
+    run_parser.add_argument('--timeout', type=float, default=30)
+    run_parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    compare_parser = commands.add_parser('compare', help='Diff two JSON reports')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+
+    args = parser.parse_args()
+    {'seed': seed, 'run': run, 'compare': compare}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
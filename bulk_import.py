@@ -0,0 +1,371 @@
+"""
+Batched bulk media import for Sirene.
+
+Reads media records from CSV, a JSON array or NDJSON (the format written by
+`flask export`), validates each one and writes them in batches: one
+transaction per batch creates the media rows and all of their genre,
+platform, cast, image and video links, then resolves primary images and
+bumps the change counters for the whole batch at once. Cast members are
+matched to existing people by name with a single lookup per batch; names not
+found are created in one statement.
+
+A record that fails validation is reported and skipped. If a batch fails in
+MySQL it is rolled back and retried one record at a time, so only the
+offending records are reported and the rest still go in.
+
+In CSV files the list columns hold `|`-separated entries: genres and
+platforms by name, cast as `Name=Role`, images as `Type=URL` and videos as
+`Type=Title=URL`.
+"""
+
+import csv
+import json
+import time
+import unicodedata
+from datetime import date
+
+import pymysql
+
+import images
+import versions
+
+FORMATS = ('csv', 'json', 'ndjson')
+
+MEDIA_TYPES = ('Movie', 'TV Show', 'Anime', 'Video Game')
+IMAGE_TYPES = ('Poster', 'Backdrop', 'Gallery')
+VIDEO_TYPES = ('Trailer', 'Teaser', 'Clip', 'Featurette')
+
+DEFAULT_BATCH_SIZE = 500
+
+LIST_SEPARATOR = '|'
+
+
+class RowError(ValueError):
+    """A record that cannot be imported; the message is shown to the admin."""
+
+
+class ImportReport:
+    """Outcome of one import run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.media_ids = []
+        self.errors = []   # (row number, message)
+        self.elapsed = 0.0
+
+    @property
+    def imported(self):
+        return len(self.media_ids)
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'failed': len(self.errors),
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': self.rows_per_second,
+            'errors': [{'row': number, 'error': message} for number, message in self.errors],
+        }
+
+
+def guess_format(filename):
+    """Import format from a file name's extension, or None."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'csv': 'csv', 'json': 'json', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}.get(extension)
+
+
+def read_records(stream, fmt):
+    """Yield (row number, record, error) for each record in a text stream.
+
+    error is a message when the record itself could not be decoded. CSV rows
+    are numbered by line (the header is line 1), JSON array items from 1.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record, None
+    elif fmt == 'json':
+        try:
+            records = json.load(stream)
+        except ValueError as e:
+            yield 0, None, f"Invalid JSON: {e}"
+            return
+        if not isinstance(records, list):
+            yield 0, None, "Expected a JSON array of media objects"
+            return
+        for number, record in enumerate(records, 1):
+            yield number, record, None
+    elif fmt == 'ndjson':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line), None
+            except ValueError as e:
+                yield number, None, f"Invalid JSON: {e}"
+    else:
+        raise ValueError(f"Unknown import format {fmt!r}")
+
+
+def _split(value):
+    """List column value: a JSON list as-is, a CSV cell split on |."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [part.strip() for part in str(value).split(LIST_SEPARATOR) if part.strip()]
+
+
+def _text(value):
+    value = str(value).strip() if value is not None else ''
+    return value or None
+
+
+def _int(value, field):
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f"{field} must be a whole number, got {value!r}")
+
+
+def _choice(value, choices, field):
+    value = _text(value)
+    if value not in choices:
+        raise RowError(f"{field} must be one of {', '.join(choices)}, got {value!r}")
+    return value
+
+
+def _lookup_ids(values, known, field):
+    ids = []
+    for name in _split(values):
+        key = str(name).strip().casefold()
+        if key not in known:
+            raise RowError(f"Unknown {field} {name!r}")
+        ids.append(known[key])
+    return list(dict.fromkeys(ids))
+
+
+def _cast(entries):
+    cast = []
+    for entry in _split(entries):
+        if isinstance(entry, dict):
+            name, role = entry.get('Name'), entry.get('Role')
+        else:
+            name, _, role = str(entry).partition('=')
+        name, role = _text(name), _text(role) or 'Actor'
+        if not name:
+            raise RowError("Cast entries need a Name")
+        cast.append((name, role))
+    return list(dict.fromkeys(cast))
+
+
+def _images(entries):
+    rows = []
+    for position, entry in enumerate(_split(entries)):
+        if isinstance(entry, dict):
+            url, caption, kind, sort_order = (entry.get('ImageUrl'), entry.get('Caption'),
+                                              entry.get('Type'), entry.get('SortOrder'))
+        else:
+            kind, _, url = str(entry).partition('=')
+            caption, sort_order = None, None
+        url = _text(url)
+        if not url:
+            raise RowError("Images need an ImageUrl")
+        sort_order = _int(sort_order, 'Image SortOrder')
+        rows.append((url, _text(caption), position if sort_order is None else sort_order,
+                     _choice(kind, IMAGE_TYPES, 'Image Type')))
+    return rows
+
+
+def _videos(entries):
+    rows = []
+    for position, entry in enumerate(_split(entries)):
+        if isinstance(entry, dict):
+            url, title, kind = entry.get('VideoUrl'), entry.get('Title'), entry.get('Type')
+            duration, thumbnail, sort_order = (entry.get('DurationSeconds'), entry.get('ThumbnailUrl'),
+                                               entry.get('SortOrder'))
+        else:
+            kind, _, rest = str(entry).partition('=')
+            title, _, url = rest.partition('=')
+            duration, thumbnail, sort_order = None, None, None
+        url, title = _text(url), _text(title)
+        if not url or not title:
+            raise RowError("Videos need a VideoUrl and a Title")
+        sort_order = _int(sort_order, 'Video SortOrder')
+        rows.append((url, title, _int(duration, 'Video DurationSeconds'), _text(thumbnail),
+                     position if sort_order is None else sort_order,
+                     _choice(kind, VIDEO_TYPES, 'Video Type')))
+    return rows
+
+
+def parse_record(record, genres, platforms):
+    """Validate one raw record into the rows to insert.
+
+    genres and platforms map case-folded names to ids. Raises RowError.
+    """
+    if not isinstance(record, dict):
+        raise RowError("Expected an object with media fields")
+    if record.get('deleted') is True:
+        raise RowError("Deletion record from an incremental export, nothing to import")
+
+    title = _text(record.get('Title'))
+    if not title:
+        raise RowError("Title is required")
+    release_date = _text(record.get('ReleaseDate'))
+    if release_date:
+        try:
+            release_date = date.fromisoformat(release_date[:10])
+        except ValueError:
+            raise RowError(f"ReleaseDate must be YYYY-MM-DD, got {release_date!r}")
+
+    return {
+        'media': (title, _text(record.get('Synopsis')),
+                  _choice(record.get('MediaType'), MEDIA_TYPES, 'MediaType'),
+                  release_date, _int(record.get('DurationMinutes'), 'DurationMinutes')),
+        'genres': _lookup_ids(record.get('genres'), genres, 'genre'),
+        'platforms': _lookup_ids(record.get('platforms'), platforms, 'platform'),
+        'cast': _cast(record.get('cast')),
+        'images': _images(record.get('images')),
+        'videos': _videos(record.get('videos')),
+    }
+
+
+def person_key(name):
+    """Case- and accent-insensitive form of a name, matching the person.Name
+    collation (utf8mb4_0900_ai_ci), so "Zoë" and "zoe" are the same person."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def _find_people(cur, names):
+    placeholders = ", ".join(["%s"] * len(names))
+    cur.execute(f"""
+        SELECT PersonID, Name FROM person
+        WHERE Name IN ({placeholders})
+        ORDER BY PersonID
+    """, list(names))
+    found = {}
+    for row in cur.fetchall():
+        # The oldest person wins when several share a name
+        found.setdefault(person_key(row['Name']), row['PersonID'])
+    return found
+
+
+def resolve_people(cur, names):
+    """Map person_key(name) to PersonIDs, creating the people not found.
+
+    One SELECT finds the existing people; the missing ones are inserted in
+    a single statement and read back with a second SELECT.
+    """
+    if not names:
+        return {}
+    found = _find_people(cur, set(names))
+    missing = {}
+    for name in names:
+        if person_key(name) not in found:
+            missing.setdefault(person_key(name), name)
+    if missing:
+        cur.executemany("INSERT INTO person (Name) VALUES (%s)", [(name,) for name in missing.values()])
+        found.update(_find_people(cur, set(missing.values())))
+    return found
+
+
+def _insert_batch(cur, rows):
+    """Insert parsed records and their links; returns the new MediaIDs."""
+    people = resolve_people(cur, [name for row in rows for name, _ in row['cast']])
+
+    media_ids = []
+    genre_links, platform_links, cast_links, image_rows, video_rows = [], [], [], [], []
+    for row in rows:
+        cur.execute("""
+            INSERT INTO media (Title, Synopsis, MediaType, ReleaseDate, DurationMinutes)
+            VALUES (%s, %s, %s, %s, %s)
+        """, row['media'])
+        media_id = cur.lastrowid
+        media_ids.append(media_id)
+        genre_links.extend((media_id, genre_id) for genre_id in row['genres'])
+        platform_links.extend((media_id, platform_id) for platform_id in row['platforms'])
+        cast_links.extend(dict.fromkeys((media_id, people[person_key(name)], role)
+                                        for name, role in row['cast']))
+        image_rows.extend((media_id,) + image for image in row['images'])
+        video_rows.extend((media_id,) + video for video in row['videos'])
+
+    if genre_links:
+        cur.executemany("INSERT INTO media_genre (MediaID, GenreID) VALUES (%s, %s)", genre_links)
+    if platform_links:
+        cur.executemany("INSERT INTO media_platform (MediaID, PlatformID) VALUES (%s, %s)", platform_links)
+    if cast_links:
+        cur.executemany("INSERT INTO media_person_role (MediaID, PersonID, Role) VALUES (%s, %s, %s)",
+                        cast_links)
+    if image_rows:
+        cur.executemany("""
+            INSERT INTO mediaimage (MediaID, ImageUrl, Caption, SortOrder, Type)
+            VALUES (%s, %s, %s, %s, %s)
+        """, image_rows)
+    if video_rows:
+        cur.executemany("""
+            INSERT INTO mediavideo (MediaID, VideoUrl, Title, DurationSeconds, ThumbnailUrl, SortOrder, Type)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, video_rows)
+
+    if image_rows:
+        images.rebuild_primary_images(cur, media_ids)
+    versions.bump_many(cur, media_ids)
+    return media_ids
+
+
+def _write_batch(connection, cur, batch, report):
+    """Commit a batch of (row number, parsed record); on failure retry row by row."""
+    try:
+        media_ids = _insert_batch(cur, [row for _, row in batch])
+        connection.commit()
+    except pymysql.MySQLError as e:
+        connection.rollback()
+        if len(batch) == 1:
+            report.errors.append((batch[0][0], str(e)))
+            return
+        for item in batch:
+            _write_batch(connection, cur, [item], report)
+        return
+    report.media_ids.extend(media_ids)
+
+
+def import_media(connection, records, batch_size=DEFAULT_BATCH_SIZE):
+    """Import (row number, record, error) tuples from read_records.
+
+    Commits once per batch_size valid records and returns an ImportReport.
+    """
+    started = time.perf_counter()
+    report = ImportReport()
+    cur = connection.cursor()
+    try:
+        cur.execute("SELECT GenreID, GenreName FROM genre")
+        genres = {row['GenreName'].casefold(): row['GenreID'] for row in cur.fetchall()}
+        cur.execute("SELECT PlatformID, PlatformName FROM platform")
+        platforms = {row['PlatformName'].casefold(): row['PlatformID'] for row in cur.fetchall()}
+
+        batch = []
+        for number, record, error in records:
+            report.rows += 1
+            try:
+                if error:
+                    raise RowError(error)
+                batch.append((number, parse_record(record, genres, platforms)))
+            except RowError as e:
+                report.errors.append((number, str(e)))
+            if len(batch) >= batch_size:
+                _write_batch(connection, cur, batch, report)
+                batch = []
+        if batch:
+            _write_batch(connection, cur, batch, report)
+    finally:
+        cur.close()
+    report.elapsed = time.perf_counter() - started
+    return report
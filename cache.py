@@ -0,0 +1,153 @@
+"""
+Read-through cache for Sirene.
+
+ResponseCache sits in front of a pluggable backend: an in-process LRU with
+TTLs (the default) or Redis for deployments running several workers. Keys are
+namespaced with a "<namespace>:" prefix so whole groups of entries can be
+invalidated at once, and hits/misses are counted per namespace.
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Size-bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """Shared Redis store; values are pickled and expire via Redis TTLs."""
+
+    def __init__(self, url, key_prefix='sirene:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        raw = self._client.get(self.key_prefix + key)
+        return _MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.key_prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self._client.delete(self.key_prefix + key)
+
+    def delete_prefix(self, prefix):
+        keys = list(self._client.scan_iter(match=self.key_prefix + prefix + '*', count=500))
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        self.delete_prefix('')
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.key_prefix + '*', count=500))
+
+
+class ResponseCache:
+    """Read-through cache with namespace invalidation and hit/miss counters."""
+
+    def __init__(self, backend, default_ttl=60):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+
+    def get_or_set(self, key, loader, ttl=None, version=None):
+        """Return the cached value for key, calling loader() to fill it on a miss.
+
+        With version, an entry stored for another version counts as a miss,
+        so a worker never serves a value older than the version it reports.
+        """
+        namespace = key.split(':', 1)[0]
+        entry = self.backend.get(key)
+        if entry is not _MISSING and isinstance(entry, tuple) and entry[0] == version:
+            self._hits[namespace] += 1
+            return entry[1]
+
+        self._misses[namespace] += 1
+        value = loader()
+        self.backend.set(key, (version, value), ttl if ttl is not None else self.default_ttl)
+        return value
+
+    def delete(self, key):
+        """Drop a single entry."""
+        self.backend.delete(key)
+
+    def invalidate(self, prefix):
+        """Drop every entry whose key starts with prefix (e.g. 'home:')."""
+        self.backend.delete_prefix(prefix)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        namespaces = sorted(set(self._hits) | set(self._misses))
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'namespaces': {
+                ns: {'hits': self._hits[ns], 'misses': self._misses[ns]}
+                for ns in namespaces
+            },
+            'hits': sum(self._hits.values()),
+            'misses': sum(self._misses.values()),
+        }
+
+
+def create_cache(backend='memory', redis_url=None, default_ttl=60, max_entries=1024):
+    """Build a ResponseCache for the configured backend name."""
+    if backend == 'redis':
+        return ResponseCache(RedisBackend(redis_url or 'redis://localhost:6379/0'), default_ttl)
+    if backend == 'memory':
+        return ResponseCache(MemoryBackend(max_entries), default_ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,315 @@
+"""
+Pooled MySQL connections for Sirene.
+
+PooledMySQL is a drop-in for flask_mysqldb.MySQL: routes keep calling
+mysql.connection.cursor(), but the connection is checked out of a
+per-process pool on first use in a request and handed back (rolled back)
+when the app context tears down, instead of being opened and closed each
+time. Idle connections are pinged before reuse, closed after sitting idle
+too long, and checkout gives up with PoolTimeout when the pool is exhausted.
+The first checkout in each process opens the pool's minimum connections, so
+POOL_MIN_SIZE applies under any WSGI server, not only `python app.py`.
+
+Regular connections never accept multi-statement batches. Code that sends
+one (the media detail loader) borrows a connection from a separate batch
+pool opened with CLIENT.MULTI_STATEMENTS for just that block.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+from pymysql import cursors
+from pymysql.constants import CLIENT
+from flask import g
+
+log = logging.getLogger('sirene.db')
+
+class PoolTimeout(Exception):
+    """No connection became free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of PyMySQL connections."""
+
+    def __init__(self, connect, min_size=2, max_size=10, timeout=5.0,
+                 idle_timeout=300, ping_interval=30):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()   # (connection, last_used); right end is most recent
+        self._size = 0         # open connections, idle or checked out
+        self._pid = os.getpid()
+        self._warmed = False
+
+        self._in_use = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def warm(self):
+        """Open connections until min_size are available. Returns how many were opened."""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return opened
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+            opened += 1
+
+    def acquire(self):
+        """Check out a live connection, waiting up to `timeout` seconds for one."""
+        self._warm_once()
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        while True:
+            conn = last_used = None
+            with self._cond:
+                self._check_fork()
+                self._evict_idle()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No MySQL connection free after {self.timeout}s")
+                    waited = True
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif time.monotonic() - last_used > self.ping_interval and not self._alive(conn):
+                # Server closed it (wait_timeout, restart): drop it and try again
+                self._discard(conn)
+                continue
+
+            wait = time.monotonic() - started if waited else 0.0
+            with self._cond:
+                self._in_use += 1
+                self._checkouts += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            return conn
+
+    def release(self, conn):
+        """Return a connection, rolling back anything left uncommitted."""
+        with self._cond:
+            self._in_use -= 1
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._check_fork():
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiters': self._waiters,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'wait_avg_ms': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+    def _warm_once(self):
+        with self._cond:
+            self._check_fork()
+            if self._warmed:
+                return
+            self._warmed = True
+        try:
+            self.warm()
+        except Exception as e:
+            # Not fatal: checkout opens connections as needed and reports its own errors
+            log.warning("Could not open %d pooled MySQL connections up front: %s", self.min_size, e)
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _alive(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _evict_idle(self):
+        # Oldest idle connections sit at the left; keep at least min_size open
+        now = time.monotonic()
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0][1] > self.idle_timeout):
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._discarded += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _check_fork(self):
+        # Sockets inherited from a parent process must not be shared; start over
+        if self._pid == os.getpid():
+            return False
+        self._pid = os.getpid()
+        self._idle.clear()
+        self._size = self._in_use = 0
+        self._warmed = False
+        return True
+
+
+class PooledMySQL:
+    """flask_mysqldb-compatible extension backed by a ConnectionPool."""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.pool = None
+        self.batch_pool = None
+        # Optional callable that wraps each checked-out connection (e.g. instrumentation)
+        self.wrap_connection = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MYSQL_HOST', 'localhost')
+        app.config.setdefault('MYSQL_USER', None)
+        app.config.setdefault('MYSQL_PASSWORD', None)
+        app.config.setdefault('MYSQL_DB', None)
+        app.config.setdefault('MYSQL_PORT', 3306)
+        app.config.setdefault('MYSQL_CONNECT_TIMEOUT', 10)
+        app.config.setdefault('MYSQL_CHARSET', 'utf8mb4')
+        app.config.setdefault('MYSQL_CURSORCLASS', None)
+        app.config.setdefault('MYSQL_CUSTOM_OPTIONS', None)
+        app.config.setdefault('MYSQL_POOL_MIN_SIZE', 2)
+        app.config.setdefault('MYSQL_POOL_MAX_SIZE', 10)
+        app.config.setdefault('MYSQL_POOL_TIMEOUT', 5.0)
+        app.config.setdefault('MYSQL_POOL_IDLE_TIMEOUT', 300)
+        app.config.setdefault('MYSQL_POOL_PING_INTERVAL', 30)
+        app.config.setdefault('MYSQL_BATCH_POOL_MAX_SIZE', 4)
+
+        config = app.config
+        self.pool = ConnectionPool(lambda: pymysql.connect(**self._connect_kwargs(config)),
+                                   min_size=config['MYSQL_POOL_MIN_SIZE'],
+                                   max_size=config['MYSQL_POOL_MAX_SIZE'],
+                                   timeout=config['MYSQL_POOL_TIMEOUT'],
+                                   idle_timeout=config['MYSQL_POOL_IDLE_TIMEOUT'],
+                                   ping_interval=config['MYSQL_POOL_PING_INTERVAL'])
+        # Opened on demand only; see batch_connection()
+        self.batch_pool = ConnectionPool(lambda: pymysql.connect(**self._connect_kwargs(config, multi_statements=True)),
+                                         min_size=0,
+                                         max_size=config['MYSQL_BATCH_POOL_MAX_SIZE'],
+                                         timeout=config['MYSQL_POOL_TIMEOUT'],
+                                         idle_timeout=config['MYSQL_POOL_IDLE_TIMEOUT'],
+                                         ping_interval=config['MYSQL_POOL_PING_INTERVAL'])
+        app.teardown_appcontext(self.teardown)
+
+    def _connect_kwargs(self, config, multi_statements=False):
+        kwargs = {
+            'host': config['MYSQL_HOST'],
+            'user': config['MYSQL_USER'],
+            'password': config['MYSQL_PASSWORD'],
+            'database': config['MYSQL_DB'],
+            'port': config['MYSQL_PORT'],
+            'connect_timeout': config['MYSQL_CONNECT_TIMEOUT'],
+            'charset': config['MYSQL_CHARSET'],
+        }
+        if config['MYSQL_CURSORCLASS']:
+            kwargs['cursorclass'] = getattr(cursors, config['MYSQL_CURSORCLASS'])
+        if config['MYSQL_CUSTOM_OPTIONS']:
+            kwargs.update(config['MYSQL_CUSTOM_OPTIONS'])
+        if multi_statements:
+            kwargs['client_flag'] = kwargs.get('client_flag', 0) | CLIENT.MULTI_STATEMENTS
+        return kwargs
+
+    @property
+    def connection(self):
+        """The connection checked out for the current app context."""
+        if 'mysql_db' not in g:
+            g.mysql_db = self.pool.acquire()
+            g.mysql_conn = self.wrap_connection(g.mysql_db) if self.wrap_connection else g.mysql_db
+        return g.mysql_conn
+
+    @contextmanager
+    def batch_connection(self):
+        """A connection that accepts multi-statement batches, returned when the block ends."""
+        conn = self.batch_pool.acquire()
+        try:
+            yield self.wrap_connection(conn) if self.wrap_connection else conn
+        finally:
+            self.batch_pool.release(conn)
+
+    def warm(self):
+        """Open the pool's minimum connections now rather than on the first checkout."""
+        return self.pool.warm()
+
+    def stats(self):
+        return dict(self.pool.stats(), batch=self.batch_pool.stats())
+
+    def teardown(self, exception):
+        g.pop('mysql_conn', None)
+        conn = g.pop('mysql_db', None)
+        if conn is not None:
+            self.pool.release(conn)
@@ -0,0 +1,43 @@
+"""
+In-process change events for Sirene.
+
+Write paths describe what they changed as ChangeEvents and publish them once
+the transaction has committed; the in-process indexes and caches subscribe
+and apply just that change instead of re-reading or dropping everything
+about the media item. Events are delivered synchronously, in order, to
+every subscriber of their relation.
+"""
+
+import threading
+from collections import namedtuple
+
+# added/removed are tuples of (id, name) pairs for the linked rows
+ChangeEvent = namedtuple('ChangeEvent', ['media_id', 'relation', 'added', 'removed'])
+
+
+class EventBus:
+    """Relation name -> subscribed handlers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}
+
+    def subscribe(self, relations, handler):
+        """Call handler(event) for every event on one of the given relations."""
+        with self._lock:
+            for relation in relations:
+                self._handlers.setdefault(relation, []).append(handler)
+
+    def publish(self, events):
+        """Deliver events to their subscribers; call after committing.
+
+        A failing handler is logged and does not stop the others.
+        """
+        for event in events:
+            with self._lock:
+                handlers = list(self._handlers.get(event.relation, ()))
+            for handler in handlers:
+                try:
+                    handler(event)
+                except Exception as e:
+                    print(f"Error handling {event.relation} change for media {event.media_id}: {e}")
@@ -0,0 +1,120 @@
+"""
+Streaming NDJSON catalog export for Sirene.
+
+The whole catalog is read with one statement on a server-side (unbuffered)
+cursor: each media row carries its genres, platforms, cast, images and
+videos as JSON aggregates from correlated subqueries, so rows can be turned
+into JSON lines and written out one at a time while MySQL is still sending
+the rest. Memory use does not grow with the catalog. Passing updated_since
+limits the export to media whose media_version changed at or after that
+time, for incremental syncs. Deleting a media item drops its media_version
+row with it, so deletions are recorded in media_tombstone instead and an
+incremental export ends with a {"MediaID": .., "deleted": true} record for
+each item deleted since then.
+"""
+
+import json
+
+from pymysql import cursors
+
+EXPORT_QUERY = """
+    SELECT m.*,
+           mr.AvgRating as avg_rating,
+           COALESCE(mr.RatingCount, 0) as review_count,
+           mv.Version as version,
+           mv.UpdatedAt as updated_at,
+           (SELECT JSON_ARRAYAGG(g.GenreName)
+            FROM media_genre mg JOIN genre g ON mg.GenreID = g.GenreID
+            WHERE mg.MediaID = m.MediaID) as genres,
+           (SELECT JSON_ARRAYAGG(p.PlatformName)
+            FROM media_platform mp JOIN platform p ON mp.PlatformID = p.PlatformID
+            WHERE mp.MediaID = m.MediaID) as platforms,
+           (SELECT JSON_ARRAYAGG(JSON_OBJECT('PersonID', p.PersonID, 'Name', p.Name, 'Role', mpr.Role))
+            FROM media_person_role mpr JOIN person p ON mpr.PersonID = p.PersonID
+            WHERE mpr.MediaID = m.MediaID) as `cast`,
+           (SELECT JSON_ARRAYAGG(JSON_OBJECT('ImageID', i.ImageID, 'ImageUrl', i.ImageUrl,
+                                             'Caption', i.Caption, 'Type', i.Type, 'SortOrder', i.SortOrder))
+            FROM mediaimage i
+            WHERE i.MediaID = m.MediaID) as images,
+           (SELECT JSON_ARRAYAGG(JSON_OBJECT('VideoID', v.VideoID, 'VideoUrl', v.VideoUrl, 'Title', v.Title,
+                                             'Type', v.Type, 'SortOrder', v.SortOrder))
+            FROM mediavideo v
+            WHERE v.MediaID = m.MediaID) as videos
+    FROM media m
+    LEFT JOIN media_rating mr ON m.MediaID = mr.MediaID
+    LEFT JOIN media_version mv ON m.MediaID = mv.MediaID
+    {where}
+    ORDER BY m.MediaID
+"""
+
+JSON_COLUMNS = ('genres', 'platforms', 'cast', 'images', 'videos')
+
+# Also in sirene.sql and migration 0005. No foreign key: the media row is gone.
+TOMBSTONE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS media_tombstone (
+        MediaID int NOT NULL,
+        DeletedAt timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (MediaID),
+        KEY DeletedAt (DeletedAt)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+
+def record_deletion(cur, media_id):
+    """Remember that a media item was deleted; run in the deleting transaction."""
+    cur.execute("""
+        INSERT INTO media_tombstone (MediaID, DeletedAt) VALUES (%s, NOW())
+        ON DUPLICATE KEY UPDATE DeletedAt = NOW()
+    """, [media_id])
+
+
+def export_started(cur):
+    """Database time to pass as updated_since on the next incremental export."""
+    cur.execute("SELECT NOW() as now")
+    return cur.fetchone()['now']
+
+
+def iter_media(connection, updated_since=None):
+    """Yield one export record (dict) per media item, streamed from the server.
+
+    With updated_since, deletion records for media deleted since then follow
+    the media. Nothing else may run on the connection until the generator
+    finishes.
+    """
+    where = 'WHERE mv.UpdatedAt >= %s' if updated_since else ''
+    cur = connection.cursor(cursors.SSDictCursor)
+    try:
+        cur.execute(EXPORT_QUERY.format(where=where), [updated_since] if updated_since else [])
+        for row in cur:
+            for column in JSON_COLUMNS:
+                row[column] = json.loads(row[column]) if row[column] else []
+            if row['avg_rating'] is not None:
+                row['avg_rating'] = float(row['avg_rating'])
+            yield row
+    finally:
+        # Drains any rows left unread (e.g. the client went away) so the
+        # connection can be reused
+        cur.close()
+    if updated_since:
+        yield from iter_deletions(connection, updated_since)
+
+
+def iter_deletions(connection, deleted_since):
+    """Yield a deletion record per media item deleted at or after deleted_since."""
+    cur = connection.cursor(cursors.SSDictCursor)
+    try:
+        cur.execute("""
+            SELECT MediaID, DeletedAt FROM media_tombstone
+            WHERE DeletedAt >= %s
+            ORDER BY MediaID
+        """, [deleted_since])
+        for row in cur:
+            yield {'MediaID': row['MediaID'], 'deleted': True, 'deleted_at': row['DeletedAt']}
+    finally:
+        cur.close()
+
+
+def iter_ndjson(connection, updated_since=None):
+    """Yield the export as newline-delimited JSON lines."""
+    for row in iter_media(connection, updated_since):
+        yield json.dumps(row, default=str, separators=(',', ':')) + '\n'
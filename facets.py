@@ -0,0 +1,307 @@
+"""
+In-process faceted browse index for Sirene.
+
+Holds, for every media item, its type, genres and platforms as posting sets
+(facet value -> set of MediaIDs), plus the catalog pre-sorted for each browse
+order. A browse request intersects the postings in memory, picks the page of
+MediaIDs in sort order and only that page is hydrated from MySQL. The index
+is built once and then kept current by the admin routes and reviews, which
+refresh the one media item they changed.
+"""
+
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import date
+from itertools import islice
+
+import pagination
+
+FACETS = ('type', 'genre', 'platform')
+
+SORTS = ('recent', 'rating', 'title')
+
+MEDIA_QUERY = """
+    SELECT m.MediaID, m.Title, m.MediaType, m.ReleaseDate,
+           mr.AvgRating, mr.RatingCount
+    FROM media m
+    LEFT JOIN media_rating mr ON m.MediaID = mr.MediaID
+    {where}
+"""
+
+# Link table aliased as l in both, so one WHERE clause fits either
+LINK_QUERIES = {
+    'genre': """
+        SELECT l.MediaID, g.GenreName as value
+        FROM media_genre l
+        JOIN genre g ON l.GenreID = g.GenreID
+        {where}
+    """,
+    'platform': """
+        SELECT l.MediaID, p.PlatformName as value
+        FROM media_platform l
+        JOIN platform p ON l.PlatformID = p.PlatformID
+        {where}
+    """,
+}
+
+# When the matches are at least this share of the catalog, walking the
+# pre-sorted order is cheaper than sorting the matches
+DENSE_FRACTION = 8
+
+
+def sort_keys(row):
+    """Ascending sort key per browse order; each ends in the MediaID so it is unique."""
+    released = row['ReleaseDate'].toordinal() if row['ReleaseDate'] else date.min.toordinal()
+    return {
+        # Newest first
+        'recent': (-released, -row['MediaID']),
+        'rating': rating_key(row['MediaID'], row['AvgRating'], row['RatingCount']),
+        'title': (row['Title'].casefold(), row['MediaID']),
+    }
+
+
+def rating_key(media_id, avg_rating, rating_count):
+    """Sort key for the rating order: best average first, then most reviewed."""
+    rating = float(avg_rating) if avg_rating is not None else -1.0
+    return (-rating, -(rating_count or 0), -media_id)
+
+
+# Types a decoded cursor must hold for each sort
+_CURSOR_TYPES = {
+    'recent': (int, int),
+    'rating': ((int, float), int, int),
+    'title': (str, int),
+}
+
+
+class FacetIndex:
+    """Posting sets per facet value plus per-sort orderings of the catalog."""
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self.loaded_at = None
+        self._instance = os.urandom(4).hex()
+        self._changes = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._media = {}   # MediaID -> {facet: set of values}
+        self._postings = {facet: defaultdict(set) for facet in FACETS}
+        self._keys = {sort: {} for sort in SORTS}     # sort -> {MediaID: sort key}
+        self._order = {sort: [] for sort in SORTS}    # sort -> sorted [(sort key, MediaID)]
+
+    @property
+    def generation(self):
+        """Changes whenever the index does, and differs between processes.
+
+        Conditional responses built from the index put it in their ETag: a
+        worker whose index lags behind the database must not answer with
+        the ETag of a fresher worker's body.
+        """
+        return f"{self._instance}.{self._changes}"
+
+    @property
+    def stale(self):
+        if self.loaded_at is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self.loaded_at > self.max_age
+
+    def load(self, cur):
+        """(Re)build the whole index from the database."""
+        rows, links = self._fetch(cur)
+        with self._lock:
+            self._changes += 1
+            self._reset()
+            for row in rows:
+                self._add(row, links.get(row['MediaID'], {}))
+            for sort in SORTS:
+                self._order[sort] = sorted((key, media_id) for media_id, key in self._keys[sort].items())
+            self.loaded_at = time.monotonic()
+
+    def refresh(self, cur, media_id):
+        """Re-read one media item, adding, updating or dropping it."""
+        rows, links = self._fetch(cur, media_id)
+        with self._lock:
+            self._changes += 1
+            self._discard(media_id)
+            for row in rows:
+                self._add(row, links.get(media_id, {}))
+                for sort in SORTS:
+                    insort(self._order[sort], (self._keys[sort][media_id], media_id))
+
+    def update_ratings(self, media_ids, ratings):
+        """Move media items in the rating order after their reviews changed.
+
+        ratings maps MediaID -> media_rating row (see ratings.load_ratings);
+        media missing from it have no reviews. Nothing is read from MySQL.
+        """
+        with self._lock:
+            self._changes += 1
+            keys = self._keys['rating']
+            order = self._order['rating']
+            for media_id in media_ids:
+                if media_id not in self._media:
+                    continue
+                row = ratings.get(media_id) or {}
+                key = rating_key(media_id, row.get('AvgRating'), row.get('RatingCount'))
+                if keys[media_id] == key:
+                    continue
+                _remove_entry(order, keys[media_id], media_id)
+                keys[media_id] = key
+                insort(order, (key, media_id))
+
+    def remove(self, media_id):
+        with self._lock:
+            self._changes += 1
+            self._discard(media_id)
+
+    def invalidate(self):
+        """Mark the index stale so the next request rebuilds it."""
+        self.loaded_at = None
+
+    def apply_change(self, event):
+        """Apply a genre or platform link change (an events.ChangeEvent) in place."""
+        if event.relation not in FACETS:
+            return
+        with self._lock:
+            self._changes += 1
+            values = self._media.get(event.media_id)
+            if values is None:
+                return
+            postings = self._postings[event.relation]
+            for _, name in event.removed:
+                values[event.relation].discard(name)
+                postings[name].discard(event.media_id)
+            for _, name in event.added:
+                values[event.relation].add(name)
+                postings[name].add(event.media_id)
+
+    def __len__(self):
+        return len(self._media)
+
+    def values(self, facet):
+        """Facet values that have at least one media item, sorted."""
+        with self._lock:
+            return sorted(value for value, ids in self._postings[facet].items() if ids)
+
+    def counts(self, selection, within=None, single=()):
+        """Result counts for every facet value under the current selection.
+
+        A genre's count is what the selection would return with that genre
+        added. Types and platforms are either-or, so their counts ignore the
+        selection's own values for that facet; so do the facets listed in
+        single (e.g. a genre dropdown that picks one value at a time). within
+        optionally restricts everything to a set of MediaIDs (e.g. full-text
+        matches). Returns {'total': n, facet: [(value, count), ...]} with
+        values sorted.
+        """
+        with self._lock:
+            matched = self._match(selection, within)
+            result = {'total': len(self._media) if matched is None else len(matched)}
+            for facet in FACETS:
+                if facet == 'genre' and facet not in single:
+                    base = matched
+                else:
+                    base = self._match({**selection, facet: ()}, within)
+                result[facet] = [(value, len(ids) if base is None else len(base & ids))
+                                 for value, ids in sorted(self._postings[facet].items()) if ids]
+        return result
+
+    def page(self, selection, sort='recent', limit=50, cursor=None):
+        """One page of MediaIDs matching the selection, in sort order.
+
+        selection maps facet names to lists of values: media must have every
+        selected genre and any one of the selected types and platforms.
+        Returns (media_ids, next_cursor); next_cursor is None on the last page.
+        """
+        after = self._decode(sort, cursor)
+        with self._lock:
+            matched = self._match(selection)
+            order = self._order[sort]
+            keys = self._keys[sort]
+            # Keys are unique and end in the MediaID, so this skips the cursor's own entry
+            start = bisect_right(order, (after, float('inf'))) if after else 0
+
+            if matched is None:
+                ids = [media_id for _, media_id in order[start:start + limit + 1]]
+            elif len(matched) * DENSE_FRACTION >= len(order):
+                ids = list(islice((media_id for _, media_id in islice(order, start, None)
+                                   if media_id in matched), limit + 1))
+            else:
+                candidates = matched if after is None else (i for i in matched if keys[i] > after)
+                ids = heapq.nsmallest(limit + 1, candidates, key=keys.__getitem__)
+
+            next_cursor = None
+            if len(ids) > limit:
+                ids = ids[:limit]
+                next_cursor = pagination.encode_cursor(keys[ids[-1]])
+        return ids, next_cursor
+
+    def _match(self, selection, within=None):
+        """Set of matching MediaIDs, or None when nothing is filtered."""
+        sets = [] if within is None else [within]
+        for value in selection.get('genre', ()):
+            sets.append(self._postings['genre'].get(value, set()))
+        for facet in ('type', 'platform'):
+            values = selection.get(facet)
+            if values:
+                postings = self._postings[facet]
+                sets.append(set().union(*(postings.get(value, set()) for value in values)))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def _decode(self, sort, cursor):
+        values = pagination.decode_cursor(cursor, len(_CURSOR_TYPES[sort]))
+        if values is None:
+            return None
+        if not all(isinstance(value, types) and not isinstance(value, bool)
+                   for value, types in zip(values, _CURSOR_TYPES[sort])):
+            return None
+        return tuple(values)
+
+    def _fetch(self, cur, media_id=None):
+        where = 'WHERE m.MediaID = %s' if media_id is not None else ''
+        params = [media_id] if media_id is not None else []
+        cur.execute(MEDIA_QUERY.format(where=where), params)
+        rows = cur.fetchall()
+
+        links = defaultdict(lambda: defaultdict(set))
+        for facet, sql in LINK_QUERIES.items():
+            cur.execute(sql.format(where='WHERE l.MediaID = %s' if media_id is not None else ''), params)
+            for link in cur.fetchall():
+                links[link['MediaID']][facet].add(link['value'])
+        return rows, links
+
+    def _add(self, row, links):
+        media_id = row['MediaID']
+        values = {'type': {row['MediaType']}, 'genre': set(links.get('genre', ())),
+                  'platform': set(links.get('platform', ()))}
+        self._media[media_id] = values
+        for facet, facet_values in values.items():
+            for value in facet_values:
+                self._postings[facet][value].add(media_id)
+        for sort, key in sort_keys(row).items():
+            self._keys[sort][media_id] = key
+
+    def _discard(self, media_id):
+        values = self._media.pop(media_id, None)
+        if values is None:
+            return
+        for facet, facet_values in values.items():
+            for value in facet_values:
+                self._postings[facet][value].discard(media_id)
+        for sort in SORTS:
+            _remove_entry(self._order[sort], self._keys[sort].pop(media_id), media_id)
+
+
+def _remove_entry(order, key, media_id):
+    position = bisect_left(order, (key, media_id))
+    if position < len(order) and order[position] == (key, media_id):
+        del order[position]
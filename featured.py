@@ -0,0 +1,110 @@
+"""
+Featured-media candidate pool for Sirene.
+
+Every media item with a primary backdrop is a featured candidate. The pool is
+loaded once with its rating and image URLs precomputed, so picking the hero
+slides is an O(k) random sample in Python instead of ORDER BY RAND() over the
+catalog. Optional weighting favours highly rated or recent titles.
+"""
+
+import random
+import threading
+import time
+from bisect import bisect_right
+from datetime import date
+from itertools import accumulate
+
+POOL_QUERY = """
+    SELECT m.*,
+           mpi.BackdropUrl as backdrop_url,
+           mpi.PosterUrl as poster_url,
+           mr.AvgRating as avg_rating
+    FROM media_primary_image mpi
+    JOIN media m ON m.MediaID = mpi.MediaID
+    LEFT JOIN media_rating mr ON m.MediaID = mr.MediaID
+    WHERE mpi.BackdropUrl IS NOT NULL
+"""
+
+WEIGHT_MODES = ('rating', 'recency')
+
+# Unrated titles are weighted as if they had this average
+DEFAULT_RATING = 5.0
+
+# A title released this many days ago has half the weight of a new release
+RECENCY_HALF_LIFE_DAYS = 365
+
+
+def _rating_weight(row):
+    rating = float(row['avg_rating']) if row['avg_rating'] is not None else DEFAULT_RATING
+    return max(rating, 1.0)
+
+
+def _recency_weight(row, today):
+    released = row['ReleaseDate']
+    if not released:
+        return 0.05
+    age_days = max((today - released).days, 0)
+    return max(0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS), 0.05)
+
+
+class FeaturedPool:
+    """In-memory list of featured candidates with precomputed sampling weights."""
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._items = []
+        self._cumulative = {}
+
+    @property
+    def stale(self):
+        if self.loaded_at is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self.loaded_at > self.max_age
+
+    def load(self, cur):
+        """Rebuild the pool from the database."""
+        cur.execute(POOL_QUERY)
+        items = list(cur.fetchall())
+        today = date.today()
+        cumulative = {
+            'rating': list(accumulate(_rating_weight(row) for row in items)),
+            'recency': list(accumulate(_recency_weight(row, today) for row in items)),
+        }
+        with self._lock:
+            self._items = items
+            self._cumulative = cumulative
+            self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Mark the pool stale so the next request reloads it."""
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def sample(self, k, weight=None, rng=random):
+        """Pick up to k distinct candidates, uniformly or weighted by rating/recency."""
+        with self._lock:
+            items = self._items
+            cumulative = self._cumulative.get(weight)
+        k = min(k, len(items))
+        if k == 0:
+            return []
+        if cumulative is None:
+            return rng.sample(items, k)
+
+        # Weighted draws by binary search on the cumulative weights; retry
+        # duplicates, with a bound so a skewed pool can't loop for long
+        total = cumulative[-1]
+        picked = {}
+        attempts = 0
+        while len(picked) < k and attempts < k * 20:
+            index = bisect_right(cumulative, rng.random() * total)
+            picked.setdefault(min(index, len(items) - 1), None)
+            attempts += 1
+        if len(picked) < k:
+            remaining = [i for i in range(len(items)) if i not in picked]
+            picked.update(dict.fromkeys(rng.sample(remaining, k - len(picked))))
+        return [items[i] for i in picked]
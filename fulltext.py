@@ -0,0 +1,148 @@
+"""
+Full-text media search for Sirene.
+
+Uses the MySQL FULLTEXT index on media(Title, Synopsis) with boolean-mode
+prefix matching, ranked by relevance and paginated with opaque cursors.
+Queries too short for the full-text index, or made only of stopwords, fall
+back to a title prefix match.
+"""
+
+import re
+
+import pagination
+
+PAGE_SIZE = 24
+
+# InnoDB ignores tokens shorter than innodb_ft_min_token_size (3 by default)
+MIN_TOKEN_LENGTH = 3
+
+# InnoDB's default full-text stopwords (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD).
+# They are not indexed, so requiring one ("+the*") can make a query match nothing.
+STOPWORDS = frozenset([
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what',
+    'when', 'where', 'who', 'will', 'with', 'und', 'www',
+])
+
+# Characters with special meaning in boolean-mode full-text queries
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+
+def build_boolean_query(query):
+    """Turn free text into a boolean-mode query requiring every word as a prefix.
+
+    Stopwords are kept as optional prefixes only. Returns None when no word
+    is long enough for the full-text index or every word is a stopword.
+    """
+    words = _BOOLEAN_OPERATORS.sub(' ', query).split()
+    words = [w for w in words if len(w) >= MIN_TOKEN_LENGTH]
+    if not any(w.lower() not in STOPWORDS for w in words):
+        return None
+    return ' '.join(f'{w}*' if w.lower() in STOPWORDS else f'+{w}*' for w in words)
+
+
+def search_media(cur, query='', media_type='', genre='', cursor=None, page_size=PAGE_SIZE):
+    """Search media by text, type and genre.
+
+    Returns (results, next_cursor). Each result has the same columns the
+    search page has always received (MediaID, Title, MediaType, Synopsis,
+    ReleaseDate, DurationMinutes, genres, poster_url); next_cursor is None on
+    the last page.
+    """
+    boolean_query = build_boolean_query(query) if query else None
+
+    if boolean_query:
+        # Relevance ranking; cast to DECIMAL so cursor comparisons are exact
+        sort_columns = ["CAST(MATCH(m.Title, m.Synopsis) AGAINST (%s IN BOOLEAN MODE) AS DECIMAL(14,6))",
+                        "m.MediaID"]
+        sort_params = [[boolean_query], []]
+        descending = [True, False]
+        where = ["MATCH(m.Title, m.Synopsis) AGAINST (%s IN BOOLEAN MODE)"]
+        where_params = [boolean_query]
+    elif query:
+        # Too short for the full-text index: match the start of the title
+        sort_columns = ["m.Title", "m.MediaID"]
+        sort_params = [[], []]
+        descending = [False, False]
+        where = ["m.Title LIKE %s"]
+        where_params = [escape_like(query) + '%']
+    else:
+        sort_columns = ["COALESCE(m.ReleaseDate, '0001-01-01')", "m.MediaID"]
+        sort_params = [[], []]
+        descending = [True, True]
+        where = ["1=1"]
+        where_params = []
+
+    if media_type:
+        where.append("m.MediaType = %s")
+        where_params.append(media_type)
+
+    if genre:
+        where.append("""EXISTS (SELECT 1 FROM media_genre fg
+                                JOIN genre fgn ON fg.GenreID = fgn.GenreID
+                                WHERE fg.MediaID = m.MediaID AND fgn.GenreName = %s)""")
+        where_params.append(genre)
+
+    after = pagination.decode_cursor(cursor, len(sort_columns))
+    if after:
+        seek_sql, seek_params = pagination.keyset_condition(sort_columns, after, descending, sort_params)
+        where.append(seek_sql)
+        where_params.extend(seek_params)
+
+    order_by = ", ".join(f"{c} {'DESC' if d else 'ASC'}" for c, d in zip(sort_columns, descending))
+    order_params = [p for params in sort_params for p in params]
+
+    # Rank and page on the narrow media table first, then decorate only the page
+    cur.execute(f"""
+        SELECT m.MediaID, m.Title, m.MediaType, m.Synopsis, m.ReleaseDate, m.DurationMinutes,
+               GROUP_CONCAT(DISTINCT g.GenreName) as genres,
+               mpi.PosterUrl as poster_url,
+               hits.sort_key
+        FROM (
+            SELECT m.MediaID, {sort_columns[0]} as sort_key
+            FROM media m
+            WHERE {' AND '.join(where)}
+            ORDER BY {order_by}
+            LIMIT %s
+        ) hits
+        JOIN media m ON m.MediaID = hits.MediaID
+        LEFT JOIN media_primary_image mpi ON m.MediaID = mpi.MediaID
+        LEFT JOIN media_genre mg ON m.MediaID = mg.MediaID
+        LEFT JOIN genre g ON mg.GenreID = g.GenreID
+        GROUP BY m.MediaID, hits.sort_key, mpi.PosterUrl
+        ORDER BY hits.sort_key {'DESC' if descending[0] else 'ASC'}, m.MediaID {'DESC' if descending[1] else 'ASC'}
+    """, sort_params[0] + where_params + order_params + [page_size + 1])
+    results = list(cur.fetchall())
+
+    next_cursor = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        last = results[-1]
+        next_cursor = pagination.encode_cursor([last['sort_key'], last['MediaID']])
+
+    for row in results:
+        row.pop('sort_key', None)
+
+    return results, next_cursor
+
+
+def matching_ids(cur, query):
+    """Set of MediaIDs matching the search text, or None when there is no text.
+
+    Uses the same full-text / title-prefix rule as search_media but reads
+    only ids, so facet counts can be computed from them in memory.
+    """
+    boolean_query = build_boolean_query(query) if query else None
+    if boolean_query:
+        cur.execute("SELECT MediaID FROM media WHERE MATCH(Title, Synopsis) AGAINST (%s IN BOOLEAN MODE)",
+                    [boolean_query])
+    elif query:
+        cur.execute("SELECT MediaID FROM media WHERE Title LIKE %s", [escape_like(query) + '%'])
+    else:
+        return None
+    return {row['MediaID'] for row in cur.fetchall()}
+
+
+def escape_like(value):
+    """Escape LIKE wildcards so value is matched literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
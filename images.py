@@ -0,0 +1,134 @@
+"""
+Primary poster/backdrop resolution for Sirene.
+
+Each media item has at most one designated poster and one designated
+backdrop, stored in `media_primary_image` together with their URLs so list
+queries can fetch both with a single primary-key join. The admin asset
+routes keep the designation up to date.
+"""
+
+PRIMARY_TYPES = ('Poster', 'Backdrop')
+
+# Also in sirene.sql and migration 0007
+TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS media_primary_image (
+        MediaID int NOT NULL,
+        PosterImageID int DEFAULT NULL,
+        PosterUrl varchar(255) DEFAULT NULL,
+        BackdropImageID int DEFAULT NULL,
+        BackdropUrl varchar(255) DEFAULT NULL,
+        PRIMARY KEY (MediaID),
+        KEY PosterImageID (PosterImageID),
+        KEY BackdropImageID (BackdropImageID),
+        CONSTRAINT media_primary_image_ibfk_1 FOREIGN KEY (MediaID) REFERENCES media (MediaID) ON DELETE CASCADE,
+        CONSTRAINT media_primary_image_ibfk_2 FOREIGN KEY (PosterImageID) REFERENCES mediaimage (ImageID) ON DELETE SET NULL,
+        CONSTRAINT media_primary_image_ibfk_3 FOREIGN KEY (BackdropImageID) REFERENCES mediaimage (ImageID) ON DELETE SET NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+
+def refresh_primary_images(cur, media_id):
+    """Re-resolve the designated poster and backdrop for one media item.
+
+    An existing designation is kept as long as the image still exists;
+    otherwise the image with the lowest SortOrder (then ImageID) wins, which
+    gives a stable choice when several candidates exist.
+    """
+    cur.execute("""
+        SELECT ImageID, ImageUrl, Type
+        FROM mediaimage
+        WHERE MediaID = %s AND Type IN ('Poster', 'Backdrop')
+        ORDER BY Type, SortOrder, ImageID
+    """, [media_id])
+    candidates = cur.fetchall()
+
+    cur.execute("""
+        SELECT PosterImageID, BackdropImageID
+        FROM media_primary_image
+        WHERE MediaID = %s
+    """, [media_id])
+    current = cur.fetchone() or {}
+
+    chosen = {}
+    for image_type in PRIMARY_TYPES:
+        of_type = [img for img in candidates if img['Type'] == image_type]
+        designated = current.get(f'{image_type}ImageID')
+        chosen[image_type] = next((img for img in of_type if img['ImageID'] == designated),
+                                  of_type[0] if of_type else None)
+
+    _store(cur, media_id, chosen['Poster'], chosen['Backdrop'])
+
+
+def set_primary_image(cur, media_id, image_id):
+    """Designate one of a media item's images as its primary poster or backdrop.
+
+    Returns the MediaID, or None if the image does not exist, belongs to
+    another media item or is not a poster/backdrop.
+    """
+    cur.execute("""
+        SELECT ImageID, MediaID, ImageUrl, Type
+        FROM mediaimage
+        WHERE ImageID = %s AND MediaID = %s
+    """, [image_id, media_id])
+    image = cur.fetchone()
+    if not image or image['Type'] not in PRIMARY_TYPES:
+        return None
+
+    column = image['Type']
+    cur.execute(f"""
+        INSERT INTO media_primary_image (MediaID, {column}ImageID, {column}Url)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE {column}ImageID = VALUES({column}ImageID), {column}Url = VALUES({column}Url)
+    """, (image['MediaID'], image['ImageID'], image['ImageUrl']))
+    return image['MediaID']
+
+
+def rebuild_primary_images(cur, media_ids=None):
+    """Recompute primary images from scratch (drops designations).
+
+    Covers every media item, or only media_ids when given (e.g. a bulk import).
+    """
+    if media_ids is not None:
+        if not media_ids:
+            return 0
+        placeholders = ", ".join(["%s"] * len(media_ids))
+        where = f"AND MediaID IN ({placeholders})"
+        cur.execute(f"DELETE FROM media_primary_image WHERE MediaID IN ({placeholders})", list(media_ids))
+    else:
+        where = ""
+        cur.execute("DELETE FROM media_primary_image")
+    cur.execute(f"""
+        INSERT INTO media_primary_image (MediaID, PosterImageID, PosterUrl, BackdropImageID, BackdropUrl)
+        SELECT MediaID,
+               MAX(CASE WHEN Type = 'Poster' THEN ImageID END),
+               MAX(CASE WHEN Type = 'Poster' THEN ImageUrl END),
+               MAX(CASE WHEN Type = 'Backdrop' THEN ImageID END),
+               MAX(CASE WHEN Type = 'Backdrop' THEN ImageUrl END)
+        FROM (
+            SELECT MediaID, ImageID, ImageUrl, Type,
+                   ROW_NUMBER() OVER (PARTITION BY MediaID, Type ORDER BY SortOrder, ImageID) as rn
+            FROM mediaimage
+            WHERE Type IN ('Poster', 'Backdrop') {where}
+        ) ranked
+        WHERE rn = 1
+        GROUP BY MediaID
+    """, list(media_ids) if media_ids else None)
+    return cur.rowcount
+
+
+def _store(cur, media_id, poster, backdrop):
+    if not poster and not backdrop:
+        cur.execute("DELETE FROM media_primary_image WHERE MediaID = %s", [media_id])
+        return
+
+    cur.execute("""
+        INSERT INTO media_primary_image (MediaID, PosterImageID, PosterUrl, BackdropImageID, BackdropUrl)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            PosterImageID = VALUES(PosterImageID), PosterUrl = VALUES(PosterUrl),
+            BackdropImageID = VALUES(BackdropImageID), BackdropUrl = VALUES(BackdropUrl)
+    """, (media_id,
+          poster['ImageID'] if poster else None,
+          poster['ImageUrl'] if poster else None,
+          backdrop['ImageID'] if backdrop else None,
+          backdrop['ImageUrl'] if backdrop else None))
@@ -8,10 +8,22 @@ import mysql.connector
 from mysql.connector import Error
 import sys
 import os
+import argparse
+import re
+import time
 from werkzeug.security import generate_password_hash
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from bisect import bisect_right
+from itertools import accumulate
 import random
 
+import images
+import migrations
+import ratings
+import trending
+import user_stats
+import versions
+
 def create_connection(host, user, password, database=None):
     """Create a database connection."""
     try:
@@ -26,25 +38,156 @@ def create_connection(host, user, password, database=None):
         print(f"Error connecting to MySQL: {e}")
         return None
 
-def execute_sql_file(connection, filepath):
-    """Execute SQL statements from a file."""
+# Quote characters and the regex matching the rest of a quoted run up to its closing quote
+_QUOTE_END = {q: re.compile(r"[^{0}\\]*(?:\\.[^{0}\\]*)*{0}".format(q), re.DOTALL) for q in ("'", '"', '`')}
+_TABLE_NAME = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|LOCK\s+TABLES|CREATE\s+TABLE|"
+    r"DROP\s+TABLE\s+IF\s+EXISTS|DROP\s+TABLE|ALTER\s+TABLE|/\*!\d*\s*ALTER\s+TABLE)\s+`?([\w$]+)`?",
+    re.IGNORECASE)
+
+
+def iter_sql_statements(lines):
+    """Yield complete SQL statements from an iterable of lines.
+
+    Understands single/double/backtick quotes (with backslash escapes), `--`
+    and `#` comments, plain `/* */` comments (dropped) and `/*! */` / `/*+ */`
+    directives (kept), and DELIMITER lines, so semicolons inside string
+    literals never split a statement. Only one statement is held in memory.
+    """
+    delimiter = ';'
+    special = re.compile(r"""['"`#]|--|/\*|;""")
+    parts = []
+    quote = None          # open quote character, if inside a quoted run
+    in_comment = False    # inside /* */
+    keep_comment = False  # the open /* */ is an executable directive
+
+    for line in lines:
+        stripped = line.strip()
+        if (stripped[:10].upper() == 'DELIMITER ' and not quote and not in_comment
+                and not ''.join(parts).strip()):
+            delimiter = stripped.split(None, 1)[1]
+            special = re.compile(r"""['"`#]|--|/\*|""" + re.escape(delimiter))
+            parts = []
+            continue
+
+        pos = 0
+        length = len(line)
+        while pos < length:
+            if in_comment:
+                end = line.find('*/', pos)
+                if end == -1:
+                    if keep_comment:
+                        parts.append(line[pos:])
+                    break
+                if keep_comment:
+                    parts.append(line[pos:end + 2])
+                pos = end + 2
+                in_comment = False
+
+            elif quote:
+                match = _QUOTE_END[quote].match(line, pos)
+                if match is None:
+                    # The literal continues on the next line
+                    parts.append(line[pos:])
+                    break
+                parts.append(line[pos:match.end()])
+                pos = match.end()
+                quote = None
+
+            else:
+                match = special.search(line, pos)
+                if match is None:
+                    parts.append(line[pos:])
+                    break
+                token = match.group()
+                parts.append(line[pos:match.start()])
+                pos = match.end()
+
+                if token == delimiter:
+                    statement = ''.join(parts).strip()
+                    parts = []
+                    if statement:
+                        yield statement
+                elif token in _QUOTE_END:
+                    parts.append(token)
+                    quote = token
+                elif token == '#' or (token == '--' and (pos >= length or line[pos].isspace())):
+                    # Comment to end of line; keep the newline so tokens stay apart
+                    parts.append('\n')
+                    break
+                elif token == '/*':
+                    in_comment = True
+                    keep_comment = line[pos:pos + 1] in ('!', '+')
+                    if keep_comment:
+                        parts.append(token)
+                else:
+                    parts.append(token)
+
+    statement = ''.join(parts).strip()
+    if statement:
+        yield statement
+
+
+def statement_table(statement):
+    """The table a dump statement works on (INSERT/CREATE/DROP/LOCK/ALTER), or None."""
+    match = _TABLE_NAME.match(statement)
+    return match.group(1) if match else None
+
+
+def execute_sql_file(connection, filepath, progress_interval=1.0):
+    """Execute SQL statements from a file, streaming it statement by statement.
+
+    Statements for one table run in a single transaction, committed when the
+    dump moves on to the next table (or at UNLOCK TABLES). Progress and
+    throughput are printed while loading.
+    """
     cursor = connection.cursor()
-    
+    total_bytes = os.path.getsize(filepath)
+    read_bytes = 0
+    executed = 0
+    current_table = None
+    started = last_report = time.perf_counter()
+
+    def report(final=False):
+        elapsed = time.perf_counter() - started
+        rate = read_bytes / elapsed / 1024 / 1024 if elapsed else 0
+        percent = read_bytes / total_bytes * 100 if total_bytes else 100
+        print(f"\r  {read_bytes / 1024 / 1024:,.1f} / {total_bytes / 1024 / 1024:,.1f} MB ({percent:.0f}%), "
+              f"{executed:,} statements, {rate:,.1f} MB/s", end='\n' if final else '', flush=True)
+
+    def lines(file):
+        nonlocal read_bytes
+        for raw in file:
+            read_bytes += len(raw)
+            yield raw.decode('utf-8')
+
+    statement = None
     try:
-        with open(filepath, 'r') as file:
-            sql_commands = file.read()
-            
-        # Split commands by semicolon and execute
-        for command in sql_commands.split(';'):
-            if command.strip():
-                cursor.execute(command)
-        
+        with open(filepath, 'rb') as file:
+            for statement in iter_sql_statements(lines(file)):
+                table = statement_table(statement)
+                if table and table != current_table:
+                    connection.commit()
+                    current_table = table
+
+                if statement.upper().startswith('UNLOCK TABLES'):
+                    connection.commit()
+                cursor.execute(statement)
+                executed += 1
+
+                if time.perf_counter() - last_report >= progress_interval:
+                    report()
+                    last_report = time.perf_counter()
+
         connection.commit()
+        report(final=True)
         print(f"Successfully executed SQL file: {filepath}")
         return True
-        
+
     except Error as e:
-        print(f"Error executing SQL file: {e}")
+        print(f"\nError executing SQL file (statement {executed + 1}): {e}")
+        if statement:
+            print(f"  {statement[:200]}{'...' if len(statement) > 200 else ''}")
         connection.rollback()
         return False
     finally:
@@ -120,6 +263,361 @@ def add_sample_data(connection):
     finally:
         cursor.close()
 
+# Synthetic catalog vocabulary; titles are "<adjective> <noun>[ <n>]"
+ADJECTIVES = ['Silent', 'Crimson', 'Broken', 'Hidden', 'Last', 'Golden', 'Burning', 'Endless',
+              'Frozen', 'Wild', 'Dark', 'Lost', 'Secret', 'Iron', 'Electric', 'Midnight',
+              'Shattered', 'Distant', 'Savage', 'Hollow', 'Scarlet', 'Eternal', 'Rogue', 'Neon']
+NOUNS = ['Empire', 'Horizon', 'Kingdom', 'Protocol', 'Garden', 'Frontier', 'Signal', 'Harbor',
+         'Legacy', 'Labyrinth', 'Eclipse', 'Odyssey', 'Requiem', 'Citadel', 'Paradox', 'Voyage',
+         'Tides', 'Machine', 'Covenant', 'Dynasty', 'Mirage', 'Spiral', 'Outpost', 'Reckoning']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Avery', 'Quinn',
+               'Jamie', 'Rowan', 'Emery', 'Kai', 'Noor', 'Ren', 'Sasha', 'Yuki', 'Mateo']
+LAST_NAMES = ['Park', 'Garcia', 'Nakamura', 'Okafor', 'Silva', 'Novak', 'Haddad', 'Kowalski',
+              'Lindqvist', 'Moreau', 'Rossi', 'Tanaka', 'Adeyemi', 'Fischer', 'Costa', 'Ivanova']
+COUNTRIES = ['USA', 'UK', 'Japan', 'South Korea', 'France', 'Germany', 'Brazil', 'Nigeria', 'India']
+COMMENTS = ['Loved it.', 'Not for me.', 'Better than I expected.', 'A bit slow in the middle.',
+            'Instant classic.', 'Great cast, weak ending.', 'Would watch again.', None, None, None]
+
+# Media type mix and, per type, how likely each genre is and which roles its cast plays
+MEDIA_TYPE_WEIGHTS = {'Movie': 45, 'TV Show': 25, 'Anime': 15, 'Video Game': 15}
+GENRE_WEIGHTS = {
+    'Movie': {'Drama': 30, 'Action': 25, 'Thriller': 20, 'Comedy': 20, 'Crime': 15, 'Adventure': 15,
+              'Superhero': 8, 'Satire': 5, 'Post-apocalyptic': 4, 'Dark Fantasy': 4},
+    'TV Show': {'Drama': 35, 'Crime': 20, 'Comedy': 20, 'Thriller': 15, 'Satire': 8, 'Superhero': 6,
+                'Action': 10, 'Post-apocalyptic': 5, 'Adventure': 5, 'Dark Fantasy': 4},
+    'Anime': {'Anime': 100, 'Action': 30, 'Adventure': 25, 'Dark Fantasy': 15, 'Drama': 15,
+              'Comedy': 10, 'Post-apocalyptic': 6},
+    'Video Game': {'Action': 35, 'Adventure': 30, 'Post-apocalyptic': 10, 'Dark Fantasy': 10,
+                   'Thriller': 8, 'Superhero': 6, 'Comedy': 4},
+}
+ROLE_WEIGHTS = {
+    'Movie': {'Actor': 70, 'Director': 8, 'Writer': 8, 'Producer': 8, 'Composer': 6},
+    'TV Show': {'Actor': 70, 'Director': 10, 'Writer': 10, 'Producer': 10},
+    'Anime': {'Voice Actor': 70, 'Director': 10, 'Writer': 10, 'Composer': 10},
+    'Video Game': {'Voice Actor': 50, 'Director': 15, 'Writer': 15, 'Composer': 20},
+}
+
+# Zipf exponents: a few titles get most reviews and a few people most credits
+MEDIA_POPULARITY_SKEW = 0.9
+PERSON_POPULARITY_SKEW = 0.8
+# Pareto shape for reviews per user (smaller = more skewed towards power users)
+USER_ACTIVITY_SHAPE = 1.3
+
+
+def weighted_picker(rng, weights):
+    """Return a function drawing one key of `weights` with probability proportional to its value."""
+    keys = list(weights)
+    cumulative = list(accumulate(weights[key] for key in keys))
+    total = cumulative[-1]
+    return lambda: keys[bisect_right(cumulative, rng.random() * total)]
+
+
+def zipf_picker(rng, ids, skew):
+    """Return a function drawing from `ids` with Zipf-distributed popularity.
+
+    Popularity ranks are shuffled so the popular ids are spread over the range.
+    """
+    ranks = list(range(1, len(ids) + 1))
+    rng.shuffle(ranks)
+    cumulative = list(accumulate(1 / rank ** skew for rank in ranks))
+    total = cumulative[-1]
+    last = len(ids) - 1
+    return lambda: ids[min(bisect_right(cumulative, rng.random() * total), last)]
+
+
+def distinct_draws(rng, draw, population, count):
+    """Draw `count` distinct values from draw(), topping up uniformly if it keeps repeating."""
+    count = min(count, len(population))
+    picked = set()
+    attempts = 0
+    while len(picked) < count and attempts < count * 10:
+        picked.add(draw())
+        attempts += 1
+    while len(picked) < count:
+        picked.add(rng.choice(population))
+    return picked
+
+
+def split_total(rng, total, buckets, shape):
+    """Split `total` over `buckets` with Pareto-distributed (long-tail) shares."""
+    if not buckets:
+        return []
+    weights = [rng.paretovariate(shape) for _ in range(buckets)]
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    for index in rng.sample(range(buckets), total - sum(counts)):
+        counts[index] += 1
+    return counts
+
+
+def insert_batches(connection, sql, rows, batch_size, label):
+    """Stream rows into the database with batched executemany(), reporting rows/s.
+
+    Keep VALUES to bare placeholders so the driver sends each batch as one
+    multi-row INSERT.
+    """
+    cursor = connection.cursor()
+    started = time.perf_counter()
+    batch = []
+    total = 0
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                connection.commit()
+                total += len(batch)
+                batch = []
+                print(f"\r  {label}: {total:,} rows", end='', flush=True)
+        if batch:
+            cursor.executemany(sql, batch)
+            connection.commit()
+            total += len(batch)
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0
+    print(f"\r  {label}: {total:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    return total
+
+
+def generate_data(connection, media=10000, people=20000, links=100000, users=10000,
+                  reviews=500000, seed=42, batch_size=5000, anchor_date=None):
+    """Add a synthetic catalog on top of whatever the database already holds.
+
+    The same seed and anchor date (default: today) always produce the same
+    rows; only the salted password hash differs between runs. Foreign key
+    and unique checks are off while loading; the derived tables
+    (media_rating, media_primary_image, version counters) are rebuilt at
+    the end.
+    """
+    rng = random.Random(seed)
+    cursor = connection.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0, UNIQUE_CHECKS = 0")
+    cursor.execute("SELECT GenreID, GenreName FROM genre")
+    genre_ids = {name: genre_id for genre_id, name in cursor.fetchall()}
+    cursor.execute("SELECT PlatformID, PlatformType FROM platform")
+    platforms = cursor.fetchall()
+    # New rows get explicit ids after the existing ones
+    cursor.execute("SELECT COALESCE(MAX(MediaID), 0) FROM media")
+    media_base = cursor.fetchone()[0]
+    cursor.execute("SELECT COALESCE(MAX(PersonID), 0) FROM person")
+    person_base = cursor.fetchone()[0]
+    cursor.execute("SELECT COALESCE(MAX(UserID), 0) FROM users")
+    user_base = cursor.fetchone()[0]
+    cursor.close()
+
+    media_ids = range(media_base + 1, media_base + media + 1)
+    person_ids = range(person_base + 1, person_base + people + 1)
+    user_ids = range(user_base + 1, user_base + users + 1)
+    today = anchor_date or date.today()
+    now = datetime(today.year, today.month, today.day)
+    started = time.perf_counter()
+
+    print(f"Generating {media:,} media, {people:,} people, {links:,} credits, "
+          f"{users:,} users and {reviews:,} reviews (seed {seed})")
+
+    # Type and release date per media, needed again for genres, platforms, cast and episodes
+    pick_type = weighted_picker(rng, MEDIA_TYPE_WEIGHTS)
+    media_types = [pick_type() for _ in media_ids]
+    # Release years skew recent: most of the catalog is from the last couple of decades
+    release_dates = [today - timedelta(days=min(int(rng.expovariate(1 / 3650)), 365 * 80) - 120)
+                     for _ in media_ids]
+
+    def media_rows():
+        for index, media_id in enumerate(media_ids):
+            media_type = media_types[index]
+            title = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+            if rng.random() < 0.7:
+                title += f" {rng.randint(2, 999)}"
+            synopsis = (f"A {rng.choice(ADJECTIVES).lower()} story about a {rng.choice(NOUNS).lower()} "
+                        f"and the {rng.choice(NOUNS).lower()} that changed everything.")
+            if media_type == 'Movie':
+                duration = int(rng.gauss(115, 20))
+            elif media_type == 'Video Game':
+                duration = None
+            else:
+                duration = rng.choice([22, 24, 30, 45, 60])
+            yield (media_id, title, synopsis, media_type, release_dates[index], duration)
+
+    insert_batches(connection, """
+        INSERT INTO media (MediaID, Title, Synopsis, MediaType, ReleaseDate, DurationMinutes)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, media_rows(), batch_size, 'media')
+
+    genre_pickers = {media_type: weighted_picker(rng, {name: weight for name, weight in weights.items()
+                                                       if name in genre_ids})
+                     for media_type, weights in GENRE_WEIGHTS.items()}
+
+    def genre_rows():
+        for index, media_id in enumerate(media_ids):
+            media_type = media_types[index]
+            names = {genre_pickers[media_type]() for _ in range(rng.randint(1, 3))}
+            if media_type == 'Anime' and 'Anime' in genre_ids:
+                names.add('Anime')
+            for name in names:
+                yield (media_id, genre_ids[name])
+
+    insert_batches(connection, "INSERT INTO media_genre (MediaID, GenreID) VALUES (%s, %s)",
+                   genre_rows(), batch_size, 'media_genre')
+
+    streaming = [platform_id for platform_id, kind in platforms if kind == 'Streaming']
+    cinema = [platform_id for platform_id, kind in platforms if kind == 'Cinema']
+    gaming = [platform_id for platform_id, kind in platforms if kind in ('Gaming Console', 'PC Storefront')]
+
+    def platform_rows():
+        for index, media_id in enumerate(media_ids):
+            media_type = media_types[index]
+            if media_type == 'Video Game':
+                choices = gaming or streaming
+            elif media_type == 'Movie' and release_dates[index] > today - timedelta(days=90):
+                choices = cinema + streaming
+            else:
+                choices = streaming
+            if choices:
+                for platform_id in rng.sample(choices, min(len(choices), rng.randint(1, 2))):
+                    yield (media_id, platform_id)
+
+    insert_batches(connection, "INSERT INTO media_platform (MediaID, PlatformID) VALUES (%s, %s)",
+                   platform_rows(), batch_size, 'media_platform')
+
+    def image_rows():
+        for media_id in media_ids:
+            yield (media_id, f"https://img.example.com/poster/{media_id}.jpg", None, 'Poster', 0)
+            if rng.random() < 0.9:
+                yield (media_id, f"https://img.example.com/backdrop/{media_id}.jpg", None, 'Backdrop', 0)
+            for n in range(rng.choice([0, 0, 1, 2, 4])):
+                yield (media_id, f"https://img.example.com/gallery/{media_id}-{n}.jpg", f"Still {n + 1}", 'Gallery', n)
+
+    insert_batches(connection, """
+        INSERT INTO mediaimage (MediaID, ImageUrl, Caption, Type, SortOrder)
+        VALUES (%s, %s, %s, %s, %s)
+    """, image_rows(), batch_size, 'mediaimage')
+
+    def episode_rows():
+        for index, media_id in enumerate(media_ids):
+            if media_types[index] not in ('TV Show', 'Anime'):
+                continue
+            aired = release_dates[index]
+            for season in range(1, min(int(rng.expovariate(1 / 2)) + 1, 12) + 1):
+                for episode in range(1, rng.choice([6, 8, 10, 12, 13, 22, 24]) + 1):
+                    yield (media_id, season, episode, f"Episode {episode}", aired)
+                    aired += timedelta(days=7)
+                aired += timedelta(days=rng.randint(180, 540))
+
+    insert_batches(connection, """
+        INSERT INTO episode (MediaID, SeasonNumber, EpisodeNumber, Title, ReleaseDate)
+        VALUES (%s, %s, %s, %s, %s)
+    """, episode_rows(), batch_size, 'episode')
+
+    insert_batches(connection, "INSERT INTO person (PersonID, Name, DateOfBirth, Country) VALUES (%s, %s, %s, %s)",
+                   ((person_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {person_id}",
+                     date(1930, 1, 1) + timedelta(days=rng.randint(0, 365 * 75)), rng.choice(COUNTRIES))
+                    for person_id in person_ids),
+                   batch_size, 'person')
+
+    def credit_rows():
+        if not people:
+            return
+        pick_person = zipf_picker(rng, person_ids, PERSON_POPULARITY_SKEW)
+        role_pickers = {media_type: weighted_picker(rng, weights) for media_type, weights in ROLE_WEIGHTS.items()}
+        for index, (media_id, count) in enumerate(zip(media_ids, split_total(rng, links, media, 4.0))):
+            for person_id in distinct_draws(rng, pick_person, person_ids, count):
+                yield (media_id, person_id, role_pickers[media_types[index]]())
+
+    insert_batches(connection, "INSERT INTO media_person_role (MediaID, PersonID, Role) VALUES (%s, %s, %s)",
+                   credit_rows(), batch_size, 'media_person_role')
+
+    password_hash = generate_password_hash('password')
+    insert_batches(connection, "INSERT INTO users (UserID, Username, Email, PasswordHash) VALUES (%s, %s, %s, %s)",
+                   ((user_id, f"user{user_id}", f"user{user_id}@example.com", password_hash)
+                    for user_id in user_ids),
+                   batch_size, 'users')
+
+    def review_rows():
+        if not media:
+            return
+        pick_media = zipf_picker(rng, media_ids, MEDIA_POPULARITY_SKEW)
+        for user_id, count in zip(user_ids, split_total(rng, reviews, users, USER_ACTIVITY_SHAPE)):
+            for media_id in distinct_draws(rng, pick_media, media_ids, count):
+                # Most reviews are recent; the tail reaches back a few years
+                age = timedelta(minutes=int(rng.expovariate(1 / (60 * 24 * 120))))
+                rating = min(max(round(rng.gauss(7.2, 1.6), 1), 0.0), 10.0)
+                yield (user_id, media_id, rating, rng.choice(COMMENTS), now - age)
+
+    insert_batches(connection, """
+        INSERT INTO review (UserID, MediaID, Rating, Comment, ReviewDate)
+        VALUES (%s, %s, %s, %s, %s)
+    """, review_rows(), batch_size, 'review')
+
+    print("Rebuilding derived tables...")
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1, UNIQUE_CHECKS = 1")
+        ratings.rebuild_summary(cursor)
+        trending.rebuild_buckets(cursor)
+        images.rebuild_primary_images(cursor)
+        # Created by sirene.sql or migration 0004; on older schemas the migration fills it
+        cursor.execute(user_stats.TABLE_SQL)
+        user_stats.rebuild_stats(cursor)
+        versions.bump_all(cursor)
+        connection.commit()
+    finally:
+        cursor.close()
+
+    print(f"Generated data in {time.perf_counter() - started:.1f}s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Initialize the Sirene database")
+    parser.add_argument('--generate', action='store_true',
+                        help='Non-interactive: load the schema if needed and add a synthetic catalog')
+    parser.add_argument('--host', default=os.getenv('MYSQL_HOST', 'localhost'))
+    parser.add_argument('--user', default=os.getenv('MYSQL_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('MYSQL_PASSWORD', ''))
+    parser.add_argument('--database', default=os.getenv('MYSQL_DB', 'sirene'))
+    parser.add_argument('--media', type=int, default=10000)
+    parser.add_argument('--people', type=int, default=20000)
+    parser.add_argument('--links', type=int, default=100000, help='Cast/crew credits (media_person_role rows)')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--reviews', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=42, help='Same seed, same data')
+    parser.add_argument('--anchor-date', type=date.fromisoformat, default=None,
+                        help='Date the generated release and review dates count back from (default: today)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per executemany() batch')
+    return parser.parse_args()
+
+
+def generate_main(args):
+    """Non-interactive generator mode."""
+    connection = create_connection(args.host, args.user, args.password)
+    if not connection:
+        sys.exit(1)
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+        cursor.execute(f"USE `{args.database}`")
+        cursor.execute("SHOW TABLES")
+        if not cursor.fetchall():
+            if not execute_sql_file(connection, "sirene.sql"):
+                sys.exit(1)
+        cursor.close()
+
+        generate_data(connection, media=args.media, people=args.people, links=args.links,
+                      users=args.users, reviews=args.reviews, seed=args.seed,
+                      batch_size=args.batch_size, anchor_date=args.anchor_date)
+        # After the load, so new secondary indexes are built in one pass
+        for version, name in migrations.migrate(connection):
+            print(f"Applied migration {version:04d} {name}")
+    except Error as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+
 def main():
     """Main function to initialize the database."""
     print("Sirene Database Initialization Script")
@@ -170,6 +668,11 @@ def main():
         else:
             print(f"\nFound {len(tables)} existing tables in database")
         
+        # Bring the schema up to date
+        print("\nApplying schema migrations...")
+        for version, name in migrations.migrate(connection):
+            print(f"Applied migration {version:04d} {name}")
+        
         # Update user passwords
         print("\nUpdating user passwords...")
         update_user_passwords(connection)
@@ -194,4 +697,8 @@ def main():
         connection.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.generate:
+        generate_main(args)
+    else:
+        main()
\ No newline at end of file
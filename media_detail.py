@@ -0,0 +1,108 @@
+"""
+Media detail loader for Sirene.
+
+Gathers everything the media details page shows (media + genres, cast,
+reviews, platforms, episodes, awards, images, videos) in a single round trip
+by sending the statements as one multi-statement batch and walking the result
+sets. Requires a connection opened with CLIENT.MULTI_STATEMENTS
+(db.PooledMySQL.batch_connection); regular connections don't allow it.
+"""
+
+# (name, statement) pairs; each statement takes the MediaID exactly once
+DETAIL_STATEMENTS = [
+    ('media', """
+        SELECT m.*,
+               GROUP_CONCAT(DISTINCT g.GenreName) as genres,
+               mpi.PosterImageID, mpi.BackdropImageID
+        FROM media m
+        LEFT JOIN media_genre mg ON m.MediaID = mg.MediaID
+        LEFT JOIN genre g ON mg.GenreID = g.GenreID
+        LEFT JOIN media_primary_image mpi ON m.MediaID = mpi.MediaID
+        WHERE m.MediaID = %s
+        GROUP BY m.MediaID
+    """),
+    ('people', """
+        SELECT p.*, mpr.Role
+        FROM media_person_role mpr
+        JOIN person p ON mpr.PersonID = p.PersonID
+        WHERE mpr.MediaID = %s
+        ORDER BY mpr.Role
+    """),
+    ('reviews', """
+        SELECT r.*, u.Username
+        FROM review r
+        JOIN users u ON r.UserID = u.UserID
+        WHERE r.MediaID = %s
+        ORDER BY r.ReviewDate DESC
+    """),
+    ('platforms', """
+        SELECT p.PlatformName
+        FROM media_platform mp
+        JOIN platform p ON mp.PlatformID = p.PlatformID
+        WHERE mp.MediaID = %s
+    """),
+    ('episodes', """
+        SELECT * FROM episode
+        WHERE MediaID = %s
+        ORDER BY SeasonNumber, EpisodeNumber
+    """),
+    ('awards', """
+        SELECT a.AwardName, a.AwardCategory, aw.YearWon, p.Name as PersonName
+        FROM awardwon aw
+        JOIN award a ON aw.AwardID = a.AwardID
+        LEFT JOIN person p ON aw.PersonID = p.PersonID
+        WHERE aw.MediaID = %s
+    """),
+    ('images', """
+        SELECT * FROM mediaimage
+        WHERE MediaID = %s
+        ORDER BY Type, SortOrder
+    """),
+    ('videos', """
+        SELECT * FROM mediavideo
+        WHERE MediaID = %s
+        ORDER BY Type, SortOrder
+    """),
+]
+
+BATCH_SQL = ";\n".join(sql.strip() for _, sql in DETAIL_STATEMENTS)
+
+
+def load_media_detail(cur, media_id):
+    """Load the full detail object for one media item in a single round trip.
+
+    Returns a dict with the template context of the media details page, or
+    None if the media item does not exist.
+    """
+    cur.execute(BATCH_SQL, [media_id] * len(DETAIL_STATEMENTS))
+
+    results = {}
+    for index, (name, _) in enumerate(DETAIL_STATEMENTS):
+        if index > 0:
+            cur.nextset()
+        results[name] = list(cur.fetchall())
+
+    if not results['media']:
+        return None
+    media = results['media'][0]
+
+    # Episodes only apply to series
+    episodes = results['episodes'] if media['MediaType'] in ['TV Show', 'Anime'] else []
+
+    media_images = results['images']
+    poster = next((img for img in media_images if img['ImageID'] == media['PosterImageID']), None)
+    backdrop = next((img for img in media_images if img['ImageID'] == media['BackdropImageID']), None)
+    gallery = [img for img in media_images if img['Type'] == 'Gallery']
+
+    return {
+        'media': media,
+        'people': results['people'],
+        'reviews': results['reviews'],
+        'platforms': results['platforms'],
+        'episodes': episodes,
+        'awards': results['awards'],
+        'poster': poster,
+        'backdrop': backdrop,
+        'gallery': gallery,
+        'videos': results['videos'],
+    }
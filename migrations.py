@@ -0,0 +1,232 @@
+"""
+Versioned schema migrations for Sirene.
+
+sirene.sql is the baseline schema; the numbered migrations below are applied
+over it in order and each applied version is recorded in schema_migrations,
+so `flask --app app migrate` (and init_db.py / benchmark.py after loading the
+schema) only run what is still pending. MySQL commits DDL implicitly, so a
+migration cannot be rolled back halfway: every step checks information_schema
+first and skips work that is already done, which makes rerunning a migration
+that was interrupted, or applying one to a hand-patched server, harmless.
+"""
+
+import export
+import images
+import ratings
+import trending
+import user_stats
+import versions
+
+SCHEMA_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        Version int NOT NULL,
+        Name varchar(100) NOT NULL,
+        AppliedAt timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (Version)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+
+def _first_column(row):
+    # Works for both tuple (mysql.connector) and dict (PyMySQL DictCursor) rows
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def index_exists(cur, table, name):
+    cur.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, name))
+    return bool(cur.fetchall())
+
+
+def foreign_key_exists(cur, table, name):
+    cur.execute("""
+        SELECT 1 FROM information_schema.TABLE_CONSTRAINTS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = %s
+          AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+    """, (table, name))
+    return bool(cur.fetchall())
+
+
+def table_is_empty(cur, table):
+    cur.execute(f"SELECT 1 FROM `{table}` LIMIT 1")
+    return not cur.fetchall()
+
+
+def add_index(cur, table, name, columns, kind='INDEX'):
+    """Add a secondary index (or e.g. a FULLTEXT INDEX) unless one with that name already exists."""
+    if index_exists(cur, table, name):
+        return False
+    column_list = ", ".join(f"`{column}`" for column in columns)
+    cur.execute(f"ALTER TABLE `{table}` ADD {kind} `{name}` ({column_list})")
+    return True
+
+
+def drop_index(cur, table, name):
+    if not index_exists(cur, table, name):
+        return False
+    cur.execute(f"ALTER TABLE `{table}` DROP INDEX `{name}`")
+    return True
+
+
+def drop_foreign_key(cur, table, name):
+    if not foreign_key_exists(cur, table, name):
+        return False
+    cur.execute(f"ALTER TABLE `{table}` DROP FOREIGN KEY `{name}`")
+    return True
+
+
+def _drop_duplicate_constraints(cur):
+    """The dump carries each of these twice; keep the _1/_2 originals."""
+    for table, name in [('review', 'review_ibfk_3'),
+                        ('review', 'review_ibfk_4'),
+                        ('media_person_role', 'media_person_role_ibfk_3'),
+                        ('media_person_role', 'media_person_role_ibfk_4'),
+                        ('episode', 'episode_ibfk_2')]:
+        drop_foreign_key(cur, table, name)
+    # Same columns as the UserID unique key
+    drop_index(cur, 'review', 'UserID_2')
+
+
+def _hot_path_indexes(cur):
+    """Indexes for the listing, detail and dashboard queries.
+
+    The single-column MediaID keys are prefixes of the new composites, which
+    also serve the foreign keys, so they are dropped once those exist.
+    """
+    # Per-type homepage sections and admin type filter
+    add_index(cur, 'media', 'MediaType_ReleaseDate', ['MediaType', 'ReleaseDate'])
+    # Recent releases
+    add_index(cur, 'media', 'ReleaseDate', ['ReleaseDate'])
+    # Admin dashboard keyset pages on (Title, MediaID)
+    add_index(cur, 'media', 'Title', ['Title'])
+
+    # Detail page and primary image resolution: WHERE MediaID ORDER BY Type, SortOrder
+    add_index(cur, 'mediaimage', 'MediaID_Type_SortOrder', ['MediaID', 'Type', 'SortOrder'])
+    drop_index(cur, 'mediaimage', 'MediaID')
+    add_index(cur, 'mediavideo', 'MediaID_Type_SortOrder', ['MediaID', 'Type', 'SortOrder'])
+    drop_index(cur, 'mediavideo', 'MediaID')
+
+    # Detail page reviews: WHERE MediaID ORDER BY ReviewDate DESC
+    add_index(cur, 'review', 'MediaID_ReviewDate', ['MediaID', 'ReviewDate'])
+    drop_index(cur, 'review', 'MediaID')
+
+
+def _person_name_index(cur):
+    """People are looked up by exact name (bulk import, cast forms)."""
+    add_index(cur, 'person', 'Name', ['Name'])
+
+
+def _user_review_stats(cur):
+    """Per-user review stats for the profile header, plus the index its review list pages on."""
+    cur.execute(user_stats.TABLE_SQL)
+    # Rebuilt from scratch, so rerunning after an interruption doesn't double count
+    user_stats.rebuild_stats(cur)
+    # Profile reviews: WHERE UserID ORDER BY ReviewDate DESC, ReviewID DESC
+    add_index(cur, 'review', 'UserID_ReviewDate', ['UserID', 'ReviewDate'])
+
+
+def _media_tombstone(cur):
+    """Deleted MediaIDs, so incremental exports can report deletions."""
+    cur.execute(export.TOMBSTONE_TABLE_SQL)
+
+
+# The derived tables below are in sirene.sql, but a database created from an
+# older dump has none of them. Each is created, then filled only while it is
+# still empty: the fill commits together with the migration's record, so an
+# interrupted run leaves the table empty and the rerun fills it again.
+
+def _media_rating(cur):
+    """Per-media rating summaries for list endpoints."""
+    cur.execute(ratings.TABLE_SQL)
+    if table_is_empty(cur, 'media_rating'):
+        ratings.rebuild_summary(cur)
+
+
+def _media_primary_image(cur):
+    """Designated poster and backdrop per media item."""
+    cur.execute(images.TABLE_SQL)
+    # The rebuild drops designations, so never run it over existing rows
+    if table_is_empty(cur, 'media_primary_image'):
+        images.rebuild_primary_images(cur)
+
+
+def _change_counters(cur):
+    """media_version and catalog_version for conditional responses."""
+    cur.execute(versions.MEDIA_TABLE_SQL)
+    cur.execute(versions.CATALOG_TABLE_SQL)
+    if table_is_empty(cur, 'media_version'):
+        versions.bump_all(cur)
+    elif table_is_empty(cur, 'catalog_version'):
+        versions.bump(cur)
+
+
+def _media_trending_day(cur):
+    """Per-day review buckets for trending lists."""
+    cur.execute(trending.TABLE_SQL)
+    if table_is_empty(cur, 'media_trending_day'):
+        trending.rebuild_buckets(cur)
+
+
+def _title_synopsis_fulltext(cur):
+    """Full-text index for search."""
+    add_index(cur, 'media', 'Title_Synopsis', ['Title', 'Synopsis'], kind='FULLTEXT INDEX')
+
+
+# (version, name, function), in the order they are applied. Never renumber or
+# edit an applied migration; add a new one instead.
+MIGRATIONS = [
+    (1, 'drop_duplicate_constraints', _drop_duplicate_constraints),
+    (2, 'hot_path_indexes', _hot_path_indexes),
+    (3, 'person_name_index', _person_name_index),
+    (4, 'user_review_stats', _user_review_stats),
+    (5, 'media_tombstone', _media_tombstone),
+    (6, 'media_rating', _media_rating),
+    (7, 'media_primary_image', _media_primary_image),
+    (8, 'change_counters', _change_counters),
+    (9, 'media_trending_day', _media_trending_day),
+    (10, 'title_synopsis_fulltext', _title_synopsis_fulltext),
+]
+
+
+def applied_versions(cur):
+    """Versions recorded in schema_migrations (creating the table if needed)."""
+    cur.execute(SCHEMA_TABLE_SQL)
+    cur.execute("SELECT Version FROM schema_migrations")
+    return {_first_column(row) for row in cur.fetchall()}
+
+
+def status(cur):
+    """(version, name, applied) for every known migration."""
+    applied = applied_versions(cur)
+    return [(version, name, version in applied) for version, name, _ in MIGRATIONS]
+
+
+def pending(cur):
+    """(version, name) of every migration not applied yet, in order."""
+    applied = applied_versions(cur)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+
+def migrate(connection, target=None):
+    """Apply pending migrations up to `target` (all by default), in order.
+
+    Each migration is recorded and committed as soon as it finishes. Returns
+    the (version, name) pairs applied by this call.
+    """
+    cur = connection.cursor()
+    try:
+        applied = applied_versions(cur)
+        done = []
+        for version, name, upgrade in MIGRATIONS:
+            if version in applied or (target is not None and version > target):
+                continue
+            upgrade(cur)
+            cur.execute("INSERT INTO schema_migrations (Version, Name) VALUES (%s, %s)", (version, name))
+            connection.commit()
+            done.append((version, name))
+        return done
+    finally:
+        cur.close()
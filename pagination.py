@@ -0,0 +1,59 @@
+"""
+Cursor (seek-based) pagination helpers for Sirene.
+
+Cursors are opaque, URL-safe tokens that encode the sort key of the last row
+on a page. The next page is fetched with a seek predicate built from that
+key instead of an OFFSET, so deep pages cost the same as the first one.
+"""
+
+import base64
+import json
+
+
+def encode_cursor(values):
+    """Encode a row's sort key as an opaque URL-safe cursor."""
+    raw = json.dumps(list(values), default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, length):
+    """Decode a cursor produced by encode_cursor.
+
+    Returns the list of sort key values, or None if the token is missing,
+    malformed or does not hold exactly `length` values.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+
+def keyset_condition(columns, values, descending, column_params=None):
+    """Build a seek predicate that selects rows after the given sort key.
+
+    columns and descending are parallel lists describing the ORDER BY; the
+    last column must be unique (normally the primary key) so the predicate
+    is exact. column_params optionally holds the placeholder parameters of
+    each column expression. Returns (sql, params) ready to be ANDed into a
+    WHERE clause.
+    """
+    column_params = column_params or [[] for _ in columns]
+    clauses = []
+    params = []
+    for i, column in enumerate(columns):
+        parts = []
+        for j in range(i):
+            parts.append(f"{columns[j]} = %s")
+            params.extend(column_params[j])
+            params.append(values[j])
+        parts.append(f"{column} {'<' if descending[i] else '>'} %s")
+        params.extend(column_params[i])
+        params.append(values[i])
+        clauses.append("(" + " AND ".join(parts) + ")")
+    return "(" + " OR ".join(clauses) + ")", params
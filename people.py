@@ -0,0 +1,56 @@
+"""
+Person lookup for Sirene's cast admin.
+
+The cast page used to render every person; instead it now asks for people
+whose name starts with what the admin has typed, a page at a time. Matches
+are a range scan on the person(Name) index (migration 0003) in (Name,
+PersonID) order, paginated with the same opaque keyset cursors as the rest
+of the app, so the cost depends on the page size, not on how many people
+exist.
+"""
+
+import fulltext
+import pagination
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+
+def search_people(cur, query='', cursor=None, limit=PAGE_SIZE):
+    """People whose name starts with query, ordered by name.
+
+    Returns (people, next_cursor); next_cursor is None on the last page.
+    """
+    where = ["1=1"]
+    params = []
+    if query:
+        where.append("Name LIKE %s")
+        params.append(fulltext.escape_like(query) + '%')
+
+    after = pagination.decode_cursor(cursor, 2)
+    if after and isinstance(after[0], str) and isinstance(after[1], int):
+        seek_sql, seek_params = pagination.keyset_condition(["Name", "PersonID"], after, [False, False])
+        where.append(seek_sql)
+        params.extend(seek_params)
+
+    cur.execute(f"""
+        SELECT PersonID, Name, DateOfBirth, Country
+        FROM person
+        WHERE {' AND '.join(where)}
+        ORDER BY Name, PersonID
+        LIMIT %s
+    """, params + [limit + 1])
+    people = list(cur.fetchall())
+
+    next_cursor = None
+    if len(people) > limit:
+        people = people[:limit]
+        next_cursor = pagination.encode_cursor([people[-1]['Name'], people[-1]['PersonID']])
+    return people, next_cursor
+
+
+def find_person(cur, name):
+    """PersonID of the oldest person with exactly this name, or None."""
+    cur.execute("SELECT PersonID FROM person WHERE Name = %s ORDER BY PersonID LIMIT 1", [name])
+    row = cur.fetchone()
+    return row['PersonID'] if row else None
@@ -0,0 +1,227 @@
+"""
+Per-request SQL instrumentation for Sirene.
+
+QueryMonitor wraps the request's pooled connection so every cursor records
+statement latency and rows. Statements slower than the threshold are always
+logged. On a sampled fraction of requests each statement is also fingerprinted
+(literals and whitespace normalised) so repeated identical statements within
+one request can be flagged as likely N+1 patterns, and the request is folded
+into per-route totals shown on /admin/metrics.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from flask import g, request
+
+log = logging.getLogger('sirene.sql')
+
+# Distinct fingerprints kept per route; the rest are folded into totals only
+MAX_FINGERPRINTS_PER_ROUTE = 50
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+# rowcount reported by unbuffered (SS) cursors, whose row count isn't known up front
+_UNKNOWN_ROWCOUNT = 2 ** 64 - 1
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Normalise a statement so calls differing only in literals compare equal."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?+)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestLog:
+    """Statements executed while serving one request."""
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total = 0.0
+        self.statements = defaultdict(lambda: [0, 0.0, 0.0, 0])  # count, total, max, rows
+
+    def record(self, sql, elapsed, rows, slow_seconds):
+        if rows == _UNKNOWN_ROWCOUNT:
+            rows = -1
+        self.count += 1
+        self.total += elapsed
+        if elapsed >= slow_seconds:
+            log.warning("Slow query (%.1f ms, %s rows) on %s: %s",
+                        elapsed * 1000, rows, request.path, _WHITESPACE.sub(' ', sql).strip()[:500])
+        if self.sampled:
+            entry = self.statements[fingerprint(sql)]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            entry[3] += max(rows, 0)
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute/executemany/nextset."""
+
+    def __init__(self, cursor, monitor, request_log):
+        self._cursor = cursor
+        self._monitor = monitor
+        self._log = request_log
+        self._last_sql = None
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._last_sql = query
+            self._log.record(query, time.perf_counter() - started, self._cursor.rowcount,
+                             self._monitor.slow_seconds)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._last_sql = query
+            self._log.record(query, time.perf_counter() - started, self._cursor.rowcount,
+                             self._monitor.slow_seconds)
+
+    def nextset(self):
+        # Later result sets of a batch: count their rows against the batch statement
+        result = self._cursor.nextset()
+        if result and self._log.sampled and self._last_sql is not None:
+            self._log.statements[fingerprint(self._last_sql)][3] += max(self._cursor.rowcount, 0)
+        return result
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors report into the request log."""
+
+    def __init__(self, conn, monitor, request_log):
+        self._conn = conn
+        self._monitor = monitor
+        self._log = request_log
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._monitor, self._log)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class QueryMonitor:
+    """Collects per-request query logs and aggregates them per route."""
+
+    def __init__(self, app=None, sample_rate=0.1, slow_ms=200, repeat_threshold=5):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000
+        self.repeat_threshold = repeat_threshold
+        self._lock = threading.Lock()
+        self._routes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+
+    def wrap(self, conn):
+        """Instrument a connection for the current request (CLI use is left alone)."""
+        request_log = g.get('sql_log')
+        if request_log is None:
+            return conn
+        return InstrumentedConnection(conn, self, request_log)
+
+    def _start(self):
+        g.sql_log = RequestLog(sampled=random.random() < self.sample_rate)
+
+    def _finish(self, exception):
+        request_log = g.pop('sql_log', None)
+        if request_log is None or not request_log.sampled:
+            return
+        route = request.endpoint or request.path
+        elapsed = time.perf_counter() - request_log.started
+
+        repeated = [(fp, entry[0]) for fp, entry in request_log.statements.items()
+                    if entry[0] >= self.repeat_threshold]
+        for fp, count in repeated:
+            log.warning("Possible N+1 on %s: %d identical statements: %s", route, count, fp[:300])
+
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    'requests': 0, 'request_time': 0.0, 'queries': 0, 'query_time': 0.0,
+                    'max_queries': 0, 'n_plus_one': 0, 'fingerprints': {},
+                }
+            stats['requests'] += 1
+            stats['request_time'] += elapsed
+            stats['queries'] += request_log.count
+            stats['query_time'] += request_log.total
+            stats['max_queries'] = max(stats['max_queries'], request_log.count)
+            stats['n_plus_one'] += 1 if repeated else 0
+
+            for fp, (count, total, longest, rows) in request_log.statements.items():
+                entry = stats['fingerprints'].get(fp)
+                if entry is None:
+                    if len(stats['fingerprints']) >= MAX_FINGERPRINTS_PER_ROUTE:
+                        continue
+                    entry = stats['fingerprints'][fp] = {'calls': 0, 'time': 0.0, 'max': 0.0, 'rows': 0}
+                entry['calls'] += count
+                entry['time'] += total
+                entry['max'] = max(entry['max'], longest)
+                entry['rows'] += rows
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def stats(self):
+        """Per-route totals, busiest routes (by total query time) first."""
+        with self._lock:
+            routes = []
+            for route, stats in self._routes.items():
+                requests = stats['requests']
+                statements = sorted(
+                    ({'fingerprint': fp,
+                      'calls': e['calls'],
+                      'calls_per_request': round(e['calls'] / requests, 2),
+                      'total_ms': round(e['time'] * 1000, 2),
+                      'avg_ms': round(e['time'] / e['calls'] * 1000, 3) if e['calls'] else 0.0,
+                      'max_ms': round(e['max'] * 1000, 3),
+                      'rows': e['rows']}
+                     for fp, e in stats['fingerprints'].items()),
+                    key=lambda s: s['total_ms'], reverse=True)
+                routes.append({
+                    'route': route,
+                    'requests': requests,
+                    'avg_request_ms': round(stats['request_time'] / requests * 1000, 2),
+                    'avg_queries': round(stats['queries'] / requests, 2),
+                    'max_queries': stats['max_queries'],
+                    'avg_query_ms': round(stats['query_time'] / requests * 1000, 2),
+                    'total_query_ms': round(stats['query_time'] * 1000, 2),
+                    'n_plus_one_requests': stats['n_plus_one'],
+                    'statements': statements,
+                })
+        routes.sort(key=lambda r: r['total_query_ms'], reverse=True)
+        return {
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_seconds * 1000,
+            'repeat_threshold': self.repeat_threshold,
+            'routes': routes,
+        }
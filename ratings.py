@@ -0,0 +1,128 @@
+"""
+Per-media rating summary for Sirene.
+
+The `media_rating` table keeps a running sum/count/average of review ratings
+for each media item so list endpoints can read ratings with a primary-key
+join instead of aggregating the whole `review` table on every request.
+"""
+
+# Also in sirene.sql and migration 0006
+TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS media_rating (
+        MediaID int NOT NULL,
+        RatingSum decimal(12,1) NOT NULL DEFAULT '0.0',
+        RatingCount int NOT NULL DEFAULT '0',
+        AvgRating decimal(4,2) DEFAULT NULL,
+        LastReviewAt timestamp NULL DEFAULT NULL,
+        PRIMARY KEY (MediaID),
+        KEY AvgRating (AvgRating),
+        CONSTRAINT media_rating_ibfk_1 FOREIGN KEY (MediaID) REFERENCES media (MediaID) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+
+def apply_review(cur, media_id, rating):
+    """Fold a newly inserted review into the media's rating summary.
+
+    Must run on the same connection (and transaction) as the review INSERT.
+    """
+    cur.execute("""
+        INSERT INTO media_rating (MediaID, RatingSum, RatingCount, AvgRating, LastReviewAt)
+        VALUES (%s, %s, 1, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            RatingSum = RatingSum + VALUES(RatingSum),
+            RatingCount = RatingCount + 1,
+            AvgRating = RatingSum / RatingCount,
+            LastReviewAt = NOW()
+    """, (media_id, rating, rating))
+
+
+def apply_deltas(cur, deltas):
+    """Fold a batch of review changes into the rating summaries.
+
+    deltas maps MediaID -> (rating sum change, review count change); an
+    edited review changes the sum only. Run in the reviews' transaction.
+    """
+    rows = [(media_id, rating_sum, count, rating_sum / count if count else None)
+            for media_id, (rating_sum, count) in sorted(deltas.items()) if rating_sum or count]
+    if not rows:
+        return
+    cur.executemany("""
+        INSERT INTO media_rating (MediaID, RatingSum, RatingCount, AvgRating, LastReviewAt)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            RatingSum = RatingSum + VALUES(RatingSum),
+            RatingCount = RatingCount + VALUES(RatingCount),
+            AvgRating = RatingSum / RatingCount,
+            LastReviewAt = NOW()
+    """, rows)
+
+
+def rebuild_summary(cur, media_id=None):
+    """Recompute rating summaries from the raw review table.
+
+    Rebuilds a single media item when media_id is given, otherwise the whole
+    catalog. Returns the number of summary rows written.
+    """
+    where = ""
+    params = []
+    if media_id is not None:
+        where = "WHERE MediaID = %s"
+        params.append(media_id)
+
+    cur.execute(f"DELETE FROM media_rating {where}", params)
+    cur.execute(f"""
+        INSERT INTO media_rating (MediaID, RatingSum, RatingCount, AvgRating, LastReviewAt)
+        SELECT MediaID, SUM(Rating), COUNT(*), AVG(Rating), MAX(ReviewDate)
+        FROM review
+        {where}
+        GROUP BY MediaID
+    """, params)
+    return cur.rowcount
+
+
+def load_ratings(cur, media_ids):
+    """Current rating summary rows for several media items, in one query.
+
+    Returns MediaID -> row with AvgRating and RatingCount; media without
+    reviews are missing.
+    """
+    if not media_ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(media_ids))
+    cur.execute(f"""
+        SELECT MediaID, AvgRating, RatingCount
+        FROM media_rating
+        WHERE MediaID IN ({placeholders})
+    """, list(media_ids))
+    return {row['MediaID']: row for row in cur.fetchall()}
+
+
+def check_summary(cur):
+    """Compare media_rating against the raw review table.
+
+    Returns a list of mismatching rows, each with the stored and the actual
+    sum/count. An empty list means the summary is consistent.
+    """
+    cur.execute("""
+        SELECT s.MediaID,
+               s.RatingSum as stored_sum, s.RatingCount as stored_count,
+               a.RatingSum as actual_sum, a.RatingCount as actual_count
+        FROM media_rating s
+        LEFT JOIN (
+            SELECT MediaID, SUM(Rating) as RatingSum, COUNT(*) as RatingCount
+            FROM review GROUP BY MediaID
+        ) a ON a.MediaID = s.MediaID
+        WHERE a.MediaID IS NULL
+           OR s.RatingCount <> a.RatingCount
+           OR s.RatingSum <> a.RatingSum
+        UNION ALL
+        SELECT a.MediaID, NULL, NULL, a.RatingSum, a.RatingCount
+        FROM (
+            SELECT MediaID, SUM(Rating) as RatingSum, COUNT(*) as RatingCount
+            FROM review GROUP BY MediaID
+        ) a
+        LEFT JOIN media_rating s ON s.MediaID = a.MediaID
+        WHERE s.MediaID IS NULL
+    """)
+    return cur.fetchall()
@@ -0,0 +1,72 @@
+"""
+Diff-based updates of a media item's genre and platform links for Sirene.
+
+Instead of deleting every link and inserting the selection again, the
+current links are read (and locked) first and only the difference is
+written: one DELETE for the links that were dropped, one multi-row INSERT
+for the new ones, nothing at all when the selection is unchanged. Each
+change is returned as an events.ChangeEvent for the caller to publish after
+committing.
+"""
+
+from events import ChangeEvent
+
+# relation -> (link table, id column, lookup table, name column)
+RELATIONS = {
+    'genre': ('media_genre', 'GenreID', 'genre', 'GenreName'),
+    'platform': ('media_platform', 'PlatformID', 'platform', 'PlatformName'),
+}
+
+
+def parse_ids(values):
+    """Form values to a set of ints, ignoring anything that isn't one."""
+    ids = set()
+    for value in values:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def sync_links(cur, media_id, relation, wanted_ids):
+    """Make the media's links for relation exactly wanted_ids.
+
+    Ids that don't exist in the lookup table are ignored. Returns a
+    ChangeEvent, or None when nothing changed.
+    """
+    link_table, id_column, lookup_table, name_column = RELATIONS[relation]
+
+    # Locks the media's current links so a concurrent edit can't diff against them too
+    cur.execute(f"""
+        SELECT l.{id_column} as id, t.{name_column} as name
+        FROM {link_table} l
+        JOIN {lookup_table} t ON l.{id_column} = t.{id_column}
+        WHERE l.MediaID = %s
+        FOR UPDATE
+    """, [media_id])
+    current = {row['id']: row['name'] for row in cur.fetchall()}
+
+    removed = {link_id: current[link_id] for link_id in current.keys() - wanted_ids}
+    added = {}
+    new_ids = sorted(wanted_ids - current.keys())
+    if new_ids:
+        placeholders = ", ".join(["%s"] * len(new_ids))
+        cur.execute(f"""
+            SELECT {id_column} as id, {name_column} as name
+            FROM {lookup_table}
+            WHERE {id_column} IN ({placeholders})
+        """, new_ids)
+        added = {row['id']: row['name'] for row in cur.fetchall()}
+
+    if removed:
+        placeholders = ", ".join(["%s"] * len(removed))
+        cur.execute(f"DELETE FROM {link_table} WHERE MediaID = %s AND {id_column} IN ({placeholders})",
+                    [media_id] + sorted(removed))
+    if added:
+        cur.executemany(f"INSERT INTO {link_table} (MediaID, {id_column}) VALUES (%s, %s)",
+                        [(media_id, link_id) for link_id in sorted(added)])
+
+    if not added and not removed:
+        return None
+    return ChangeEvent(media_id, relation, tuple(sorted(added.items())), tuple(sorted(removed.items())))
@@ -0,0 +1,414 @@
+"""
+Write-behind review ingestion for Sirene.
+
+In buffered mode /api/review validates a review, appends it to a local spill
+file (fsynced) and to an in-memory queue, and answers right away. A
+background worker takes up to batch_size reviews at a time (or whatever
+arrived within flush_interval) and writes them in one transaction:
+an INSERT ... ON DUPLICATE KEY UPDATE for the reviews, plus the matching
+media_rating, user_review_stats and media_trending_day deltas. That is one
+commit per batch instead of one per review.
+
+The queue is bounded: when it is full, submit() waits up to a timeout and
+then raises QueueFull, which the route turns into a 503 with Retry-After.
+The spill file is emptied whenever everything in it has been committed. A
+replayed review that had already been committed finds its own row with the
+same rating, so it changes neither the aggregates nor the trending buckets,
+and replays are harmless.
+
+Each process writes its own spill file. REVIEW_SPILL_FILE names the first
+one (review_spill.ndjson); further processes use review_spill.1.ndjson,
+review_spill.2.ndjson and so on. On start a queue claims the first file no
+other process holds an exclusive lock on (fcntl.flock, msvcrt on Windows)
+and refuses to start if none is free. It then replays that file and
+adopts every other spill file that is not locked, i.e. was left behind by a
+process that crashed or stopped.
+
+A second review by the same user for the same media item replaces the
+first one (new rating and comment) instead of being rejected.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple, defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import pymysql
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+import ratings
+import trending
+import user_stats
+import versions
+
+Review = namedtuple('Review', ['user_id', 'media_id', 'rating', 'comment', 'submitted_at'])
+
+MAX_COMMENT_BYTES = 65535  # TEXT column
+
+# Pause after a batch could not be written at all (e.g. the database is down)
+RETRY_DELAY = 5.0
+
+# Spill files a queue looks at: REVIEW_SPILL_FILE and up to this many numbered ones
+MAX_SPILL_FILES = 64
+
+
+class QueueFull(Exception):
+    """The review queue stayed full for longer than the submit timeout."""
+
+
+class SpillLocked(Exception):
+    """Every spill file is locked by another running process."""
+
+
+def spill_file_path(base_path, number):
+    """Path of the number-th spill file: the base path itself, then base.<n>.ext."""
+    if number == 0:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{number}{ext}"
+
+
+def _try_lock(file):
+    """Take an exclusive lock on an open file without waiting; False if another process holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _lock_spill(path):
+    """Open and lock path's lock file; returns the open file, or None if it is taken.
+
+    The lock lives in a separate file because the spill file itself is
+    replaced when it is rewritten. Closing the file releases the lock.
+    """
+    lock = open(path + '.lock', 'a+')
+    if _try_lock(lock):
+        return lock
+    lock.close()
+    return None
+
+
+def parse_review(user_id, data):
+    """Validate a review request body into a Review. Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    try:
+        media_id = int(data.get('media_id'))
+    except (TypeError, ValueError):
+        raise ValueError("media_id must be a number")
+    try:
+        # Rounded like MySQL rounds into the DECIMAL(3,1) column
+        rating = Decimal(str(data.get('rating'))).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError("rating must be a number")
+    if not rating.is_finite() or not Decimal(0) <= rating <= Decimal(10):
+        raise ValueError("rating must be between 0 and 10")
+    comment = data.get('comment')
+    if comment is not None and not isinstance(comment, str):
+        raise ValueError("comment must be text")
+    if comment and len(comment.encode('utf-8')) > MAX_COMMENT_BYTES:
+        raise ValueError("comment is too long")
+    return Review(user_id, media_id, rating, comment or None, datetime.now().replace(microsecond=0))
+
+
+def _to_line(review):
+    return json.dumps({'user_id': review.user_id, 'media_id': review.media_id, 'rating': str(review.rating),
+                       'comment': review.comment, 'submitted_at': review.submitted_at.isoformat()},
+                      separators=(',', ':')) + '\n'
+
+
+def _from_line(line):
+    data = json.loads(line)
+    return Review(data['user_id'], data['media_id'], Decimal(data['rating']), data['comment'],
+                  datetime.fromisoformat(data['submitted_at']))
+
+
+def write_reviews(cur, reviews):
+    """Upsert reviews and apply their rating and trending deltas. Returns the MediaIDs touched.
+
+    Doesn't commit. Deltas are taken against the stored rows (locked here),
+    so an edited review moves the rating sum by the difference and counts no
+    new review.
+    """
+    latest = {}
+    for review in reviews:
+        latest[(review.user_id, review.media_id)] = review
+
+    keys = list(latest)
+    placeholders = ", ".join(["(%s, %s)"] * len(keys))
+    cur.execute(f"""
+        SELECT UserID, MediaID, Rating FROM review
+        WHERE (UserID, MediaID) IN ({placeholders})
+        FOR UPDATE
+    """, [value for key in keys for value in key])
+    existing = {(row['UserID'], row['MediaID']): row['Rating'] for row in cur.fetchall()}
+
+    cur.executemany("""
+        INSERT INTO review (UserID, MediaID, Rating, Comment, ReviewDate)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE Rating = VALUES(Rating), Comment = VALUES(Comment)
+    """, [(r.user_id, r.media_id, r.rating, r.comment, r.submitted_at) for r in latest.values()])
+
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    user_deltas = {}
+    buckets = defaultdict(lambda: [0, Decimal(0)])
+    for key, review in latest.items():
+        delta = deltas[review.media_id]
+        if key in existing:
+            change = review.rating - existing[key]
+            delta[0] += change
+            user_deltas[key] = (change, 0)
+        else:
+            delta[0] += review.rating
+            delta[1] += 1
+            user_deltas[key] = (review.rating, 1)
+            bucket = buckets[(review.media_id, review.submitted_at.date())]
+            bucket[0] += 1
+            bucket[1] += review.rating
+    ratings.apply_deltas(cur, deltas)
+    user_stats.apply_deltas(cur, user_deltas)
+    trending.record_buckets(cur, buckets)
+    trending.expire_buckets(cur)
+
+    media_ids = sorted(deltas)
+    versions.bump_many(cur, media_ids)
+    return media_ids
+
+
+def write_batch(connection, reviews):
+    """Write and commit a batch; returns (media_ids, failures).
+
+    A batch with a bad review (e.g. its media item was deleted meanwhile) is
+    retried one review at a time, and failures lists (review, error) for
+    the ones that can't be written. Connection errors are raised so the
+    batch can be retried later.
+    """
+    cur = connection.cursor()
+    try:
+        try:
+            media_ids = write_reviews(cur, reviews)
+            connection.commit()
+            return media_ids, []
+        except (pymysql.IntegrityError, pymysql.DataError) as e:
+            connection.rollback()
+            if len(reviews) == 1:
+                return [], [(reviews[0], str(e))]
+
+        media_ids, failures = set(), []
+        for review in reviews:
+            try:
+                media_ids.update(write_reviews(cur, [review]))
+                connection.commit()
+            except (pymysql.IntegrityError, pymysql.DataError) as e:
+                connection.rollback()
+                failures.append((review, str(e)))
+        return sorted(media_ids), failures
+    finally:
+        cur.close()
+
+
+class ReviewQueue:
+    """Bounded in-memory review queue backed by a spill file, flushed by a worker thread."""
+
+    def __init__(self, flush, spill_path, max_size=10000, batch_size=200, flush_interval=1.0, fsync=True):
+        # flush(reviews) writes one batch and returns the failures (see write_batch)
+        self._flush = flush
+        self.base_spill_path = spill_path
+        self.spill_path = None   # the file claimed by start()
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._in_flight = 0
+        self._spilled = 0   # lines in the spill file
+        self._spill = None
+        self._lock = None
+        self._thread = None
+        self._stopping = False
+        self._pid = os.getpid()
+        self._counters = {'accepted': 0, 'written': 0, 'failed': 0, 'rejected': 0,
+                          'batches': 0, 'replayed': 0, 'flush_errors': 0}
+
+    @property
+    def started(self):
+        return self._thread is not None and self._pid == os.getpid()
+
+    def start(self):
+        """Claim a spill file, replay it and any abandoned ones, and start the worker (once).
+
+        Raises SpillLocked when every spill file is held by another process.
+        """
+        with self._cond:
+            self._check_fork()
+            if self._thread is not None:
+                return
+            self._claim_spill()
+            self._replay()
+            self._thread = threading.Thread(target=self._run, name='review-queue', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Flush what is queued and stop the worker."""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def submit(self, review, timeout=None):
+        """Queue a review durably; blocks while the queue is full, up to timeout seconds."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            if self._spill is None or self._check_fork():
+                raise RuntimeError("The review queue has not been started in this process")
+            while len(self._pending) + self._in_flight >= self.max_size:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self._counters['rejected'] += 1
+                    raise QueueFull(f"{self.max_size} reviews waiting to be written")
+                self._cond.wait(remaining)
+            self._spill.write(_to_line(review))
+            self._spill.flush()
+            if self.fsync:
+                os.fsync(self._spill.fileno())
+            self._spilled += 1
+            self._pending.append(review)
+            self._counters['accepted'] += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, queued=len(self._pending), in_flight=self._in_flight,
+                        max_size=self.max_size, batch_size=self.batch_size, spilled=self._spilled,
+                        spill_file=self.spill_path)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Let a partial batch fill up for a while before writing it
+                if len(self._pending) < self.batch_size and not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                self._in_flight = len(batch)
+
+            try:
+                failures = self._flush(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} queued reviews, retrying: {e}")
+                with self._cond:
+                    self._pending.extendleft(reversed(batch))
+                    self._in_flight = 0
+                    self._counters['flush_errors'] += 1
+                    if self._stopping:
+                        # The spill file keeps them for the next start
+                        return
+                    self._cond.wait(RETRY_DELAY)
+                continue
+
+            for review, error in failures:
+                print(f"Dropped review by user {review.user_id} for media {review.media_id}: {error}")
+            with self._cond:
+                self._in_flight = 0
+                self._counters['batches'] += 1
+                self._counters['written'] += len(batch) - len(failures)
+                self._counters['failed'] += len(failures)
+                if not self._pending:
+                    self._truncate_spill()
+                elif self._spilled > 2 * self.max_size:
+                    self._rewrite_spill()
+                self._cond.notify_all()
+
+    def _check_fork(self):
+        # A forked child (e.g. gunicorn --preload) has no worker thread, and the
+        # parent keeps its spill file; start over so the child claims its own
+        if self._pid == os.getpid():
+            return False
+        self._pid = os.getpid()
+        self._pending.clear()
+        self._in_flight = self._spilled = 0
+        self._spill = self._lock = self._thread = self.spill_path = None
+        self._stopping = False
+        return True
+
+    def _claim_spill(self):
+        for number in range(MAX_SPILL_FILES):
+            path = spill_file_path(self.base_spill_path, number)
+            lock = _lock_spill(path)
+            if lock is not None:
+                self.spill_path, self._lock = path, lock
+                return
+        raise SpillLocked(f"All {MAX_SPILL_FILES} spill files for {self.base_spill_path} are in use")
+
+    def _replay(self):
+        """Queue reviews left in our spill file and in any spill file no process holds.
+
+        The adopted files are removed only once their reviews are safely in
+        our own spill file.
+        """
+        adopted = []
+        for number in range(MAX_SPILL_FILES):
+            path = spill_file_path(self.base_spill_path, number)
+            if not os.path.exists(path):
+                continue
+            lock = None
+            if path != self.spill_path:
+                lock = _lock_spill(path)
+                if lock is None:
+                    continue
+                adopted.append((path, lock))
+            with open(path, encoding='utf-8') as spill:
+                for line in spill:
+                    try:
+                        self._pending.append(_from_line(line))
+                    except (ValueError, KeyError, TypeError, InvalidOperation):
+                        # A torn last line from a crash mid-write
+                        continue
+        self._counters['replayed'] = len(self._pending)
+        self._rewrite_spill()
+        for path, lock in adopted:
+            os.remove(path)
+            lock.close()
+
+    def _truncate_spill(self):
+        self._spill.seek(0)
+        self._spill.truncate()
+        self._spill.flush()
+        if self.fsync:
+            os.fsync(self._spill.fileno())
+        self._spilled = 0
+
+    def _rewrite_spill(self):
+        """Atomically replace the spill file with just the reviews still queued."""
+        temp_path = self.spill_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as temp:
+            temp.writelines(_to_line(review) for review in self._pending)
+            temp.flush()
+            if self.fsync:
+                os.fsync(temp.fileno())
+        if self._spill is not None:
+            self._spill.close()
+        os.replace(temp_path, self.spill_path)
+        self._spill = open(self.spill_path, 'a', encoding='utf-8')
+        self._spilled = len(self._pending)
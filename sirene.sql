@@ -73,6 +73,31 @@ INSERT INTO `awardwon` VALUES (1,1,1,2,2014),(2,2,7,NULL,2020);
 /*!40000 ALTER TABLE `awardwon` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `catalog_version`
+--
+
+DROP TABLE IF EXISTS `catalog_version`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `catalog_version` (
+  `ID` tinyint NOT NULL,
+  `Version` bigint NOT NULL DEFAULT '1',
+  `UpdatedAt` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`ID`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `catalog_version`
+--
+
+LOCK TABLES `catalog_version` WRITE;
+/*!40000 ALTER TABLE `catalog_version` DISABLE KEYS */;
+INSERT INTO `catalog_version` VALUES (1,1,'2025-11-05 07:39:12');
+/*!40000 ALTER TABLE `catalog_version` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `episode`
 --
@@ -143,7 +168,8 @@ CREATE TABLE `media` (
   `MediaType` enum('Movie','TV Show','Anime','Video Game') NOT NULL,
   `ReleaseDate` date DEFAULT NULL,
   `DurationMinutes` int DEFAULT NULL,
-  PRIMARY KEY (`MediaID`)
+  PRIMARY KEY (`MediaID`),
+  FULLTEXT KEY `Title_Synopsis` (`Title`,`Synopsis`)
 ) ENGINE=InnoDB AUTO_INCREMENT=8 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -241,6 +267,38 @@ INSERT INTO `media_platform` VALUES (1,1),(6,1),(3,2),(3,3),(4,4),(5,5),(7,6);
 /*!40000 ALTER TABLE `media_platform` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `media_primary_image`
+--
+
+DROP TABLE IF EXISTS `media_primary_image`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `media_primary_image` (
+  `MediaID` int NOT NULL,
+  `PosterImageID` int DEFAULT NULL,
+  `PosterUrl` varchar(255) DEFAULT NULL,
+  `BackdropImageID` int DEFAULT NULL,
+  `BackdropUrl` varchar(255) DEFAULT NULL,
+  PRIMARY KEY (`MediaID`),
+  KEY `PosterImageID` (`PosterImageID`),
+  KEY `BackdropImageID` (`BackdropImageID`),
+  CONSTRAINT `media_primary_image_ibfk_1` FOREIGN KEY (`MediaID`) REFERENCES `media` (`MediaID`) ON DELETE CASCADE,
+  CONSTRAINT `media_primary_image_ibfk_2` FOREIGN KEY (`PosterImageID`) REFERENCES `mediaimage` (`ImageID`) ON DELETE SET NULL,
+  CONSTRAINT `media_primary_image_ibfk_3` FOREIGN KEY (`BackdropImageID`) REFERENCES `mediaimage` (`ImageID`) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `media_primary_image`
+--
+
+LOCK TABLES `media_primary_image` WRITE;
+/*!40000 ALTER TABLE `media_primary_image` DISABLE KEYS */;
+INSERT INTO `media_primary_image` VALUES (1,14,'https://image.tmdb.org/t/p/w500/ggFHVNu6YYI5L9pCfOacjizRGt.jpg',15,'https://image.tmdb.org/t/p/original/9faGSFi5jam6pDWGNd0p8JcJgXQ.jpg'),(2,41,'https://m.media-amazon.com/images/M/MV5BZmMzNGVhODktYmU5MS00MDg1LThlNTEtNTMyYTg5MDA0Njk4XkEyXkFqcGc@._V1_.jpg',43,'https://www.animationmagazine.net/wordpress/wp-content/uploads/Chainsaw-Man-–-The-Movie-Reze-Arc.jpg'),(3,21,'https://image.tmdb.org/t/p/w500/hTP1DtLGFamjfu8WqjnuQdP1n4i.jpg',NULL,NULL),(4,42,'https://images-cdn.ubuy.com.ph/66f72fbf3ce69e77a2581ed1-netflix-marvel-daredevil-season-1-poster.jpg',NULL,NULL),(5,28,'https://image.tmdb.org/t/p/w500/7HW47XbkNQ5fiwQFYGWdw9gs144.jpg',44,'https://m.media-amazon.com/images/S/pv-target-images/0fa6af5b82929b292593d803496b149cd64c67b0126c2fd2c5522f39ef33add8.jpg'),(6,32,'https://image.tmdb.org/t/p/w500/cMD9Ygz11zjJzAovURpO75Qg7rT.jpg',46,'https://occ-0-8407-2219.1.nflxso.net/dnm/api/v6/6AYY37jfdO6hpXcMjf9Yu5cnmO0/AAAABURj5IDk5oCinFriJlxNjIrooPk24OeaNy-KHh3RAkpL5dpQ7MUzboD2AFpyMgWR-XElhv9Fsgd2W5ISE-Z3eXYMjU2D7vk0TW1J.jpg?r=588'),(7,36,'https://image.tmdb.org/t/p/w500/7IiTTgloJzvGI1TAYymCfbfl3vT.jpg',37,'https://image.tmdb.org/t/p/original/TU9NIjwzjoKPwQHoHshkFcQUCG.jpg');
+/*!40000 ALTER TABLE `media_primary_image` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `media_productioncompany`
 --
@@ -268,6 +326,112 @@ INSERT INTO `media_productioncompany` VALUES (1,1),(2,2),(3,2),(3,3),(4,4),(5,5)
 /*!40000 ALTER TABLE `media_productioncompany` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `media_rating`
+--
+
+DROP TABLE IF EXISTS `media_rating`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `media_rating` (
+  `MediaID` int NOT NULL,
+  `RatingSum` decimal(12,1) NOT NULL DEFAULT '0.0',
+  `RatingCount` int NOT NULL DEFAULT '0',
+  `AvgRating` decimal(4,2) DEFAULT NULL,
+  `LastReviewAt` timestamp NULL DEFAULT NULL,
+  PRIMARY KEY (`MediaID`),
+  KEY `AvgRating` (`AvgRating`),
+  CONSTRAINT `media_rating_ibfk_1` FOREIGN KEY (`MediaID`) REFERENCES `media` (`MediaID`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `media_rating`
+--
+
+LOCK TABLES `media_rating` WRITE;
+/*!40000 ALTER TABLE `media_rating` DISABLE KEYS */;
+INSERT INTO `media_rating` VALUES (1,37.8,4,9.45,'2025-11-04 16:07:05'),(2,20.0,2,10.00,'2025-11-05 07:39:12'),(3,17.7,2,8.85,'2025-11-04 16:07:05'),(4,7.5,1,7.50,'2025-11-04 16:07:05'),(5,16.8,2,8.40,'2025-11-04 16:07:05'),(6,16.0,2,8.00,'2025-11-04 17:56:07'),(7,18.2,2,9.10,'2025-11-04 16:07:05');
+/*!40000 ALTER TABLE `media_rating` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `media_tombstone`
+--
+
+DROP TABLE IF EXISTS `media_tombstone`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `media_tombstone` (
+  `MediaID` int NOT NULL,
+  `DeletedAt` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`MediaID`),
+  KEY `DeletedAt` (`DeletedAt`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `media_tombstone`
+--
+
+LOCK TABLES `media_tombstone` WRITE;
+/*!40000 ALTER TABLE `media_tombstone` DISABLE KEYS */;
+/*!40000 ALTER TABLE `media_tombstone` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `media_trending_day`
+--
+
+DROP TABLE IF EXISTS `media_trending_day`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `media_trending_day` (
+  `MediaID` int NOT NULL,
+  `Day` date NOT NULL,
+  `ReviewCount` int NOT NULL DEFAULT '0',
+  `RatingSum` decimal(12,1) NOT NULL DEFAULT '0.0',
+  PRIMARY KEY (`MediaID`,`Day`),
+  KEY `Day` (`Day`,`MediaID`,`ReviewCount`,`RatingSum`),
+  CONSTRAINT `media_trending_day_ibfk_1` FOREIGN KEY (`MediaID`) REFERENCES `media` (`MediaID`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `media_trending_day`
+--
+
+LOCK TABLES `media_trending_day` WRITE;
+/*!40000 ALTER TABLE `media_trending_day` DISABLE KEYS */;
+/*!40000 ALTER TABLE `media_trending_day` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `media_version`
+--
+
+DROP TABLE IF EXISTS `media_version`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `media_version` (
+  `MediaID` int NOT NULL,
+  `Version` bigint NOT NULL DEFAULT '1',
+  `UpdatedAt` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`MediaID`),
+  CONSTRAINT `media_version_ibfk_1` FOREIGN KEY (`MediaID`) REFERENCES `media` (`MediaID`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `media_version`
+--
+
+LOCK TABLES `media_version` WRITE;
+/*!40000 ALTER TABLE `media_version` DISABLE KEYS */;
+INSERT INTO `media_version` VALUES (1,1,'2025-11-04 16:07:05'),(2,1,'2025-11-05 07:39:12'),(3,1,'2025-11-04 16:07:05'),(4,1,'2025-11-04 16:07:05'),(5,1,'2025-11-04 16:07:05'),(6,1,'2025-11-04 17:56:07'),(7,1,'2025-11-04 16:07:05');
+/*!40000 ALTER TABLE `media_version` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `mediaimage`
 --
@@ -426,6 +590,7 @@ CREATE TABLE `review` (
   UNIQUE KEY `UserID` (`UserID`,`MediaID`),
   UNIQUE KEY `UserID_2` (`UserID`,`MediaID`),
   KEY `MediaID` (`MediaID`),
+  KEY `UserID_ReviewDate` (`UserID`,`ReviewDate`),
   CONSTRAINT `review_ibfk_1` FOREIGN KEY (`UserID`) REFERENCES `users` (`UserID`) ON DELETE CASCADE,
   CONSTRAINT `review_ibfk_2` FOREIGN KEY (`MediaID`) REFERENCES `media` (`MediaID`) ON DELETE CASCADE,
   CONSTRAINT `review_ibfk_3` FOREIGN KEY (`UserID`) REFERENCES `users` (`UserID`) ON DELETE CASCADE,
@@ -444,6 +609,34 @@ INSERT INTO `review` VALUES (1,1,1,9.5,'One of the greatest TV shows ever made.
 /*!40000 ALTER TABLE `review` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `user_review_stats`
+--
+
+DROP TABLE IF EXISTS `user_review_stats`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `user_review_stats` (
+  `UserID` int NOT NULL,
+  `MediaType` enum('Movie','TV Show','Anime','Video Game') NOT NULL,
+  `ReviewCount` int NOT NULL DEFAULT '0',
+  `RatingSum` decimal(12,1) NOT NULL DEFAULT '0.0',
+  `LastReviewAt` timestamp NULL DEFAULT NULL,
+  PRIMARY KEY (`UserID`,`MediaType`),
+  CONSTRAINT `user_review_stats_ibfk_1` FOREIGN KEY (`UserID`) REFERENCES `users` (`UserID`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `user_review_stats`
+--
+
+LOCK TABLES `user_review_stats` WRITE;
+/*!40000 ALTER TABLE `user_review_stats` DISABLE KEYS */;
+INSERT INTO `user_review_stats` VALUES (1,'Anime',1,8.7,'2025-11-04 16:07:05'),(1,'Movie',1,9.2,'2025-10-15 07:04:18'),(1,'TV Show',2,16.5,'2025-11-04 16:07:05'),(2,'Movie',1,9.0,'2025-11-04 16:07:05'),(2,'TV Show',3,24.8,'2025-11-04 16:07:05'),(3,'Anime',1,9.0,'2025-10-15 07:04:18'),(3,'TV Show',2,17.8,'2025-11-04 16:07:05'),(4,'Movie',1,10.0,'2025-11-04 16:20:18'),(4,'TV Show',2,19.0,'2025-11-04 17:56:07'),(6,'Movie',1,10.0,'2025-11-05 07:39:12');
+/*!40000 ALTER TABLE `user_review_stats` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `users`
 --
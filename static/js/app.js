@@ -325,4 +325,28 @@ document.addEventListener('DOMContentLoaded', () => {
         removeLoadingSkeletons,
         showToast
     };
-});
\ No newline at end of file
+});
+// Facet counts: label each filter option with its result count for the
+// current selection and disable options that would return nothing.
+// selects maps facet names ('type', 'genre', 'platform') to <select> elements.
+async function updateFacetCounts(params, selects) {
+    try {
+        const response = await fetch(`/api/facets?${params.toString()}`);
+        if (!response.ok) return;
+        const data = await response.json();
+
+        Object.entries(selects).forEach(([facet, select]) => {
+            if (!select) return;
+            const counts = new Map((data.facets[facet] || []).map(entry => [entry.value, entry.count]));
+            Array.from(select.options).forEach(option => {
+                if (!option.value) return;
+                if (!option.dataset.label) option.dataset.label = option.textContent.trim();
+                const count = counts.get(option.value) || 0;
+                option.textContent = `${option.dataset.label} (${count})`;
+                option.disabled = count === 0 && !option.selected;
+            });
+        });
+    } catch (error) {
+        console.error('Error loading facet counts:', error);
+    }
+}
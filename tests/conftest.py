@@ -0,0 +1,65 @@
+"""
+Fixtures for the query-plan tests.
+
+They need a reachable MySQL 8 server, configured like the app (MYSQL_USER and
+MYSQL_PASSWORD, from the environment or .env). SIRENE_TEST_DB (default
+sirene_test) is dropped and recreated with the schema, every migration and a
+small synthetic catalog, so the optimizer sees table sizes closer to
+production than the seven sample rows. Without a server the tests are skipped.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEST_DB = os.getenv('SIRENE_TEST_DB', 'sirene_test')
+
+# Large enough that full scans cost more than index lookups
+CATALOG = dict(media=5000, people=5000, links=20000, users=2000, reviews=50000, seed=17)
+
+
+@pytest.fixture(scope='session')
+def database():
+    """Name of a freshly built, migrated and analyzed test database."""
+    import dotenv
+    dotenv.load_dotenv(os.path.join(ROOT, '.env'))
+    init_db = pytest.importorskip('init_db')
+    import migrations
+
+    connection = init_db.create_connection('localhost', os.getenv('MYSQL_USER'), os.getenv('MYSQL_PASSWORD'))
+    if not connection:
+        pytest.skip("No MySQL server reachable")
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{TEST_DB}`")
+        cursor.execute(f"CREATE DATABASE `{TEST_DB}`")
+        cursor.execute(f"USE `{TEST_DB}`")
+        cursor.close()
+
+        assert init_db.execute_sql_file(connection, os.path.join(ROOT, 'sirene.sql'))
+        init_db.generate_data(connection, **CATALOG)
+        migrations.migrate(connection)
+
+        cursor = connection.cursor()
+        cursor.execute("""
+            ANALYZE TABLE media, media_genre, media_platform, media_person_role, mediaimage,
+                          mediavideo, episode, review, media_rating, media_trending_day, users, person
+        """)
+        cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+    return TEST_DB
+
+
+@pytest.fixture(scope='session')
+def sirene(database):
+    """The app module, pointed at the test database."""
+    os.environ['MYSQL_DB'] = database
+    os.environ.setdefault('SECRET_KEY', 'query-plan-tests')
+    import app
+    return app
@@ -0,0 +1,175 @@
+"""
+Query-plan regression tests.
+
+Each hot route is requested through the Flask test client while its
+connection records every statement; each SELECT is then run through EXPLAIN
+against the migrated test database, and the test fails if any large table is
+read with a full table scan (type ALL). A dropped index or a rewritten
+WHERE clause that stops using one shows up here instead of in production.
+"""
+
+import pytest
+
+import fulltext
+import media_detail
+
+init_db = pytest.importorskip('init_db')
+
+# Tables that grow with the catalog; scans of the small lookup tables are fine
+LARGE_TABLES = {
+    'media', 'media_genre', 'media_platform', 'media_person_role', 'media_productioncompany',
+    'media_rating', 'media_primary_image', 'media_trending_day', 'media_version',
+    'mediaimage', 'mediavideo', 'episode', 'awardwon', 'person', 'review', 'users',
+    'user_review_stats', 'media_tombstone',
+}
+
+# (endpoint, table) -> why a full scan is expected there
+ALLOWED_FULL_SCANS = {}
+
+WORD = init_db.NOUNS[0]
+NAME = init_db.FIRST_NAMES[0]
+
+HOT_PATHS = [
+    '/api/home?sections=trending,movies,tv,anime,games',
+    '/api/media/trending',
+    '/api/media/trending?window=7d&half_life=3',
+    '/api/media/top-rated',
+    '/api/media/recent',
+    '/api/media/movies',
+    '/api/browse',
+    '/api/browse?type=Movie&genre=Drama',
+    '/api/browse?sort=title',
+    '/api/browse?genre=Drama&genre=Crime&platform=Netflix&sort=rating',
+    '/api/facets?genre=Drama&type=Movie',
+    f'/api/facets?q={WORD}&single=genre',
+    f'/search?q={WORD}',
+    f'/search?q=the+{WORD}',
+    f'/search?q={WORD[:2]}&type=Movie',
+    '/media/{media_id}',
+    '/admin',
+    '/admin?type=Anime',
+    '/admin/media/{media_id}/cast',
+    f'/api/people?q={NAME}',
+    '/profile',
+]
+
+
+class RecordingCursor:
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, query, args=None):
+        self._statements.append((query, args))
+        return self._cursor.execute(query, args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class RecordingConnection:
+    def __init__(self, conn, statements):
+        self._conn = conn
+        self._statements = statements
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self._conn.cursor(*args, **kwargs), self._statements)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def explainable(statements):
+    """Split recorded statements into single SELECTs that EXPLAIN accepts."""
+    for sql, args in statements:
+        if sql == media_detail.BATCH_SQL:
+            for (_, single), arg in zip(media_detail.DETAIL_STATEMENTS, args):
+                yield single, [arg]
+            continue
+        head = sql.lstrip().lstrip('(').lstrip().upper()
+        if head.startswith('SELECT') and 'INFORMATION_SCHEMA' not in sql.upper():
+            yield sql, args
+
+
+@pytest.fixture(scope='module')
+def client(sirene):
+    """Logged-in admin client; the in-process caches are warmed outside the checks."""
+    with sirene.app.app_context():
+        cur = sirene.mysql.connection.cursor()
+        cur.execute("""
+            SELECT UserID, COUNT(*) as reviews FROM review
+            GROUP BY UserID ORDER BY reviews DESC LIMIT 1
+        """)
+        user_id = cur.fetchone()['UserID']
+        cur.close()
+        sirene.get_title_index()
+        sirene.get_facet_index()
+        sirene.get_featured_pool()
+
+    client = sirene.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['username'] = 'query-plans'
+        session['user_role'] = 'admin'
+    return client
+
+
+@pytest.fixture(scope='module')
+def media_id(sirene):
+    """The most-reviewed media item, so the detail page has every section."""
+    with sirene.app.app_context():
+        cur = sirene.mysql.connection.cursor()
+        cur.execute("""
+            SELECT MediaID, COUNT(*) as reviews FROM review
+            GROUP BY MediaID ORDER BY reviews DESC LIMIT 1
+        """)
+        media_id = cur.fetchone()['MediaID']
+        cur.close()
+    return media_id
+
+
+@pytest.mark.parametrize('path', HOT_PATHS)
+def test_hot_queries_use_indexes(sirene, client, media_id, monkeypatch, path):
+    path = path.format(media_id=media_id)
+    statements = []
+    monkeypatch.setattr(sirene.mysql, 'wrap_connection', lambda conn: RecordingConnection(conn, statements))
+    sirene.response_cache.clear()
+
+    response = client.get(path)
+    assert response.status_code == 200, path
+
+    endpoint, _ = sirene.app.url_map.bind('localhost').match(path.split('?')[0])
+
+    monkeypatch.setattr(sirene.mysql, 'wrap_connection', None)
+    with sirene.app.app_context():
+        cur = sirene.mysql.connection.cursor()
+        scans = []
+        checked = 0
+        for sql, args in explainable(statements):
+            cur.execute("EXPLAIN " + sql, args)
+            checked += 1
+            for row in cur.fetchall():
+                if (row['type'] == 'ALL' and row['table'] in LARGE_TABLES
+                        and (endpoint, row['table']) not in ALLOWED_FULL_SCANS):
+                    scans.append(f"{row['table']} ({row['rows']} rows, {row['Extra']}):\n"
+                                 f"    {' '.join(sql.split())[:300]}")
+        cur.close()
+
+    assert checked, f"{path} ran no SELECTs"
+    assert not scans, f"Full table scans on {path}:\n  " + "\n  ".join(scans)
+
+
+def test_stopword_led_search_matches(sirene):
+    """InnoDB doesn't index stopwords; a leading "the" must not empty the results."""
+    with sirene.app.app_context():
+        cur = sirene.mysql.connection.cursor()
+        page, _ = fulltext.search_media(cur, f'The {WORD}')
+        plain = fulltext.matching_ids(cur, WORD)
+        with_stopword = fulltext.matching_ids(cur, f'The {WORD}')
+        cur.close()
+
+    assert page
+    assert plain and with_stopword == plain
@@ -0,0 +1,126 @@
+"""
+Rolling-window trending counters for Sirene.
+
+Each review adds to a per-media, per-day bucket in media_trending_day (review
+count and rating sum), in the same transaction as the review. Trending lists
+sum the buckets inside the window, optionally decay-weighted so newer days
+count more, instead of scanning the review table. Buckets older than the
+longest window are expired.
+"""
+
+from datetime import date
+
+# Window name -> days of buckets before today included in it. Buckets are
+# whole days, so '24h' covers today and yesterday.
+WINDOWS = {'24h': 1, '7d': 7, '30d': 30}
+
+DEFAULT_WINDOW = '30d'
+
+# Buckets are kept this many days (the longest window)
+RETENTION_DAYS = max(WINDOWS.values())
+
+# Also in sirene.sql and migration 0009
+TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS media_trending_day (
+        MediaID int NOT NULL,
+        Day date NOT NULL,
+        ReviewCount int NOT NULL DEFAULT '0',
+        RatingSum decimal(12,1) NOT NULL DEFAULT '0.0',
+        PRIMARY KEY (MediaID, Day),
+        KEY Day (Day, MediaID, ReviewCount, RatingSum),
+        CONSTRAINT media_trending_day_ibfk_1 FOREIGN KEY (MediaID) REFERENCES media (MediaID) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+_expired_on = None
+
+
+def record_review(cur, media_id, rating):
+    """Add one review to today's bucket. Run in the review's transaction."""
+    cur.execute("""
+        INSERT INTO media_trending_day (MediaID, Day, ReviewCount, RatingSum)
+        VALUES (%s, CURDATE(), 1, %s)
+        ON DUPLICATE KEY UPDATE
+            ReviewCount = ReviewCount + 1,
+            RatingSum = RatingSum + VALUES(RatingSum)
+    """, (media_id, rating))
+
+
+def record_buckets(cur, buckets):
+    """Add a batch of new reviews to their day buckets. Run in the reviews' transaction.
+
+    buckets maps (MediaID, day) -> (review count, rating sum).
+    """
+    if not buckets:
+        return
+    cur.executemany("""
+        INSERT INTO media_trending_day (MediaID, Day, ReviewCount, RatingSum)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            ReviewCount = ReviewCount + VALUES(ReviewCount),
+            RatingSum = RatingSum + VALUES(RatingSum)
+    """, [(media_id, day, count, rating_sum) for (media_id, day), (count, rating_sum) in sorted(buckets.items())])
+
+
+def expire_buckets(cur, retention_days=RETENTION_DAYS, force=False):
+    """Delete buckets that have left every window; at most once a day per process.
+
+    Returns the number of buckets deleted.
+    """
+    global _expired_on
+    today = date.today()
+    if not force and _expired_on == today:
+        return 0
+    cur.execute("DELETE FROM media_trending_day WHERE Day < CURDATE() - INTERVAL %s DAY",
+                [retention_days])
+    _expired_on = today
+    return cur.rowcount
+
+
+def rebuild_buckets(cur, retention_days=RETENTION_DAYS):
+    """Recompute the buckets from the raw review table. Returns buckets written."""
+    cur.execute("DELETE FROM media_trending_day")
+    cur.execute("""
+        INSERT INTO media_trending_day (MediaID, Day, ReviewCount, RatingSum)
+        SELECT MediaID, DATE(ReviewDate), COUNT(*), SUM(Rating)
+        FROM review
+        WHERE ReviewDate >= CURDATE() - INTERVAL %s DAY
+        GROUP BY MediaID, DATE(ReviewDate)
+    """, [retention_days])
+    return cur.rowcount
+
+
+def top_media(cur, window=DEFAULT_WINDOW, limit=10, half_life_days=None):
+    """Most-reviewed media inside the window, as media rows.
+
+    Each row has the media columns plus review_count and avg_rating for the
+    window and poster_url. With half_life_days, each day's reviews are
+    weighted by 0.5 ** (age_in_days / half_life_days) before ranking.
+    """
+    days = WINDOWS.get(window, WINDOWS[DEFAULT_WINDOW])
+    if half_life_days:
+        score = "SUM(t.ReviewCount * POW(0.5, DATEDIFF(CURDATE(), t.Day) / %s))"
+        score_params = [half_life_days]
+    else:
+        score = "SUM(t.ReviewCount)"
+        score_params = []
+
+    cur.execute(f"""
+        SELECT m.*, w.review_count, w.avg_rating,
+               mpi.PosterUrl as poster_url
+        FROM (
+            SELECT t.MediaID,
+                   SUM(t.ReviewCount) as review_count,
+                   SUM(t.RatingSum) / SUM(t.ReviewCount) as avg_rating,
+                   {score} as score
+            FROM media_trending_day t
+            WHERE t.Day >= CURDATE() - INTERVAL %s DAY
+            GROUP BY t.MediaID
+            ORDER BY score DESC, avg_rating DESC
+            LIMIT %s
+        ) w
+        JOIN media m ON m.MediaID = w.MediaID
+        LEFT JOIN media_primary_image mpi ON m.MediaID = mpi.MediaID
+        ORDER BY w.score DESC, w.avg_rating DESC
+    """, score_params + [days, limit])
+    return cur.fetchall()
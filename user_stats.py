@@ -0,0 +1,122 @@
+"""
+Per-user review statistics for Sirene.
+
+`user_review_stats` keeps, per user and media type, how many reviews the
+user has written and the sum of the ratings given. The profile header reads
+those few rows by primary key instead of aggregating the user's reviews.
+Review writes update the row in the same transaction; deleting a media item
+or changing its type moves the counts of the reviews it carries.
+"""
+
+from decimal import Decimal
+
+# Also used by migration 0004
+TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS user_review_stats (
+        UserID int NOT NULL,
+        MediaType enum('Movie','TV Show','Anime','Video Game') NOT NULL,
+        ReviewCount int NOT NULL DEFAULT '0',
+        RatingSum decimal(12,1) NOT NULL DEFAULT '0.0',
+        LastReviewAt timestamp NULL DEFAULT NULL,
+        PRIMARY KEY (UserID, MediaType),
+        CONSTRAINT user_review_stats_ibfk_1 FOREIGN KEY (UserID) REFERENCES users (UserID) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+
+def apply_deltas(cur, deltas):
+    """Fold review changes into the users' stats. Run in the reviews' transaction.
+
+    deltas maps (UserID, MediaID) -> (rating sum change, review count change).
+    """
+    rows = [(user_id, count, rating_sum, media_id)
+            for (user_id, media_id), (rating_sum, count) in sorted(deltas.items()) if rating_sum or count]
+    if not rows:
+        return
+    cur.executemany("""
+        INSERT INTO user_review_stats (UserID, MediaType, ReviewCount, RatingSum, LastReviewAt)
+        SELECT %s, MediaType, %s, %s, NOW() FROM media WHERE MediaID = %s
+        ON DUPLICATE KEY UPDATE
+            ReviewCount = ReviewCount + VALUES(ReviewCount),
+            RatingSum = RatingSum + VALUES(RatingSum),
+            LastReviewAt = NOW()
+    """, rows)
+
+
+def apply_review(cur, user_id, media_id, rating):
+    """Count a newly inserted review. Run in the review's transaction."""
+    apply_deltas(cur, {(user_id, media_id): (rating, 1)})
+
+
+def remove_media_reviews(cur, media_id, media_type=None):
+    """Take a media item's reviews out of their authors' stats.
+
+    Call before deleting the media item (its reviews go with it), or with
+    the old media_type when the item moves to another type.
+    """
+    type_sql = "%s" if media_type else "(SELECT MediaType FROM media WHERE MediaID = %s)"
+    cur.execute(f"""
+        UPDATE user_review_stats s
+        JOIN (
+            SELECT UserID, COUNT(*) as reviews, SUM(Rating) as rating_sum
+            FROM review WHERE MediaID = %s GROUP BY UserID
+        ) r ON r.UserID = s.UserID
+        SET s.ReviewCount = s.ReviewCount - r.reviews,
+            s.RatingSum = s.RatingSum - r.rating_sum
+        WHERE s.MediaType = {type_sql}
+    """, [media_id, media_type or media_id])
+
+
+def add_media_reviews(cur, media_id):
+    """Count a media item's reviews under its current type (after a type change)."""
+    cur.execute("""
+        INSERT INTO user_review_stats (UserID, MediaType, ReviewCount, RatingSum, LastReviewAt)
+        SELECT r.UserID, m.MediaType, COUNT(*), SUM(r.Rating), MAX(r.ReviewDate)
+        FROM review r
+        JOIN media m ON m.MediaID = r.MediaID
+        WHERE r.MediaID = %s
+        GROUP BY r.UserID, m.MediaType
+        ON DUPLICATE KEY UPDATE
+            ReviewCount = ReviewCount + VALUES(ReviewCount),
+            RatingSum = RatingSum + VALUES(RatingSum)
+    """, [media_id])
+
+
+def load_stats(cur, user_id):
+    """Review count, average rating given and per-type breakdown for a user."""
+    cur.execute("""
+        SELECT MediaType, ReviewCount, RatingSum
+        FROM user_review_stats
+        WHERE UserID = %s AND ReviewCount > 0
+        ORDER BY ReviewCount DESC, MediaType
+    """, [user_id])
+    rows = cur.fetchall()
+    review_count = sum(row['ReviewCount'] for row in rows)
+    rating_sum = sum((row['RatingSum'] for row in rows), Decimal(0))
+    return {
+        'review_count': review_count,
+        'avg_rating': rating_sum / review_count if review_count else None,
+        'by_type': [{'media_type': row['MediaType'],
+                     'review_count': row['ReviewCount'],
+                     'avg_rating': row['RatingSum'] / row['ReviewCount']} for row in rows],
+    }
+
+
+def rebuild_stats(cur, user_id=None):
+    """Recompute stats from the review table, for one user or everyone.
+
+    Returns the number of stats rows written.
+    """
+    if user_id is not None:
+        cur.execute("DELETE FROM user_review_stats WHERE UserID = %s", [user_id])
+    else:
+        cur.execute("DELETE FROM user_review_stats")
+    cur.execute(f"""
+        INSERT INTO user_review_stats (UserID, MediaType, ReviewCount, RatingSum, LastReviewAt)
+        SELECT r.UserID, m.MediaType, COUNT(*), SUM(r.Rating), MAX(r.ReviewDate)
+        FROM review r
+        JOIN media m ON m.MediaID = r.MediaID
+        {'WHERE r.UserID = %s' if user_id is not None else ''}
+        GROUP BY r.UserID, m.MediaType
+    """, [user_id] if user_id is not None else None)
+    return cur.rowcount
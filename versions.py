@@ -0,0 +1,89 @@
+"""
+Change counters for Sirene's conditional responses.
+
+Every write to a media item bumps its row in media_version and the single
+catalog_version row, in the same transaction as the change itself. Routes
+derive their ETag/Last-Modified from these counters, so answering a
+revalidation is one primary-key lookup instead of the page's real queries.
+"""
+
+from datetime import timezone
+
+# Also in sirene.sql and migration 0008
+MEDIA_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS media_version (
+        MediaID int NOT NULL,
+        Version bigint NOT NULL DEFAULT '1',
+        UpdatedAt timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (MediaID),
+        CONSTRAINT media_version_ibfk_1 FOREIGN KEY (MediaID) REFERENCES media (MediaID) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+CATALOG_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        ID tinyint NOT NULL,
+        Version bigint NOT NULL DEFAULT '1',
+        UpdatedAt timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (ID)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+"""
+
+
+def bump(cur, media_id=None):
+    """Record a change to one media item (if given) and to the catalog.
+
+    Call before committing the write so the counters move with it.
+    """
+    if media_id is not None:
+        cur.execute("""
+            INSERT INTO media_version (MediaID, Version, UpdatedAt)
+            SELECT MediaID, 1, NOW() FROM media WHERE MediaID = %s
+            ON DUPLICATE KEY UPDATE Version = Version + 1, UpdatedAt = NOW()
+        """, [media_id])
+    cur.execute("""
+        INSERT INTO catalog_version (ID, Version, UpdatedAt)
+        VALUES (1, 1, NOW())
+        ON DUPLICATE KEY UPDATE Version = Version + 1, UpdatedAt = NOW()
+    """)
+
+
+def bump_many(cur, media_ids):
+    """Record a change to several media items and the catalog in two statements."""
+    if media_ids:
+        placeholders = ", ".join(["%s"] * len(media_ids))
+        cur.execute(f"""
+            INSERT INTO media_version (MediaID, Version, UpdatedAt)
+            SELECT MediaID, 1, NOW() FROM media WHERE MediaID IN ({placeholders})
+            ON DUPLICATE KEY UPDATE Version = Version + 1, UpdatedAt = NOW()
+        """, list(media_ids))
+    bump(cur)
+
+
+def bump_all(cur):
+    """Record a change to every media item, e.g. after a backfill."""
+    cur.execute("""
+        INSERT INTO media_version (MediaID, Version, UpdatedAt)
+        SELECT MediaID, 1, NOW() FROM media
+        ON DUPLICATE KEY UPDATE Version = Version + 1, UpdatedAt = NOW()
+    """)
+    bump(cur)
+
+
+def media_stamp(cur, media_id):
+    """(version, updated_at) for one media item, or None if it has none."""
+    cur.execute("SELECT Version, UpdatedAt FROM media_version WHERE MediaID = %s", [media_id])
+    row = cur.fetchone()
+    return (row['Version'], row['UpdatedAt']) if row else None
+
+
+def catalog_stamp(cur):
+    """(version, updated_at) for the catalog as a whole, or None before the first write."""
+    cur.execute("SELECT Version, UpdatedAt FROM catalog_version WHERE ID = 1")
+    row = cur.fetchone()
+    return (row['Version'], row['UpdatedAt']) if row else None
+
+
+def http_date(updated_at):
+    """UpdatedAt as an aware datetime truncated to seconds, as HTTP dates are."""
+    return updated_at.replace(microsecond=0, tzinfo=timezone.utc)